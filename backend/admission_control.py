@@ -0,0 +1,151 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+from starlette.responses import JSONResponse
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Receive, Scope, Send
+from metrics import registry
+from request_metrics import RouteTemplates
+
+
+class Overloaded(Exception):
+    """Raised when a request can't be admitted"""
+
+
+class ConcurrencyLimiter:
+    """Concurrency limit for one class of requests, with a bounded FIFO wait queue.
+
+    Up to `max_concurrency` requests run at once. Up to `max_queue` more wait
+    for a slot, each for at most `queue_timeout` seconds; anything beyond
+    that is rejected immediately instead of adding to the latency of
+    everything already waiting. Rejected clients are told to retry after
+    `retry_after` seconds.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float, retry_after: float = 1.0):
+        self.name = name
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.running = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        self._running_gauge = registry.gauge(
+            "admission_requests_running", "Admitted requests currently running", request_class=name
+        )
+        self._queued_gauge = registry.gauge(
+            "admission_requests_queued", "Requests waiting for admission", request_class=name
+        )
+        self._wait = registry.histogram(
+            "admission_wait_seconds", "Time requests waited for admission", request_class=name
+        )
+
+    def _reject(self, reason: str, message: str):
+        registry.counter(
+            "admission_rejected_total", "Requests shed by admission control", request_class=self.name, reason=reason
+        ).inc()
+        raise Overloaded(message)
+
+    def _update_gauges(self):
+        self._running_gauge.set(self.running)
+        self._queued_gauge.set(len(self._waiters))
+
+    async def acquire(self):
+        """Take a slot, waiting in the queue if necessary; raises Overloaded"""
+        if self.running < self.max_concurrency and not self._waiters:
+            self.running += 1
+            self._update_gauges()
+            self._wait.observe(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full", f"Too many {self.name} requests in progress")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._update_gauges()
+        started = time.monotonic()
+        try:
+            # Shielded so a timeout leaves the future alone; `release` may complete it at the same moment
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                self._waiters.remove(waiter)
+                self._update_gauges()
+                self._reject("timeout", f"Timed out waiting for a {self.name} slot")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the client went away
+                self.release()
+            elif not waiter.done():
+                waiter.cancel()
+                self._waiters.remove(waiter)
+                self._update_gauges()
+            raise
+        self._wait.observe(time.monotonic() - started)
+
+    def release(self):
+        """Give a slot back, handing it straight to the longest waiter if there is one"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._update_gauges()
+                return
+        self.running -= 1
+        self._update_gauges()
+
+    def get_stats(self):
+        """Running and queued request counts for diagnostics"""
+        return {
+            "running": self.running,
+            "queued": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+        }
+
+
+class AdmissionControlMiddleware:
+    """Pure ASGI middleware applying a `ConcurrencyLimiter` per class of route.
+
+    `classify(method, route_template)` names the class of a request (a key
+    of `limiters`), or returns None to admit it unconditionally. A request
+    holds its slot until its response has been fully sent. Requests that
+    can't be admitted get a 503 with a Retry-After header.
+    """
+
+    def __init__(self, app: ASGIApp, routes: List[BaseRoute], limiters: Dict[str, ConcurrencyLimiter],
+                 classify: Callable[[str, str], Optional[str]]):
+        self.app = app
+        self.templates = RouteTemplates(routes)
+        self.limiters = limiters
+        self.classify = classify
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_class = self.classify(scope["method"], self.templates.resolve(scope))
+        limiter = self.limiters.get(request_class) if request_class else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except Overloaded as e:
+            response = JSONResponse(
+                {"detail": str(e)},
+                status_code=503,
+                headers={"Retry-After": str(math.ceil(limiter.retry_after))}
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from admission_control import ConcurrencyLimiter, Overloaded
+from metrics import registry
+from models import BatchOperation, BatchOperationResult, BatchOperationStatus, BatchResponse
+
+logger = logging.getLogger(__name__)
+
+BatchHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+REF_KEY = "$ref"
+
+
+class BatchError(Exception):
+    """Raised for a malformed batch or an unresolvable reference"""
+
+
+def _references(value: Any) -> Iterable[str]:
+    """Operation ids referenced by `{"$ref": "<id>.<path>"}` values in `value`"""
+    if isinstance(value, dict):
+        if set(value) == {REF_KEY}:
+            yield str(value[REF_KEY]).partition('.')[0]
+            return
+        for item in value.values():
+            yield from _references(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _references(item)
+
+
+class BatchExecutor:
+    """Runs an ordered list of registered operations in one request.
+
+    Operations run concurrently, at most `max_concurrency` at a time, except
+    that an operation waits for the earlier operations it lists in
+    `depends_on` or references with `{"$ref": "<id>.<field>"}`, and is
+    skipped if any of them didn't succeed. With `stop_on_error`, the first
+    failure skips every operation that hasn't started yet. Results come back
+    in request order.
+
+    An operation registered with a `limiter` takes a slot from it while it
+    runs, so expensive operations count against the same admission budget
+    as their standalone endpoints; one that can't be admitted fails with 503.
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_operations: int = 50):
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_operations = max_operations
+        self.handlers: Dict[str, BatchHandler] = {}
+        self.limiters: Dict[str, ConcurrencyLimiter] = {}
+
+    def register(self, name: str, handler: BatchHandler, limiter: Optional[ConcurrencyLimiter] = None):
+        """Register the coroutine function that runs operation `name` with its params"""
+        self.handlers[name] = handler
+        if limiter is not None:
+            self.limiters[name] = limiter
+
+    def plan(self, operations: List[BatchOperation]) -> List[Set[str]]:
+        """Validate a batch and return each operation's dependencies; raises BatchError"""
+        if not operations:
+            raise BatchError("Batch has no operations")
+        if len(operations) > self.max_operations:
+            raise BatchError(f"Batch has {len(operations)} operations; the limit is {self.max_operations}")
+        seen: Set[str] = set()
+        dependencies = []
+        for index, operation in enumerate(operations):
+            if operation.id is None:
+                operation.id = str(index)
+            if operation.id in seen:
+                raise BatchError(f"Duplicate operation id {operation.id}")
+            if operation.op not in self.handlers:
+                raise BatchError(f"Unknown operation {operation.op}")
+            needs = set(operation.depends_on) | set(_references(operation.params))
+            unknown = needs - seen
+            if unknown:
+                raise BatchError(f"Operation {operation.id} depends on {', '.join(sorted(unknown))}, which must come earlier in the batch")
+            seen.add(operation.id)
+            dependencies.append(needs)
+        return dependencies
+
+    async def run(self, operations: List[BatchOperation], stop_on_error: bool = False) -> BatchResponse:
+        """Run a batch; raises BatchError if it is malformed"""
+        dependencies = self.plan(operations)
+        run = _BatchRun(self, stop_on_error)
+        for operation, needs in zip(operations, dependencies):
+            run.tasks[operation.id] = asyncio.create_task(run.execute(operation, needs))
+        results = await asyncio.gather(*run.tasks.values())
+        return BatchResponse(
+            results=results,
+            succeeded=sum(1 for result in results if result.status == BatchOperationStatus.SUCCEEDED),
+            failed=sum(1 for result in results if result.status == BatchOperationStatus.FAILED),
+            skipped=sum(1 for result in results if result.status == BatchOperationStatus.SKIPPED),
+        )
+
+
+class _BatchRun:
+    """State of one batch being executed"""
+
+    def __init__(self, executor: BatchExecutor, stop_on_error: bool):
+        self.executor = executor
+        self.stop_on_error = stop_on_error
+        self.stopped = False
+        self.semaphore = asyncio.Semaphore(executor.max_concurrency)
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.results: Dict[str, BatchOperationResult] = {}
+
+    def _resolve(self, value: Any) -> Any:
+        """Replace `{"$ref": "<id>.<path>"}` values with fields of earlier results"""
+        if isinstance(value, dict):
+            if set(value) == {REF_KEY}:
+                return self._lookup(str(value[REF_KEY]))
+            return {key: self._resolve(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._resolve(item) for item in value]
+        return value
+
+    def _lookup(self, reference: str) -> Any:
+        operation_id, _, path = reference.partition('.')
+        value = self.results[operation_id].result
+        for part in path.split('.') if path else []:
+            try:
+                value = value[int(part)] if isinstance(value, list) else value[part]
+            except (KeyError, IndexError, ValueError, TypeError):
+                raise BatchError(f"Reference {reference} not found in the result of {operation_id}")
+        return value
+
+    async def execute(self, operation: BatchOperation, needs: Set[str]) -> BatchOperationResult:
+        if needs:
+            await asyncio.gather(*(self.tasks[operation_id] for operation_id in needs))
+        failed = sorted(
+            operation_id for operation_id in needs
+            if self.results[operation_id].status != BatchOperationStatus.SUCCEEDED
+        )
+        if failed:
+            return self._finish(operation, BatchOperationStatus.SKIPPED, 424,
+                                error=f"Depends on {', '.join(failed)}, which did not succeed")
+
+        async with self.semaphore:
+            if self.stopped:
+                return self._finish(operation, BatchOperationStatus.SKIPPED, 424,
+                                    error="Skipped after an earlier operation failed")
+            try:
+                params = self._resolve(operation.params)
+                result = await self._call(operation.op, params)
+            except Overloaded as e:
+                return self._finish(operation, BatchOperationStatus.FAILED, 503, error=str(e))
+            except HTTPException as e:
+                return self._finish(operation, BatchOperationStatus.FAILED, e.status_code, error=str(e.detail))
+            except ValidationError as e:
+                return self._finish(operation, BatchOperationStatus.FAILED, 422, error=str(e))
+            except KeyError as e:
+                return self._finish(operation, BatchOperationStatus.FAILED, 422, error=f"Missing parameter {e}")
+            except BatchError as e:
+                return self._finish(operation, BatchOperationStatus.FAILED, 400, error=str(e))
+            except Exception as e:
+                logger.error(f"Batch operation {operation.op} failed: {str(e)}")
+                return self._finish(operation, BatchOperationStatus.FAILED, 500, error=str(e))
+        return self._finish(operation, BatchOperationStatus.SUCCEEDED, 200, result=jsonable_encoder(result))
+
+    async def _call(self, op: str, params: Dict[str, Any]) -> Any:
+        """Run an operation's handler inside its admission limiter, if it has one"""
+        limiter = self.executor.limiters.get(op)
+        if limiter is None:
+            return await self.executor.handlers[op](params)
+        await limiter.acquire()
+        try:
+            return await self.executor.handlers[op](params)
+        finally:
+            limiter.release()
+
+    def _finish(self, operation: BatchOperation, status: BatchOperationStatus, status_code: int,
+                result: Any = None, error: str = None) -> BatchOperationResult:
+        if status == BatchOperationStatus.FAILED and self.stop_on_error:
+            self.stopped = True
+        registry.counter(
+            "batch_operations_total", "Batch API operations by outcome", op=operation.op, status=status.value
+        ).inc()
+        self.results[operation.id] = BatchOperationResult(
+            id=operation.id, op=operation.op, status=status, status_code=status_code, result=result, error=error
+        )
+        return self.results[operation.id]
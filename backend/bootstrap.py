@@ -0,0 +1,178 @@
+"""Service wiring shared by the API (server.py) and the background worker (worker.py)"""
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from crm_service import CRMService
+from campaign_service import CampaignService
+from suppression_service import SuppressionService
+from email_service import email_service
+from job_queue import JobWorker
+from leader_election import LeaderElector
+from mongo_monitoring import mongo_monitor
+from task_supervisor import TaskSupervisor
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger(__name__)
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_monitor])
+db = client[os.environ['DB_NAME']]
+
+# Initialize services
+crm_service = CRMService(db)
+campaign_service = CampaignService(db, crm_service)
+suppression_service = SuppressionService(
+    db,
+    overlap=float(os.environ.get('SUPPRESSION_REFRESH_OVERLAP', '600')),
+    rebuild_interval=float(os.environ.get('SUPPRESSION_REBUILD_INTERVAL', '3600'))
+)
+email_service.set_suppression_list(suppression_service)
+job_queue = crm_service.jobs
+
+# Singleton background jobs run only in the process holding this lease
+leader_elector = LeaderElector(
+    db.leader_leases,
+    "background-jobs",
+    campaign_service.worker_id,
+    lease_seconds=float(os.environ.get('LEADER_LEASE_SECONDS', '15')),
+    heartbeat_interval=float(os.environ.get('LEADER_HEARTBEAT_SECONDS', '5'))
+)
+
+# Short-lived background work started from API requests; bounded so a burst
+# of requests can't pile up unlimited tasks
+api_tasks = TaskSupervisor(
+    "api_tasks",
+    max_concurrency=int(os.environ.get('API_TASK_CONCURRENCY', '4')),
+    max_queue=int(os.environ.get('API_TASK_QUEUE_SIZE', '100'))
+)
+
+# Job worker running in this process, if any
+job_worker: Optional[JobWorker] = None
+
+
+async def initialize():
+    """Create indexes and warm caches; safe to run from every process"""
+    mongo_monitor.bind_loop(asyncio.get_running_loop())
+
+    # Ensure indexes and warm the suppression bloom filter
+    try:
+        await suppression_service.ensure_indexes()
+        await suppression_service.refresh(force=True)
+    except Exception as e:
+        logger.error(f"Failed to initialize suppression list: {str(e)}")
+
+    try:
+        await crm_service.ensure_indexes()
+        await crm_service.email_retries.ensure_indexes()
+        await job_queue.ensure_indexes()
+        await campaign_service.ensure_indexes()
+        await leader_elector.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Failed to create indexes: {str(e)}")
+
+
+# Job handlers: the API enqueues, workers run these
+async def handle_welcome_email(payload: Dict[str, Any]):
+    await crm_service.send_welcome_email(payload['contact_id'])
+
+
+async def handle_campaign_delivery(payload: Dict[str, Any]):
+    await campaign_service.deliver_campaign(payload['campaign_id'])
+
+
+async def handle_sequence_enrollment(payload: Dict[str, Any]):
+    await campaign_service.run_enrollment_job(payload['job_id'])
+
+
+# Background task to process email sequences
+async def schedule_sequence_processing():
+    """Background task that processes email sequences as soon as steps become due"""
+    await campaign_service.sequence_scheduler.run(campaign_service.process_sequence_emails)
+
+
+# Background task to re-send emails that failed with a retryable error
+async def schedule_email_retries():
+    """Background task to process the email retry queue every minute"""
+    while True:
+        try:
+            await campaign_service.process_email_retries()
+        except Exception as e:
+            logger.error(f"Error processing email retries: {str(e)}")
+
+        await asyncio.sleep(60)
+
+
+# Background task to send scheduled campaigns when they become due
+async def schedule_campaign_sending():
+    """Background task to send due scheduled campaigns every minute"""
+    while True:
+        try:
+            await campaign_service.process_scheduled_campaigns()
+        except Exception as e:
+            logger.error(f"Error sending scheduled campaigns: {str(e)}")
+
+        await asyncio.sleep(60)
+
+
+# Background task to keep the enrollments collection down to active work
+async def schedule_enrollment_archival():
+    """Background task to archive finished sequence enrollments every 6 hours"""
+    while True:
+        try:
+            await campaign_service.archive_enrollments()
+        except Exception as e:
+            logger.error(f"Error archiving enrollments: {str(e)}")
+
+        await asyncio.sleep(6 * 60 * 60)
+
+
+def start_cache_invalidation() -> List[asyncio.Task]:
+    """Follow contact writes made by other processes, if CONTACT_CACHE_CHANGE_STREAM is enabled"""
+    if os.environ.get('CONTACT_CACHE_CHANGE_STREAM', 'false').lower() != 'true':
+        return []
+    return [asyncio.create_task(crm_service.contact_cache.watch())]
+
+
+def start_worker(job_concurrency: int = 4, run_scheduler: bool = True) -> List[asyncio.Task]:
+    """Start the sending and scheduling subsystems on the running event loop"""
+    global job_worker
+    worker = job_worker = JobWorker(job_queue, campaign_service.worker_id, concurrency=job_concurrency)
+    worker.register("welcome_email", handle_welcome_email)
+    worker.register("campaign_delivery", handle_campaign_delivery)
+    worker.register("sequence_enrollment", handle_sequence_enrollment)
+    tasks = [
+        asyncio.create_task(worker.run()),
+        # Retry queue entries are claimed atomically, so every worker can help drain it
+        asyncio.create_task(schedule_email_retries()),
+    ]
+
+    if run_scheduler:
+        # Singleton jobs run on the elected leader only; other workers stay
+        # idle and take over if the leader dies
+        leader_elector.add_job(schedule_sequence_processing)
+        leader_elector.add_job(schedule_campaign_sending)
+        leader_elector.add_job(schedule_enrollment_archival)
+        tasks.append(asyncio.create_task(leader_elector.run()))
+
+    return tasks
+
+
+async def stop_worker(tasks: List[asyncio.Task], drain_timeout: float = 20.0):
+    """Stop the background subsystems and hand the leader lease to another process
+
+    Running jobs get `drain_timeout` seconds to finish; the rest are released
+    back to the job queue for another worker.
+    """
+    if job_worker is not None:
+        await job_worker.drain(drain_timeout)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await leader_elector.release()
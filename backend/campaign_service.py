@@ -1,15 +1,27 @@
 import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 from models import (
     Campaign, CampaignCreate, CampaignStatus, ContactStatus,
     EmailTemplate, EmailTemplateCreate,
-    EmailSequence, EmailSequenceCreate, SequenceEnrollment,
+    EmailSequence, EmailSequenceCreate, SequenceEnrollment, ActiveEnrollment,
+    BulkEnrollmentRequest, EnrollmentJob, JobStatus, EnrollmentHistory, SequenceStats,
     Contact, InteractionType
 )
 from email_service import email_service
+from metrics import registry
+from send_scheduler import SendLane
+from sequence_cache import SequenceCache
+from sequence_scheduler import SequenceScheduler
+from single_flight import single_flight
+from template_renderer import CONTACT_RENDER_PROJECTION, personalization_values, render
+import os
+import socket
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -22,7 +34,43 @@ class CampaignService:
         self.templates = db.email_templates
         self.sequences = db.email_sequences
         self.enrollments = db.sequence_enrollments
+        self.enrollment_jobs = db.enrollment_jobs
+        self.enrollment_history = db.sequence_enrollment_history
+        self.sequence_stats = db.sequence_stats
         self.contacts = db.contacts
+        self.campaign_sends = db.campaign_sends
+        self.email_retries = crm_service.email_retries
+        self.jobs = crm_service.jobs
+        self.versions = crm_service.versions
+        self.flights = crm_service.flights
+        self.sequence_cache = SequenceCache(self.sequences)
+        self.sequence_scheduler = SequenceScheduler(self.enrollments)
+        
+        # Lease-based sequence workers
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.sequence_workers = int(os.environ.get('SEQUENCE_WORKERS', '4'))
+        self.sequence_batch_size = int(os.environ.get('SEQUENCE_BATCH_SIZE', '100'))
+        self.sequence_concurrency = int(os.environ.get('SEQUENCE_CONCURRENCY', '20'))
+        self.sequence_lease_seconds = int(os.environ.get('SEQUENCE_LEASE_SECONDS', '300'))
+        self.sequence_miss_limit = int(os.environ.get('SEQUENCE_MISS_LIMIT', '5'))
+        self.campaign_batch_size = int(os.environ.get('CAMPAIGN_DELIVERY_BATCH_SIZE', '500'))
+        
+        # Enroll contacts into triggered sequences as they are created and updated
+        crm_service.add_contact_listener(self._on_contact_changed)
+    
+    async def ensure_indexes(self):
+        """Create indexes used by campaign and sequence processing"""
+        await self.enrollments.create_index([("is_active", ASCENDING), ("next_email_at", ASCENDING)])
+        await self.enrollments.create_index(
+            [("contact_id", ASCENDING), ("sequence_id", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"is_active": True},
+            name="active_enrollment_unique"
+        )
+        await self.enrollment_history.create_index([("id", ASCENDING)], unique=True)
+        await self.enrollment_history.create_index([("contact_id", ASCENDING), ("archived_at", ASCENDING)])
+        # One claim per campaign recipient makes delivery idempotent
+        await self.campaign_sends.create_index([("campaign_id", ASCENDING), ("contact_id", ASCENDING)], unique=True)
     
     # Email Template Management
     async def create_template(self, template_data: EmailTemplateCreate) -> EmailTemplate:
@@ -33,14 +81,20 @@ class CampaignService:
         template_dict['updated_at'] = datetime.utcnow()
         
         await self.templates.insert_one(template_dict)
+        await self.versions.bump(self.templates.name)
         return EmailTemplate(**template_dict)
     
     async def get_templates(self) -> List[EmailTemplate]:
         """Get all email templates"""
-        cursor = self.templates.find({}).sort("created_at", -1)
-        templates = await cursor.to_list(length=None)
+        templates = await self.get_template_documents()
         return [EmailTemplate(**template) for template in templates]
     
+    @single_flight("email_templates")
+    async def get_template_documents(self, projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Get all email templates as raw documents, for trusted read paths"""
+        cursor = self.templates.find({}, projection or {"_id": 0}).sort("created_at", -1)
+        return await cursor.to_list(length=None)
+    
     async def get_template(self, template_id: str) -> Optional[EmailTemplate]:
         """Get a specific email template"""
         template_data = await self.templates.find_one({"id": template_id})
@@ -49,6 +103,8 @@ class CampaignService:
     async def delete_template(self, template_id: str) -> bool:
         """Delete an email template"""
         result = await self.templates.delete_one({"id": template_id})
+        if result.deleted_count > 0:
+            await self.versions.bump(self.templates.name)
         return result.deleted_count > 0
     
     # Campaign Management
@@ -66,16 +122,24 @@ class CampaignService:
             campaign_data.exclude_tags
         )
         campaign_dict['total_recipients'] = target_count
+        if campaign_data.scheduled_at:
+            campaign_dict['status'] = CampaignStatus.SCHEDULED
         
         await self.campaigns.insert_one(campaign_dict)
+        await self.versions.bump(self.campaigns.name)
         return Campaign(**campaign_dict)
     
     async def get_campaigns(self) -> List[Campaign]:
         """Get all campaigns"""
-        cursor = self.campaigns.find({}).sort("created_at", -1)
-        campaigns = await cursor.to_list(length=None)
+        campaigns = await self.get_campaign_documents()
         return [Campaign(**campaign) for campaign in campaigns]
     
+    @single_flight("campaigns")
+    async def get_campaign_documents(self, projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Get all campaigns as raw documents, for trusted read paths"""
+        cursor = self.campaigns.find({}, projection or {"_id": 0}).sort("created_at", -1)
+        return await cursor.to_list(length=None)
+    
     async def get_campaign(self, campaign_id: str) -> Optional[Campaign]:
         """Get a specific campaign"""
         campaign_data = await self.campaigns.find_one({"id": campaign_id})
@@ -90,37 +154,116 @@ class CampaignService:
         if campaign.status != CampaignStatus.DRAFT and campaign.status != CampaignStatus.SCHEDULED:
             return {"success": False, "error": "Campaign cannot be sent"}
         
-        # Get target audience
-        audience = await self._get_campaign_audience(
+        # Size the target audience; the audience itself is loaded by the worker
+        recipient_count = await self._count_campaign_audience(
             campaign.target_tags,
             campaign.target_status,
             campaign.exclude_tags
         )
         
-        if not audience:
+        if not recipient_count:
             return {"success": False, "error": "No contacts found for target audience"}
         
-        # Update campaign status
-        await self.campaigns.update_one(
-            {"id": campaign_id},
+        # Claim the campaign with one conditional write, so a manual send racing
+        # the scheduler (or two leaders during a handover) enqueues delivery once
+        result = await self.campaigns.update_one(
+            # Drafts are stored without a status field, which None matches
+            {"id": campaign_id, "status": {"$in": [CampaignStatus.DRAFT, CampaignStatus.SCHEDULED, None]}},
             {"$set": {
                 "status": CampaignStatus.SENT,
                 "sent_at": datetime.utcnow(),
-                "emails_sent": len(audience)
+                "emails_sent": recipient_count
             }}
         )
+        if result.modified_count != 1:
+            return {"success": False, "error": "Campaign cannot be sent"}
+        await self.versions.bump(self.campaigns.name)
         
-        # Send emails in background
-        asyncio.create_task(self._send_campaign_emails(campaign, audience))
+        # Delivery is done by a background worker
+        await self.jobs.enqueue("campaign_delivery", {"campaign_id": campaign_id})
         
         return {
             "success": True,
-            "message": f"Campaign sent to {len(audience)} contacts",
-            "recipient_count": len(audience)
+            "message": f"Campaign sent to {recipient_count} contacts",
+            "recipient_count": recipient_count
         }
     
-    async def _get_campaign_audience(self, target_tags: List[str], target_status: List[ContactStatus], exclude_tags: List[str]) -> List[Dict[str, Any]]:
-        """Get the audience for a campaign based on targeting criteria"""
+    async def deliver_campaign(self, campaign_id: str):
+        """Send a campaign's emails to its audience (run by the background worker)
+
+        The audience is walked in contact id order, one batch at a time. Each
+        recipient is claimed in `campaign_sends` before it is sent to, and the
+        campaign records the last contact id of every finished batch, so a
+        delivery that is interrupted or re-run resumes where it stopped and
+        never mails a recipient twice. A recipient whose send was in flight
+        when a worker crashed stays claimed and is not retried; on a graceful
+        shutdown, claims for sends that hadn't finished are given back first.
+        Errors propagate so the job queue retries the delivery.
+        """
+        campaign_data = await self.campaigns.find_one({"id": campaign_id}, {"_id": 0})
+        if not campaign_data:
+            logger.warning(f"Campaign {campaign_id} was deleted before delivery")
+            return
+        campaign = Campaign(**campaign_data)
+        query = self._build_audience_query(campaign.target_tags, campaign.target_status, campaign.exclude_tags)
+        after = campaign_data.get('delivery_cursor')
+        
+        # Track how many recipients are still waiting to be sent
+        queue_depth = registry.gauge(
+            "campaign_queue_depth", "Recipients of a sending campaign not yet sent", campaign_id=campaign.id
+        )
+        queue_depth.set(await self.contacts.count_documents(self._audience_after(query, after)))
+        
+        totals = {"delivered": 0, "failed": 0, "retrying": 0, "suppressed": 0, "skipped": 0}
+        try:
+            while True:
+                batch = await self.contacts.find(
+                    self._audience_after(query, after), {"_id": 0}
+                ).sort("id", ASCENDING).limit(self.campaign_batch_size).to_list(length=self.campaign_batch_size)
+                if not batch:
+                    break
+                counts = await self._deliver_campaign_batch(campaign, batch)
+                for outcome, count in counts.items():
+                    totals[outcome] += count
+                
+                after = batch[-1]['id']
+                await self.campaigns.update_one(
+                    {"id": campaign.id},
+                    {"$set": {"delivery_cursor": after, "updated_at": datetime.utcnow()}}
+                )
+                queue_depth.dec(len(batch))
+        finally:
+            registry.remove("campaign_queue_depth", campaign_id=campaign.id)
+        
+        logger.info(
+            f"Campaign {campaign.id} sent: {totals['delivered']} delivered, "
+            f"{totals['failed'] + totals['retrying']} failed ({totals['retrying']} queued for retry), "
+            f"{totals['suppressed']} suppressed, {totals['skipped']} already handled"
+        )
+    
+    async def process_scheduled_campaigns(self) -> int:
+        """Send scheduled campaigns whose time has come (should be called periodically)"""
+        cursor = self.campaigns.find(
+            {"status": CampaignStatus.SCHEDULED, "scheduled_at": {"$lte": datetime.utcnow()}},
+            {"_id": 0, "id": 1}
+        )
+        sent = 0
+        async for campaign_data in cursor:
+            result = await self.send_campaign(campaign_data['id'])
+            if result['success']:
+                sent += 1
+            else:
+                # Back to draft so it isn't retried every pass; it can be fixed and rescheduled
+                logger.warning(f"Scheduled campaign {campaign_data['id']} not sent: {result.get('error')}")
+                await self.campaigns.update_one(
+                    {"id": campaign_data['id'], "status": CampaignStatus.SCHEDULED},
+                    {"$set": {"status": CampaignStatus.DRAFT, "updated_at": datetime.utcnow()}}
+                )
+                await self.versions.bump(self.campaigns.name)
+        return sent
+    
+    def _build_audience_query(self, target_tags: List[str], target_status: List[ContactStatus], exclude_tags: List[str]) -> Dict[str, Any]:
+        """Build the contacts query for a campaign's targeting criteria"""
         query = {"email_subscribed": True}
         
         # Build targeting query
@@ -141,77 +284,155 @@ class CampaignService:
         if and_conditions:
             query["$and"] = and_conditions
         
-        # If no targeting criteria, send to all subscribed contacts
-        cursor = self.contacts.find(query)
-        contacts = await cursor.to_list(length=None)
-        
-        return contacts
+        # If no targeting criteria, target all subscribed contacts
+        return query
+    
+    def _audience_after(self, query: Dict[str, Any], contact_id: Optional[str]) -> Dict[str, Any]:
+        """Narrow an audience query to contacts after `contact_id` in id order"""
+        return {**query, "id": {"$gt": contact_id}} if contact_id else query
     
     async def _count_campaign_audience(self, target_tags: List[str], target_status: List[ContactStatus], exclude_tags: List[str]) -> int:
         """Count the audience size for a campaign"""
-        audience = await self._get_campaign_audience(target_tags, target_status, exclude_tags)
-        return len(audience)
+        return await self.contacts.count_documents(
+            self._build_audience_query(target_tags, target_status, exclude_tags)
+        )
     
-    async def _send_campaign_emails(self, campaign: Campaign, audience: List[Dict[str, Any]]):
-        """Send campaign emails to the audience"""
+    async def _deliver_campaign_batch(self, campaign: Campaign, contacts: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Send a campaign to one batch of its audience, skipping recipients an earlier run claimed"""
+        counts = {"delivered": 0, "failed": 0, "retrying": 0, "suppressed": 0, "skipped": 0}
+        claimed = {
+            row['contact_id'] async for row in self.campaign_sends.find(
+                {"campaign_id": campaign.id, "contact_id": {"$in": [contact['id'] for contact in contacts]}},
+                {"_id": 0, "contact_id": 1}
+            )
+        }
+        recipients = [contact for contact in contacts if contact['id'] not in claimed]
+        
+        # Claim before sending; the unique (campaign_id, contact_id) index lets
+        # only one run claim a recipient, even if two workers overlap
+        now = datetime.utcnow()
+        rows = [
+            {"campaign_id": campaign.id, "contact_id": contact['id'], "email": contact['email'],
+             "status": "sending", "created_at": now, "updated_at": now}
+            for contact in recipients
+        ]
+        if rows:
+            try:
+                await self.campaign_sends.insert_many(rows, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get('writeErrors', [])
+                if any(error.get('code') != 11000 for error in errors):
+                    raise
+                taken = {rows[error['index']]['contact_id'] for error in errors}
+                recipients = [contact for contact in recipients if contact['id'] not in taken]
+        counts["skipped"] = len(contacts) - len(recipients)
+        if not recipients:
+            return counts
+        
+        email_list = [
+            {
+                'email': contact['email'],
+                'first_name': contact.get('first_name', ''),
+                'last_name': contact.get('last_name', ''),
+                'company': contact.get('company', ''),
+                'position': contact.get('position', ''),
+                'city': contact.get('city', ''),
+                'state': contact.get('state', ''),
+                'country': contact.get('country', ''),
+            }
+            for contact in recipients
+        ]
+        finished: Dict[int, Dict[str, Any]] = {}
         try:
-            # Prepare email data for bulk send
-            email_list = []
-            for contact in audience:
-                email_list.append({
-                    'email': contact['email'],
-                    'first_name': contact.get('first_name', ''),
-                    'last_name': contact.get('last_name', ''),
-                    'company': contact.get('company', ''),
-                    'position': contact.get('position', ''),
-                    'city': contact.get('city', ''),
-                    'state': contact.get('state', ''),
-                    'country': contact.get('country', ''),
-                })
-            
-            # Send bulk emails
             results = await email_service.send_bulk_emails(
                 email_list=email_list,
                 subject=campaign.subject,
                 html_content=campaign.html_content,
-                text_content=campaign.text_content
+                text_content=campaign.text_content,
+                on_result=finished.__setitem__
             )
-            
-            # Process results and update campaign analytics
-            delivered_count = sum(1 for result in results if result.get('success', False))
-            failed_count = len(results) - delivered_count
-            
-            await self.campaigns.update_one(
-                {"id": campaign.id},
+        except asyncio.CancelledError:
+            # Shutting down mid-batch: keep what was sent and give back the claims
+            # of sends that never finished, so the resumed delivery makes them
+            unfinished = [recipient['id'] for index, recipient in enumerate(recipients) if index not in finished]
+            await self.campaign_sends.delete_many(
+                {"campaign_id": campaign.id, "contact_id": {"$in": unfinished}, "status": "sending"}
+            )
+            await self._record_campaign_results(campaign, recipients, email_list, finished)
+            logger.info(
+                f"Campaign {campaign.id} delivery interrupted: {len(finished)} sends recorded, "
+                f"{len(unfinished)} left for the next run"
+            )
+            raise
+        results = {
+            index: result if isinstance(result, dict) else {"success": False, "error": str(result)}
+            for index, result in enumerate(results)
+        }
+        for outcome, count in (await self._record_campaign_results(campaign, recipients, email_list, results)).items():
+            counts[outcome] += count
+        return counts
+    
+    async def _record_campaign_results(self, campaign: Campaign, recipients: List[Dict[str, Any]],
+                                       email_list: List[Dict[str, str]], results: Dict[int, Dict[str, Any]]) -> Dict[str, int]:
+        """Store send outcomes on the recipients' claims, update analytics and re-enqueue transient failures"""
+        counts = {"delivered": 0, "failed": 0, "retrying": 0, "suppressed": 0}
+        operations = []
+        retry_entries = []
+        for index, result in results.items():
+            contact = recipients[index]
+            if result.get('success', False):
+                outcome = "delivered"
+                await self.crm_service._create_interaction(
+                    contact['id'],
+                    InteractionType.EMAIL_SENT,
+                    f"Campaign email sent: {campaign.name}",
+                    {
+                        "campaign_id": campaign.id,
+                        "message_id": result.get('message_id'),
+                        "subject": campaign.subject
+                    }
+                )
+            elif result.get('suppressed', False):
+                outcome = "suppressed"
+            elif result.get('retryable', False):
+                outcome = "retrying"
+                retry_entries.append(self.email_retries.build_entry(
+                    to_email=contact['email'],
+                    subject=campaign.subject,
+                    html_content=campaign.html_content,
+                    text_content=campaign.text_content,
+                    lane=SendLane.BULK,
+                    personalization=email_list[index],
+                    contact_id=contact['id'],
+                    campaign_id=campaign.id,
+                    interaction_description=f"Campaign email sent: {campaign.name}",
+                    interaction_metadata={"campaign_id": campaign.id, "subject": campaign.subject},
+                    error=result.get('error'),
+                    retry_after=result.get('retry_after')
+                ))
+            else:
+                outcome = "failed"
+            counts[outcome] += 1
+            operations.append(UpdateOne(
+                {"campaign_id": campaign.id, "contact_id": contact['id']},
                 {"$set": {
-                    "emails_delivered": delivered_count,
+                    "status": outcome,
+                    "message_id": result.get('message_id'),
+                    "error": result.get('error'),
                     "updated_at": datetime.utcnow()
                 }}
-            )
-            
-            # Log interactions for successful sends
-            for i, result in enumerate(results):
-                if result.get('success', False):
-                    contact = audience[i]
-                    await self.crm_service._create_interaction(
-                        contact['id'],
-                        InteractionType.EMAIL_SENT,
-                        f"Campaign email sent: {campaign.name}",
-                        {
-                            "campaign_id": campaign.id,
-                            "message_id": result.get('message_id'),
-                            "subject": campaign.subject
-                        }
-                    )
-            
-            logger.info(f"Campaign {campaign.id} sent: {delivered_count} delivered, {failed_count} failed")
-            
-        except Exception as e:
-            logger.error(f"Failed to send campaign {campaign.id}: {str(e)}")
+            ))
+        
+        if operations:
+            await self.campaign_sends.bulk_write(operations, ordered=False)
+        if counts["delivered"]:
             await self.campaigns.update_one(
                 {"id": campaign.id},
-                {"$set": {"status": CampaignStatus.DRAFT}}
+                {"$inc": {"emails_delivered": counts["delivered"]}, "$set": {"updated_at": datetime.utcnow()}}
             )
+            await self.versions.bump(self.campaigns.name, self.contacts.name, self.crm_service.interactions.name)
+        await self.email_retries.enqueue_many(retry_entries)
+        return counts
     
     # Email Automation Sequences
     async def create_sequence(self, sequence_data: EmailSequenceCreate) -> EmailSequence:
@@ -222,14 +443,30 @@ class CampaignService:
         sequence_dict['updated_at'] = datetime.utcnow()
         
         await self.sequences.insert_one(sequence_dict)
+        await self.versions.bump(self.sequences.name)
+        self.sequence_cache.invalidate()  # also rebuilds the trigger index
         return EmailSequence(**sequence_dict)
     
     async def get_sequences(self) -> List[EmailSequence]:
         """Get all email sequences"""
-        cursor = self.sequences.find({}).sort("created_at", -1)
-        sequences = await cursor.to_list(length=None)
+        sequences = await self.get_sequence_documents()
         return [EmailSequence(**sequence) for sequence in sequences]
     
+    @single_flight("email_sequences")
+    async def get_sequence_documents(self, projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Get all email sequences as raw documents, for trusted read paths
+        
+        A `step_count` in the projection is computed by Mongo, so summaries
+        never load the step bodies.
+        """
+        projection = dict(projection or {"_id": 0})
+        if "step_count" in projection:
+            projection["step_count"] = {"$size": {"$ifNull": ["$emails", []]}}
+            cursor = self.sequences.aggregate([{"$sort": {"created_at": -1}}, {"$project": projection}])
+            return await cursor.to_list(length=None)
+        cursor = self.sequences.find({}, projection).sort("created_at", -1)
+        return await cursor.to_list(length=None)
+    
     async def get_sequence(self, sequence_id: str) -> Optional[EmailSequence]:
         """Get a specific email sequence"""
         sequence_data = await self.sequences.find_one({"id": sequence_id})
@@ -237,108 +474,331 @@ class CampaignService:
     
     async def enroll_contact_in_sequence(self, contact_id: str, sequence_id: str) -> SequenceEnrollment:
         """Enroll a contact in an email sequence"""
-        # Check if contact is already enrolled
+        sequence = await self.sequence_cache.get(sequence_id)
+        created = await self._upsert_enrollments(contact_id, [sequence] if sequence else [], [sequence_id])
+        if created:
+            return SequenceEnrollment(**created[0])
+        
+        # Contact is already enrolled
         existing = await self.enrollments.find_one({
             "contact_id": contact_id,
             "sequence_id": sequence_id,
             "is_active": True
         })
+        return SequenceEnrollment(**existing)
+    
+    async def get_active_enrollments(self, contact_id: str) -> List[ActiveEnrollment]:
+        """Get a contact's active sequence enrollments with their sequence names"""
+        documents = await self.enrollments.find(
+            {"contact_id": contact_id, "is_active": True}, {"_id": 0}
+        ).sort("enrolled_at", ASCENDING).to_list(length=None)
+        sequence_ids = {document['sequence_id'] for document in documents}
+        sequences = await self.sequence_cache.get_many(sequence_ids)
+        for sequence_id in sequence_ids - set(sequences):
+            sequence = await self.sequence_cache.get(sequence_id)
+            if sequence:
+                sequences[sequence_id] = sequence
         
-        if existing:
-            return SequenceEnrollment(**existing)
-        
+        enrollments = []
+        for document in documents:
+            sequence = sequences.get(document['sequence_id'])
+            enrollments.append(ActiveEnrollment(
+                id=document['id'],
+                sequence_id=document['sequence_id'],
+                sequence_name=sequence.name if sequence else None,
+                current_step=document.get('current_step', 0),
+                total_steps=len(sequence.emails) if sequence else 0,
+                enrolled_at=document['enrolled_at'],
+                next_email_at=document.get('next_email_at')
+            ))
+        return enrollments
+    
+    def _build_enrollment(self, contact_id: str, sequence_id: str, sequence: Optional[EmailSequence],
+                          now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Build a new enrollment document, timing the first step from the sequence"""
+        now = now or datetime.utcnow()
         enrollment_dict = {
             'id': str(uuid.uuid4()),
             'contact_id': contact_id,
             'sequence_id': sequence_id,
             'current_step': 0,
-            'enrolled_at': datetime.utcnow(),
+            'enrolled_at': now,
             'is_active': True
         }
         
         # Calculate next email time based on sequence first step
-        sequence = await self.get_sequence(sequence_id)
         if sequence and sequence.emails:
             first_email = sequence.emails[0]
             delay_hours = first_email.get('delay_hours', 0)
-            enrollment_dict['next_email_at'] = datetime.utcnow() + timedelta(hours=delay_hours)
+            enrollment_dict['next_email_at'] = now + timedelta(hours=delay_hours)
         
-        await self.enrollments.insert_one(enrollment_dict)
+        return enrollment_dict
+    
+    async def _upsert_enrollments(self, contact_id: str, sequences: List[EmailSequence],
+                                  sequence_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Enroll a contact in several sequences with one bulk upsert; returns the new enrollments
+
+        The unique partial index on active (contact_id, sequence_id) pairs makes
+        this idempotent: existing active enrollments are left untouched.
+        """
+        sequences_by_id = {sequence.id: sequence for sequence in sequences}
+        sequence_ids = sequence_ids or list(sequences_by_id)
+        if not sequence_ids:
+            return []
         
-        # Log enrollment interaction
-        await self.crm_service._create_interaction(
-            contact_id,
-            InteractionType.NOTE_ADDED,
-            f"Enrolled in email sequence: {sequence.name if sequence else sequence_id}",
-            {"sequence_id": sequence_id}
-        )
+        now = datetime.utcnow()
+        enrollments = [
+            self._build_enrollment(contact_id, sequence_id, sequences_by_id.get(sequence_id), now)
+            for sequence_id in sequence_ids
+        ]
+        operations = [
+            UpdateOne(
+                {"contact_id": contact_id, "sequence_id": enrollment['sequence_id'], "is_active": True},
+                {"$setOnInsert": {
+                    key: value for key, value in enrollment.items()
+                    if key not in ("contact_id", "sequence_id", "is_active")
+                }},
+                upsert=True
+            )
+            for enrollment in enrollments
+        ]
+        
+        try:
+            result = await self.enrollments.bulk_write(operations, ordered=False)
+            upserted_indexes = result.upserted_ids.keys()
+        except BulkWriteError as e:
+            # A concurrent enrollment won the race for the same pair
+            if any(error['code'] != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+            upserted_indexes = [upserted['index'] for upserted in e.details.get('upserted', [])]
+        
+        created = [enrollments[index] for index in upserted_indexes]
+        for enrollment in created:
+            self.sequence_scheduler.schedule(enrollment.get('next_email_at'))
+            sequence = sequences_by_id.get(enrollment['sequence_id'])
+            
+            # Log enrollment interaction
+            await self.crm_service._create_interaction(
+                contact_id,
+                InteractionType.NOTE_ADDED,
+                f"Enrolled in email sequence: {sequence.name if sequence else enrollment['sequence_id']}",
+                {"sequence_id": enrollment['sequence_id']}
+            )
+        if created:
+            await self.versions.bump(self.contacts.name, self.crm_service.interactions.name)
         
-        return SequenceEnrollment(**enrollment_dict)
+        return created
     
     async def process_sequence_emails(self):
-        """Process and send due sequence emails (should be called periodically)"""
+        """Process and send due sequence emails (should be called periodically)
+
+        Due enrollments are claimed with a lease, so any number of workers in
+        any number of processes can run this concurrently without sending the
+        same step twice. Work abandoned by a crashed worker is reclaimed once
+        its lease expires.
+        """
+        semaphore = asyncio.Semaphore(self.sequence_concurrency)
+        counts = await asyncio.gather(*(
+            self._run_sequence_worker(f"{self.worker_id}:{i}", semaphore)
+            for i in range(self.sequence_workers)
+        ))
+        
+        processed = sum(counts)
+        if processed:
+            logger.info(f"Processed {processed} due sequence enrollments")
+        return processed
+    
+    async def _run_sequence_worker(self, owner: str, semaphore: asyncio.Semaphore) -> int:
+        """Claim and process batches of due enrollments until none are left"""
+        processed = 0
+        while True:
+            batch = await self._claim_due_enrollments(owner, self.sequence_batch_size)
+            if not batch:
+                return processed
+            await self._process_enrollment_chunk(batch, owner, semaphore)
+            processed += len(batch)
+    
+    async def _claim_due_enrollments(self, owner: str, limit: int) -> List[Dict[str, Any]]:
+        """Lease up to `limit` due enrollments that nobody else holds"""
         now = datetime.utcnow()
+        lease_expires_at = now + timedelta(seconds=self.sequence_lease_seconds)
+        claimed = []
+        while len(claimed) < limit:
+            enrollment_data = await self.enrollments.find_one_and_update(
+                {
+                    "is_active": True,
+                    "next_email_at": {"$lte": now},
+                    "$or": [
+                        {"lease_expires_at": None},
+                        {"lease_expires_at": {"$lte": now}}
+                    ]
+                },
+                {"$set": {"lease_owner": owner, "lease_expires_at": lease_expires_at}},
+                sort=[("next_email_at", ASCENDING)],
+                return_document=ReturnDocument.AFTER
+            )
+            if not enrollment_data:
+                break
+            claimed.append(enrollment_data)
+        return claimed
+    
+    async def _process_enrollment_chunk(self, chunk: List[Dict[str, Any]], owner: str, semaphore: asyncio.Semaphore):
+        """Send one chunk of due steps concurrently, persisting each advance right after its send
+        
+        The chunk's leases are renewed while it runs, and an enrollment whose
+        lease was taken over by another worker is skipped rather than sent twice.
+        """
+        contact_ids = list({enrollment_data['contact_id'] for enrollment_data in chunk})
+        # Cached contacts, plus only the fields needed for rendering for the rest;
+        # documents are trusted, so no model validation
+        contacts = await self.crm_service.contact_cache.get_many(contact_ids, CONTACT_RENDER_PROJECTION)
+        sequences = await self.sequence_cache.get_many(
+            enrollment_data['sequence_id'] for enrollment_data in chunk
+        )
+        suppressed = await email_service.get_suppressed([contact['email'] for contact in contacts.values()])
         
-        # Find enrollments that are due for next email
-        due_enrollments = await self.enrollments.find({
-            "is_active": True,
-            "next_email_at": {"$lte": now}
-        }).to_list(length=None)
+        held = {enrollment_data['id'] for enrollment_data in chunk}
+        stepped = 0
+        heartbeat = asyncio.create_task(self._renew_enrollment_leases(held, owner))
         
-        for enrollment_data in due_enrollments:
+        async def process(enrollment_data: Dict[str, Any]):
+            nonlocal stepped
+            async with semaphore:
+                if enrollment_data['id'] not in held:
+                    logger.warning(f"Lease on sequence enrollment {enrollment_data['id']} was lost; skipping")
+                    return
+                try:
+                    enrollment = SequenceEnrollment(**enrollment_data)
+                    update_data = await self._process_sequence_step(
+                        enrollment,
+                        sequences.get(enrollment.sequence_id),
+                        contacts.get(enrollment.contact_id),
+                        suppressed
+                    )
+                    # Only the lease holder may advance the enrollment; releasing the
+                    # lease in the same write keeps claim and completion atomic
+                    result = await self.enrollments.update_one(
+                        {"id": enrollment.id, "lease_owner": owner},
+                        {
+                            "$set": update_data,
+                            "$unset": {"lease_owner": "", "lease_expires_at": ""}
+                        }
+                    )
+                    if not result.matched_count:
+                        logger.warning(f"Lease on sequence enrollment {enrollment.id} was lost before its step was saved")
+                    if 'current_step' in update_data:
+                        stepped += 1
+                    self.sequence_scheduler.schedule(update_data.get('next_email_at'))
+                except Exception as e:
+                    # The lease is left to expire so another worker retries the step
+                    logger.error(f"Failed to process sequence enrollment {enrollment_data['id']}: {str(e)}")
+                finally:
+                    held.discard(enrollment_data['id'])
+        
+        try:
+            await asyncio.gather(*(process(enrollment_data) for enrollment_data in chunk))
+        finally:
+            heartbeat.cancel()
+        
+        if stepped:
+            # Sent steps log interactions; bump once for the whole chunk
+            await self.versions.bump(self.contacts.name, self.crm_service.interactions.name)
+    
+    async def _renew_enrollment_leases(self, held: Set[str], owner: str):
+        """Extend the leases of a chunk's unprocessed enrollments until cancelled
+        
+        Enrollments no longer leased to `owner` are dropped from `held`.
+        """
+        while True:
+            await asyncio.sleep(self.sequence_lease_seconds / 3)
+            enrollment_ids = list(held)
+            if not enrollment_ids:
+                continue
+            lease_expires_at = datetime.utcnow() + timedelta(seconds=self.sequence_lease_seconds)
             try:
-                enrollment = SequenceEnrollment(**enrollment_data)
-                await self._process_sequence_step(enrollment)
+                await self.enrollments.update_many(
+                    {"id": {"$in": enrollment_ids}, "lease_owner": owner},
+                    {"$set": {"lease_expires_at": lease_expires_at}}
+                )
+                still_held = await self.enrollments.distinct(
+                    "id", {"id": {"$in": enrollment_ids}, "lease_owner": owner}
+                )
             except Exception as e:
-                logger.error(f"Failed to process sequence enrollment {enrollment_data['id']}: {str(e)}")
+                logger.error(f"Failed to renew sequence enrollment leases: {str(e)}")
+                continue
+            held.difference_update(set(enrollment_ids) - set(still_held))
     
-    async def _process_sequence_step(self, enrollment: SequenceEnrollment):
-        """Process a single step in an email sequence"""
-        sequence = await self.get_sequence(enrollment.sequence_id)
-        contact = await self.crm_service.get_contact(enrollment.contact_id)
+    async def _process_sequence_step(self,
+                                     enrollment: SequenceEnrollment,
+                                     sequence: Optional[EmailSequence],
+                                     contact: Optional[Dict[str, Any]],
+                                     suppressed: Set[str]) -> Dict[str, Any]:
+        """Process a single step in an email sequence and return the enrollment update"""
+        completed = {
+            "is_active": False,
+            "completed_at": datetime.utcnow()
+        }
         
-        if not sequence or not contact:
-            return
+        if not sequence:
+            # Usually a lookup miss (e.g. a replica lagging behind the write), so
+            # look again later; a sequence that stays missing ends the enrollment
+            misses = enrollment.sequence_misses + 1
+            if misses >= self.sequence_miss_limit:
+                logger.warning(f"Ending enrollment {enrollment.id}: sequence {enrollment.sequence_id} still not found after {misses} lookups")
+                return {**completed, "sequence_misses": misses}
+            logger.warning(f"Sequence {enrollment.sequence_id} not found for enrollment {enrollment.id}; retrying later")
+            return {"next_email_at": datetime.utcnow() + timedelta(minutes=5), "sequence_misses": misses}
+        
+        if not contact:
+            # Contact was deleted; nothing left to send
+            return completed
         
         if enrollment.current_step >= len(sequence.emails):
             # Sequence completed
-            await self.enrollments.update_one(
-                {"id": enrollment.id},
-                {"$set": {
-                    "is_active": False,
-                    "completed_at": datetime.utcnow()
-                }}
-            )
-            return
+            return completed
         
-        # Get current email step
-        email_step = sequence.emails[enrollment.current_step]
-        
-        # Send email
-        contact_data = {
-            'email': contact.email,
-            'first_name': contact.first_name,
-            'last_name': contact.last_name,
-            'company': contact.company or '',
-            'position': contact.position or '',
-            'city': contact.city or '',
-            'state': contact.state or '',
-            'country': contact.country or '',
-        }
+        if contact['email'].lower() in suppressed:
+            # Suppressed addresses never receive further automated mail
+            logger.info(f"Ending enrollment {enrollment.id}: {contact['email']} is suppressed")
+            return completed
         
+        if contact.get('email_subscribed') is False:
+            logger.info(f"Ending enrollment {enrollment.id}: contact {contact['id']} has unsubscribed")
+            return completed
+        
+        # Render the current step for this contact
+        compiled = self.sequence_cache.get_compiled_step(sequence, enrollment.current_step)
+        contact_data = personalization_values(contact)
+        subject = compiled['subject'].render(contact_data)
+        
+        # Send email, recording how late the step is and how long the send takes
+        if enrollment.next_email_at:
+            registry.histogram(
+                "sequence_send_lag_seconds", "Delay between a step becoming due and being sent"
+            ).observe(max((datetime.utcnow() - enrollment.next_email_at).total_seconds(), 0))
+        started = time.monotonic()
         result = await email_service.send_email(
-            to_email=contact.email,
-            subject=email_step['subject'],
-            html_content=email_step['html_content'],
-            text_content=email_step.get('text_content')
+            to_email=contact['email'],
+            subject=subject,
+            html_content=compiled['html_content'].render(contact_data),
+            text_content=compiled['text_content'].render(contact_data) if compiled['text_content'] else None,
+            lane=SendLane.AUTOMATION
         )
+        registry.histogram(
+            "sequence_step_send_seconds", "Send latency of sequence steps", step=enrollment.current_step
+        ).observe(time.monotonic() - started)
+        
+        if not result['success'] and result.get('retryable'):
+            # Transient provider failure: keep the step and try again later
+            retry_delay = max(result.get('retry_after') or 0, 15 * 60)
+            return {"next_email_at": datetime.utcnow() + timedelta(seconds=retry_delay)}
         
         if result['success']:
             # Log interaction
             await self.crm_service._create_interaction(
-                contact.id,
+                contact['id'],
                 InteractionType.EMAIL_SENT,
-                f"Sequence email sent: {email_step['subject']}",
+                f"Sequence email sent: {subject}",
                 {
                     "sequence_id": sequence.id,
                     "step": enrollment.current_step,
@@ -359,39 +819,425 @@ class CampaignService:
             update_data["next_email_at"] = datetime.utcnow() + timedelta(hours=delay_hours)
         else:
             # No more steps, mark as completed
-            update_data["is_active"] = False
-            update_data["completed_at"] = datetime.utcnow()
+            update_data.update(completed)
+        
+        return update_data
+    
+    async def get_backlog_metrics(self) -> Dict[str, Any]:
+        """How far behind sequence and campaign sending is
+        
+        Lag percentiles are exact: due enrollments are walked in
+        `next_email_at` order on the (is_active, next_email_at) index, so the
+        q-th percentile lag is the enrollment at rank (1 - q) * due.
+        """
+        now = datetime.utcnow()
+        due_query = {"is_active": True, "next_email_at": {"$lte": now}}
+        due = await self.enrollments.count_documents(due_query)
+        
+        lag = {"p50": None, "p95": None, "p99": None, "max": None}
+        if due:
+            for label, quantile in (("max", 1.0), ("p99", 0.99), ("p95", 0.95), ("p50", 0.5)):
+                rank = min(int((1 - quantile) * due), due - 1)
+                enrollment = await self.enrollments.find(
+                    due_query, {"_id": 0, "next_email_at": 1}
+                ).sort("next_email_at", ASCENDING).skip(rank).limit(1).to_list(length=1)
+                if enrollment:
+                    lag[label] = (now - enrollment[0]['next_email_at']).total_seconds()
+        
+        step_latency = {
+            dict(labels)['step']: histogram.summary()
+            for labels, histogram in registry.series("sequence_step_send_seconds").items()
+        }
+        campaign_queues = {
+            dict(labels)['campaign_id']: int(gauge.value)
+            for labels, gauge in registry.series("campaign_queue_depth").items()
+        }
+        
+        return {
+            "sequences": {
+                "due_unsent": due,
+                "lag_seconds": lag,
+                "send_lag_seconds": registry.histogram(
+                    "sequence_send_lag_seconds", "Delay between a step becoming due and being sent"
+                ).summary(),
+                "step_send_seconds": step_latency,
+                "scheduler": self.sequence_scheduler.get_stats(),
+            },
+            "campaigns": {
+                "queue_depth": campaign_queues,
+            },
+            "lanes": email_service.scheduler.get_stats()['lanes'],
+            "generated_at": now,
+        }
+    
+    async def process_email_retries(self, limit: int = 500) -> Dict[str, int]:
+        """Re-send queued emails that previously failed with a retryable error"""
+        if email_service.circuit_breaker.retry_after() > 0:
+            # Provider still down; leave the queue untouched until the circuit admits a probe
+            return {"sent": 0, "failed": 0, "skipped": 0}
+        
+        entries = await self.email_retries.claim_due(limit)
+        counts = {"sent": 0, "failed": 0, "skipped": 0}
+        
+        # The recipient may have been suppressed or unsubscribed since the first
+        # attempt, so repeat the checks that attempt made
+        suppressed = await email_service.get_suppressed([
+            entry['to_email'] for entry in entries if entry.get('lane') != SendLane.TRANSACTIONAL.value
+        ])
+        contacts = await self.crm_service.contact_cache.get_many(
+            {entry['contact_id'] for entry in entries if entry.get('contact_id')},
+            {"_id": 0, "id": 1, "email_subscribed": 1}
+        )
+        
+        def skip_reason(entry: Dict[str, Any]) -> Optional[str]:
+            if entry['to_email'].lower() in suppressed:
+                return "Recipient is suppressed"
+            if entry.get('contact_id'):
+                contact = contacts.get(entry['contact_id'])
+                if contact is None:
+                    return "Contact was deleted"
+                if contact.get('email_subscribed') is False:
+                    return "Contact has unsubscribed"
+            return None
+        
+        async def retry(entry: Dict[str, Any]):
+            reason = skip_reason(entry)
+            if reason:
+                counts["skipped"] += 1
+                await self.email_retries.mark_skipped(entry, reason)
+                return
+            
+            personalization = entry.get('personalization') or {}
+            values = personalization_values(personalization)
+            result = await email_service.send_email(
+                to_email=entry['to_email'],
+                subject=render(entry['subject'], values),
+                html_content=render(entry['html_content'], values),
+                text_content=render(entry.get('text_content'), values),
+                lane=SendLane(entry.get('lane', SendLane.BULK.value))
+            )
+            
+            if not result['success']:
+                counts["failed"] += 1
+                await self.email_retries.mark_failed(
+                    entry, result.get('error'), result.get('retryable', False), result.get('retry_after')
+                )
+                return
+            
+            counts["sent"] += 1
+            await self.email_retries.mark_sent(entry)
+            if entry.get('campaign_id'):
+                await self.campaigns.update_one(
+                    {"id": entry['campaign_id']},
+                    {"$inc": {"emails_delivered": 1}, "$set": {"updated_at": datetime.utcnow()}}
+                )
+                await self.campaign_sends.update_one(
+                    {"campaign_id": entry['campaign_id'], "contact_id": entry.get('contact_id')},
+                    {"$set": {"status": "delivered", "message_id": result.get('message_id'), "updated_at": datetime.utcnow()}}
+                )
+            if entry.get('contact_id') and entry.get('interaction_description'):
+                await self.crm_service._create_interaction(
+                    entry['contact_id'],
+                    InteractionType.EMAIL_SENT,
+                    entry['interaction_description'],
+                    {**entry.get('interaction_metadata', {}), "message_id": result.get('message_id')}
+                )
+        
+        results = await asyncio.gather(*(retry(entry) for entry in entries), return_exceptions=True)
+        for entry, result in zip(entries, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to retry email {entry['id']}: {str(result)}")
+        if counts["sent"]:
+            await self.versions.bump(self.campaigns.name, self.contacts.name, self.crm_service.interactions.name)
+        
+        if entries:
+            logger.info(
+                f"Processed email retries: {counts['sent']} sent, {counts['failed']} failed, "
+                f"{counts['skipped']} skipped"
+            )
+        return counts
+    
+    async def trigger_sequences_for_contact(self,
+                                            contact: Contact,
+                                            trigger_type: str = "status_change",
+                                            tags: Optional[List[str]] = None,
+                                            include_status: bool = True) -> List[Dict[str, Any]]:
+        """Check and trigger sequences for a contact based on their attributes
+
+        By default every tag and the current status are considered; pass `tags`
+        and `include_status` to only react to what actually changed.
+        Unsubscribed contacts are never enrolled.
+        """
+        if not contact.email_subscribed:
+            return []
+        sequences = await self.sequence_cache.get_triggered(
+            contact.tags if tags is None else tags,
+            contact.status if include_status else None
+        )
+        if not sequences:
+            return []
+        
+        created = await self._upsert_enrollments(contact.id, sequences)
+        if created:
+            logger.info(f"Contact {contact.id} enrolled in {len(created)} sequences on {trigger_type}")
+        return created
+    
+    async def _on_contact_changed(self, contact: Contact, previous: Optional[Contact] = None) -> bool:
+        """Fire tag and status triggers for a created or updated contact
+
+        For a new contact, returns True if a sequence triggered by its status
+        (the welcome sequence) enrolled it, so the standalone welcome email is
+        skipped.
+        """
+        if previous is None:
+            created = await self.trigger_sequences_for_contact(contact, "contact_created")
+            welcome_ids = {sequence.id for sequence in await self.sequence_cache.get_triggered(status=contact.status)}
+            return any(enrollment['sequence_id'] in welcome_ids for enrollment in created)
+        
+        added_tags = [tag for tag in contact.tags if tag not in previous.tags]
+        status_changed = contact.status != previous.status
+        if added_tags or status_changed:
+            await self.trigger_sequences_for_contact(
+                contact,
+                "status_change" if status_changed else "tag_added",
+                tags=added_tags,
+                include_status=status_changed
+            )
+        return False
+    
+    # Bulk Enrollment
+    def _build_segment_query(self, segment: BulkEnrollmentRequest) -> Dict[str, Any]:
+        """Translate a segment filter into a contacts query"""
+        if not (segment.contact_ids or segment.tags or segment.status or segment.lead_source):
+            raise ValueError("Segment must specify contact_ids, tags, status or lead_source")
         
-        await self.enrollments.update_one(
-            {"id": enrollment.id},
-            {"$set": update_data}
+        # Contacts created through the API may not store the flag; it defaults to subscribed
+        query = {"email_subscribed": {"$ne": False}}
+        if segment.contact_ids:
+            query['id'] = {"$in": segment.contact_ids}
+        if segment.tags:
+            query['tags'] = {"$in": segment.tags}
+        if segment.status:
+            query['status'] = {"$in": segment.status}
+        if segment.lead_source:
+            query['lead_source'] = {"$in": segment.lead_source}
+        return query
+    
+    async def create_enrollment_job(self, sequence_id: str, segment: BulkEnrollmentRequest) -> Optional[EnrollmentJob]:
+        """Create a job that enrolls a whole segment into a sequence"""
+        sequence = await self.sequence_cache.get(sequence_id)
+        if not sequence:
+            return None
+        
+        query = self._build_segment_query(segment)
+        job = EnrollmentJob(
+            sequence_id=sequence_id,
+            segment=segment.dict(),
+            total_contacts=await self.contacts.count_documents(query)
         )
+        await self.enrollment_jobs.insert_one(job.dict())
+        return job
+    
+    async def get_enrollment_job(self, job_id: str) -> Optional[EnrollmentJob]:
+        """Get a bulk enrollment job and its progress"""
+        job_data = await self.enrollment_jobs.find_one({"id": job_id})
+        return EnrollmentJob(**job_data) if job_data else None
     
-    async def trigger_sequences_for_contact(self, contact: Contact, trigger_type: str = "status_change"):
-        """Check and trigger sequences for a contact based on their attributes"""
-        # Find sequences that should be triggered for this contact
-        query = {"status": "active"}
-        
-        # Check trigger conditions
-        if contact.tags:
-            tag_sequences = await self.sequences.find({
-                "status": "active",
-                "trigger_tags": {"$in": contact.tags}
-            }).to_list(length=None)
+    async def run_enrollment_job(self, job_id: str, batch_size: int = 1000):
+        """Enroll every contact in a job's segment, in batches
+
+        Contacts are walked in id order, and each batch's counters are
+        recorded in the same write as the last contact id it covered, so a job
+        resumed after a worker died mid-way continues after that checkpoint
+        and counts every contact once.
+        """
+        job_data = await self.enrollment_jobs.find_one({"id": job_id}, {"_id": 0})
+        job = EnrollmentJob(**job_data) if job_data else None
+        # A running job is resumed after a worker died mid-way; enrollment is idempotent
+        if not job or job.status not in (JobStatus.PENDING, JobStatus.RUNNING):
+            return
+        
+        await self.enrollment_jobs.update_one(
+            {"id": job_id},
+            {"$set": {"status": JobStatus.RUNNING, "updated_at": datetime.utcnow()}}
+        )
+        
+        try:
+            sequence = await self.sequence_cache.get(job.sequence_id)
+            query = self._build_segment_query(BulkEnrollmentRequest(**job.segment))
+            checkpoint = job_data.get('last_contact_id')
+            if checkpoint:
+                query['id'] = {**query.get('id', {}), "$gt": checkpoint}
+            
+            # Every enrollment in the job starts at the same time
+            template = self._build_enrollment("", job.sequence_id, sequence)
+            self.sequence_scheduler.schedule(template.get('next_email_at'))
+            
+            cursor = self.contacts.find(query, {"_id": 0, "id": 1}, batch_size=batch_size).sort("id", ASCENDING)
+            batch = []
+            async for contact in cursor:
+                batch.append(contact['id'])
+                if len(batch) >= batch_size:
+                    await self._enroll_batch(job_id, sequence, template, batch)
+                    batch = []
+            if batch:
+                await self._enroll_batch(job_id, sequence, template, batch)
             
-            for sequence_data in tag_sequences:
-                sequence = EmailSequence(**sequence_data)
-                await self.enroll_contact_in_sequence(contact.id, sequence.id)
-        
-        # Check status-based triggers
-        status_sequences = await self.sequences.find({
-            "status": "active",
-            "trigger_status": contact.status
-        }).to_list(length=None)
-        
-        for sequence_data in status_sequences:
-            sequence = EmailSequence(**sequence_data)
-            await self.enroll_contact_in_sequence(contact.id, sequence.id)
+            await self.enrollment_jobs.update_one(
+                {"id": job_id},
+                {"$set": {
+                    "status": JobStatus.COMPLETED,
+                    "updated_at": datetime.utcnow(),
+                    "completed_at": datetime.utcnow()
+                }}
+            )
+        except Exception as e:
+            logger.error(f"Enrollment job {job_id} failed: {str(e)}")
+            await self.enrollment_jobs.update_one(
+                {"id": job_id},
+                {"$set": {"status": JobStatus.FAILED, "error": str(e), "updated_at": datetime.utcnow()}}
+            )
+    
+    async def _enroll_batch(self, job_id: str, sequence: EmailSequence, template: Dict[str, Any], contact_ids: List[str]):
+        """Insert one batch of enrollments, skip duplicates and write the enrollment notes in bulk"""
+        enrollments = [
+            {**template, 'id': str(uuid.uuid4()), 'contact_id': contact_id}
+            for contact_id in contact_ids
+        ]
+        
+        try:
+            await self.enrollments.insert_many(enrollments, ordered=False)
+            failed_indexes = set()
+        except BulkWriteError as e:
+            # Duplicates are contacts already active in the sequence
+            if any(error['code'] != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+            failed_indexes = {error['index'] for error in e.details.get('writeErrors', [])}
+        
+        enrolled_ids = [contact_id for i, contact_id in enumerate(contact_ids) if i not in failed_indexes]
+        
+        if enrolled_ids:
+            now = datetime.utcnow()
+            await self.crm_service.interactions.insert_many([
+                {
+                    'id': str(uuid.uuid4()),
+                    'contact_id': contact_id,
+                    'type': InteractionType.NOTE_ADDED,
+                    'description': f"Enrolled in email sequence: {sequence.name}",
+                    'metadata': {"sequence_id": sequence.id, "enrollment_job_id": job_id},
+                    'created_at': now,
+                    'created_by': None
+                }
+                for contact_id in enrolled_ids
+            ], ordered=False)
+            await self.contacts.update_many(
+                {"id": {"$in": enrolled_ids}},
+                {"$inc": {"total_interactions": 1}, "$set": {"last_interaction_date": now}}
+            )
+            self.crm_service.contact_cache.invalidate(*enrolled_ids)
+            await self.versions.bump(self.contacts.name, self.crm_service.interactions.name)
+        
+        await self.enrollment_jobs.update_one(
+            {"id": job_id},
+            {
+                "$inc": {
+                    "processed": len(contact_ids),
+                    "enrolled": len(enrolled_ids),
+                    "skipped": len(failed_indexes)
+                },
+                # Checkpoint for a resumed job, written with the counters it accounts for
+                "$set": {"last_contact_id": contact_ids[-1], "updated_at": datetime.utcnow()}
+            }
+        )
+    
+    # Enrollment Archival
+    async def archive_enrollments(self, stale_after_days: int = 30, batch_size: int = 1000) -> Dict[str, int]:
+        """Move finished enrollments out of the hot collection into a compact history
+
+        Completed enrollments are archived as they are found. Active enrollments
+        that can never send (no next_email_at) are archived as stale once they
+        are older than `stale_after_days`. Per-sequence totals are kept in
+        sequence_stats.
+        """
+        stale_cutoff = datetime.utcnow() - timedelta(days=stale_after_days)
+        counts = {"completed": 0, "stale": 0}
+        
+        for outcome, query in (
+            ("completed", {"is_active": False}),
+            ("stale", {"is_active": True, "next_email_at": None, "enrolled_at": {"$lt": stale_cutoff}}),
+        ):
+            while True:
+                batch = await self.enrollments.find(query).limit(batch_size).to_list(length=batch_size)
+                if not batch:
+                    break
+                counts[outcome] += await self._archive_batch(batch, outcome, query)
+        
+        if counts["completed"] or counts["stale"]:
+            logger.info(f"Archived enrollments: {counts['completed']} completed, {counts['stale']} stale")
+        return counts
+    
+    async def _archive_batch(self, batch: List[Dict[str, Any]], outcome: str, query: Dict[str, Any]) -> int:
+        """Copy one batch into the history collection, then delete it from the hot collection"""
+        now = datetime.utcnow()
+        sequences = await self.sequence_cache.get_many(enrollment['sequence_id'] for enrollment in batch)
+        history = [
+            EnrollmentHistory(
+                id=enrollment['id'],
+                contact_id=enrollment['contact_id'],
+                sequence_id=enrollment['sequence_id'],
+                sequence_name=sequences[enrollment['sequence_id']].name if enrollment['sequence_id'] in sequences else None,
+                steps_sent=enrollment.get('current_step', 0),
+                outcome=outcome,
+                enrolled_at=enrollment['enrolled_at'],
+                completed_at=enrollment.get('completed_at') or now,
+                archived_at=now
+            ).dict()
+            for enrollment in batch
+        ]
+        
+        try:
+            await self.enrollment_history.insert_many(history, ordered=False)
+            duplicate_indexes = set()
+        except BulkWriteError as e:
+            # Already archived by an earlier run that stopped before deleting
+            if any(error['code'] != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+            duplicate_indexes = {error['index'] for error in e.details.get('writeErrors', [])}
+        
+        await self.enrollments.delete_many({**query, "id": {"$in": [enrollment['id'] for enrollment in batch]}})
+        
+        # Roll newly archived enrollments up into per-sequence totals
+        totals: Dict[str, Dict[str, int]] = {}
+        for i, entry in enumerate(history):
+            if i in duplicate_indexes:
+                continue
+            sequence_totals = totals.setdefault(entry['sequence_id'], {outcome: 0, "steps_sent": 0})
+            sequence_totals[outcome] += 1
+            sequence_totals["steps_sent"] += entry['steps_sent']
+        
+        if totals:
+            await self.sequence_stats.bulk_write([
+                UpdateOne(
+                    {"sequence_id": sequence_id},
+                    {"$inc": increments, "$set": {"last_archived_at": now}},
+                    upsert=True
+                )
+                for sequence_id, increments in totals.items()
+            ], ordered=False)
+        
+        return len(batch) - len(duplicate_indexes)
+    
+    async def get_contact_enrollment_history(self, contact_id: str, limit: int = 50) -> List[EnrollmentHistory]:
+        """Get archived enrollments for a contact, most recent first"""
+        cursor = self.enrollment_history.find({"contact_id": contact_id}).sort("archived_at", -1).limit(limit)
+        history = await cursor.to_list(length=limit)
+        return [EnrollmentHistory(**entry) for entry in history]
+    
+    async def get_sequence_stats(self, sequence_id: str) -> SequenceStats:
+        """Get archived totals and the live active enrollment count for a sequence"""
+        stats_data = await self.sequence_stats.find_one({"sequence_id": sequence_id}, {"_id": 0}) or {}
+        active = await self.enrollments.count_documents({"sequence_id": sequence_id, "is_active": True})
+        return SequenceStats(**{**stats_data, "sequence_id": sequence_id, "active_enrollments": active})
     
     async def create_default_templates(self):
         """Create default email templates for OpsVantage"""
@@ -0,0 +1,98 @@
+import time
+from enum import Enum
+from typing import Any, Dict, Optional
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    callers fail fast for `reset_timeout` seconds. It then lets a single probe
+    through (half-open); a successful probe closes the circuit, a failed one
+    re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.total_failures = 0
+        self.total_successes = 0
+        self.rejected = 0
+        self.times_opened = 0
+        self.last_error: Optional[str] = None
+
+    def allow_request(self) -> bool:
+        """Whether a call may proceed right now"""
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = CircuitState.HALF_OPEN
+            self.probe_in_flight = False
+
+        if self.state == CircuitState.HALF_OPEN:
+            if self.probe_in_flight:
+                self.rejected += 1
+                return False
+            self.probe_in_flight = True
+
+        return True
+
+    def record_success(self):
+        self.total_successes += 1
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+        self.state = CircuitState.CLOSED
+        self.opened_at = None
+
+    def record_failure(self, error: Optional[str] = None):
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        self.last_error = error
+        if self.state == CircuitState.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != CircuitState.OPEN:
+                self.times_opened += 1
+            self.state = CircuitState.OPEN
+            self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def release_probe(self):
+        """Give back a half-open probe slot that ended without a verdict"""
+        self.probe_in_flight = False
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit will admit a probe"""
+        if self.state != CircuitState.OPEN or self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def get_state(self) -> Dict[str, Any]:
+        """Breaker state for health reporting"""
+        if self.state == CircuitState.OPEN and self.retry_after() == 0:
+            state = CircuitState.HALF_OPEN
+        else:
+            state = self.state
+        return {
+            "name": self.name,
+            "state": state.value,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_seconds": self.reset_timeout,
+            "retry_after_seconds": round(self.retry_after(), 3),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "total_failures": self.total_failures,
+            "total_successes": self.total_successes,
+            "last_error": self.last_error,
+        }
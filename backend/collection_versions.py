@@ -0,0 +1,40 @@
+import uuid
+from typing import Callable, Dict, List
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+
+class CollectionVersions:
+    """Change counters for collections whose reads are cached by clients.
+
+    Every write to a tracked collection bumps its counter, so a cached
+    response is still current as long as the counters it was built from are
+    unchanged; checking that costs one point lookup instead of rebuilding the
+    response. Each counter document also carries a random epoch set when it is
+    created, so counters that restart after the document is lost never repeat
+    an old version.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.versions = db.collection_versions
+        self._listeners: List[Callable[..., None]] = []
+
+    def add_listener(self, listener: Callable[..., None]):
+        """Register a function called as listener(*names) after collections are bumped"""
+        self._listeners.append(listener)
+
+    async def bump(self, *names: str):
+        """Record a write to each of the named collections"""
+        for name in names:
+            await self.versions.update_one(
+                {"_id": name},
+                {"$inc": {"version": 1}, "$setOnInsert": {"epoch": uuid.uuid4().hex}},
+                upsert=True
+            )
+        for listener in self._listeners:
+            listener(*names)
+
+    async def get(self, *names: str) -> Dict[str, str]:
+        """Current `epoch:version` token for each named collection (`0` if never written)"""
+        documents = await self.versions.find({"_id": {"$in": list(names)}}).to_list(length=len(names))
+        found = {document['_id']: f"{document['epoch']}:{document['version']}" for document in documents}
+        return {name: found.get(name, "0") for name in names}
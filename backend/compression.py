@@ -0,0 +1,188 @@
+import zlib
+from typing import Iterable, Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from metrics import registry
+
+try:
+    import brotli
+except ImportError:  # optional; without it only gzip is offered
+    brotli = None
+
+DEFAULT_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/html",
+    "text/plain",
+    "text/csv",
+    "text/css",
+    "application/javascript",
+)
+
+
+class _BrotliStream:
+    """Brotli compressor with the same compress/flush interface as zlib's"""
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+def new_compressor(encoding: str, level: int):
+    """Streaming compressor for a `Content-Encoding` (`gzip` or `br`)"""
+    if encoding == "br":
+        return _BrotliStream(level)
+    return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """Map each coding in an `Accept-Encoding` header to its q-value"""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing large text responses with brotli or gzip.
+
+    Responses are compressed only when the client accepts a supported coding,
+    the content type is in `content_types` and the body is at least
+    `minimum_size` bytes. At most `minimum_size` bytes are held back to make
+    that decision; after that each body chunk is compressed and sent as it
+    arrives, so large and streaming responses are never buffered whole.
+    Brotli is preferred when the `brotli` package is installed. Every
+    response of a compressible type carries `Vary: Accept-Encoding`, whether
+    or not it ends up compressed, so shared caches keep the variants apart.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 4, content_types: Iterable[str] = DEFAULT_COMPRESSIBLE_TYPES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level}
+        if brotli is not None:
+            self.levels["br"] = brotli_quality
+        self.content_types = tuple(content_type.strip().lower() for content_type in content_types if content_type.strip())
+
+    def choose_encoding(self, accept_encoding: str) -> Optional[str]:
+        """Best supported coding the client accepts, preferring brotli on ties"""
+        accepted = parse_accept_encoding(accept_encoding)
+        best: Optional[Tuple[float, int, str]] = None
+        for preference, encoding in enumerate(["gzip", "br"]):
+            if encoding not in self.levels:
+                continue
+            quality = accepted.get(encoding, accepted.get("*", 0.0))
+            if quality > 0 and (best is None or (quality, preference) > best[:2]):
+                best = (quality, preference, encoding)
+        return best[2] if best else None
+
+    def is_compressible(self, status: int, headers: Headers) -> bool:
+        """Whether a response with this status and headers is a candidate for compression"""
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return content_type in self.content_types
+
+    def should_compress(self, status: int, headers: Headers) -> bool:
+        """Whether a response with this status and headers is worth compressing"""
+        if not self.is_compressible(status, headers):
+            return False
+        content_length = headers.get("content-length")
+        return content_length is None or int(content_length) >= self.minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = None
+        if scope["method"] != "HEAD":
+            encoding = self.choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        await self.app(scope, receive, _CompressingSender(self, encoding, send).send)
+
+
+class _CompressingSender:
+    """Per-response state for `CompressionMiddleware`"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: Optional[str], send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start: Optional[Message] = None
+        self.passthrough = False
+        self.buffer = bytearray()
+        self.compressor = None
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(raw=list(message["headers"]))
+            if self.middleware.is_compressible(message["status"], headers):
+                # The representation depends on Accept-Encoding even when it is sent uncompressed
+                headers.add_vary_header("Accept-Encoding")
+                message["headers"] = headers.raw
+            self.start = message
+            if self.encoding is None or not self.middleware.should_compress(message["status"], headers):
+                self.passthrough = True
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            # Hold back the first bytes until we know the body is big enough
+            self.buffer += body
+            if len(self.buffer) < self.middleware.minimum_size:
+                if more_body:
+                    return
+                self.passthrough = True
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": bytes(self.buffer)})
+                return
+            await self._start_compressing()
+            body = bytes(self.buffer)
+            self.buffer = bytearray()
+
+        compressed = self.compressor.compress(body)
+        if not more_body:
+            compressed += self.compressor.flush()
+        self.bytes_in.inc(len(body))
+        self.bytes_out.inc(len(compressed))
+        if compressed or not more_body:
+            await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+    async def _start_compressing(self):
+        self.compressor = new_compressor(self.encoding, self.middleware.levels[self.encoding])
+        self.bytes_in = registry.counter(
+            "http_compression_input_bytes_total", "Response bytes before compression", encoding=self.encoding
+        )
+        self.bytes_out = registry.counter(
+            "http_compression_output_bytes_total", "Response bytes after compression", encoding=self.encoding
+        )
+        headers = MutableHeaders(raw=list(self.start["headers"]))
+        del headers["content-length"]
+        headers["content-encoding"] = self.encoding
+        # The compressed bytes differ from the identity representation, so a strong ETag must be weakened
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["etag"] = f"W/{etag}"
+        self.start["headers"] = headers.raw
+        await self._send(self.start)
@@ -0,0 +1,141 @@
+"""Compression benchmark: python compression_benchmark.py [--url URL ...]
+
+Compresses representative API payloads (a 1000-contact page and a template
+list with large HTML bodies, or live responses fetched with --url) with
+every gzip level and brotli quality the middleware can use, streaming them
+in chunks the way CompressionMiddleware does. Prints CPU time per payload
+against bytes saved, to pick COMPRESSION_GZIP_LEVEL / COMPRESSION_BROTLI_QUALITY.
+"""
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import orjson
+import typer
+from compression import brotli, new_compressor
+
+app = typer.Typer(help="Benchmark response compression settings")
+
+CHUNK_SIZE = 64 * 1024
+GZIP_LEVELS = [1, 4, 6, 9]
+BROTLI_QUALITIES = [1, 4, 6, 11]
+
+
+def sample_contacts(count: int = 1000) -> bytes:
+    """A contacts page shaped like GET /api/contacts?limit=1000"""
+    rng = random.Random(42)
+    statuses = ["new", "contacted", "qualified", "proposal", "customer", "lost"]
+    sources = ["website", "referral", "social_media", "email_campaign", "cold_outreach", "event"]
+    tags = ["saas", "enterprise", "smb", "newsletter", "webinar", "trial", "priority"]
+    now = datetime.utcnow()
+    contacts = []
+    for i in range(count):
+        created = now - timedelta(days=rng.randint(0, 720))
+        contacts.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "first_name": f"First{i}",
+            "last_name": f"Last{rng.randint(0, 5000)}",
+            "email": f"contact{i}@example{rng.randint(0, 300)}.com",
+            "phone": f"+1-555-{rng.randint(1000, 9999)}",
+            "company": f"Company {rng.randint(0, 400)}",
+            "position": rng.choice(["CEO", "CTO", "Marketing Manager", "Engineer", "Founder"]),
+            "status": rng.choice(statuses),
+            "lead_source": rng.choice(sources),
+            "lead_score": rng.randint(0, 100),
+            "city": rng.choice(["Austin", "Denver", "Boston", "Seattle"]),
+            "state": rng.choice(["TX", "CO", "MA", "WA"]),
+            "country": "US",
+            "email_subscribed": rng.random() > 0.1,
+            "tags": rng.sample(tags, rng.randint(0, 3)),
+            "custom_fields": {},
+            "notes": "",
+            "created_at": created,
+            "updated_at": created,
+            "total_interactions": rng.randint(0, 50),
+            "email_opens": rng.randint(0, 20),
+            "email_clicks": rng.randint(0, 10),
+            "website_visits": rng.randint(0, 30),
+        })
+    return orjson.dumps(contacts)
+
+
+def sample_templates(count: int = 25) -> bytes:
+    """A template list shaped like GET /api/templates, with large HTML bodies"""
+    rng = random.Random(7)
+    templates = []
+    for i in range(count):
+        sections = "".join(
+            f'<tr><td style="padding:16px;font-family:Arial,sans-serif;color:#333">'
+            f'<h2>Section {j}: update {rng.randint(0, 10000)}</h2><p>Hi {{{{first_name}}}}, '
+            f'here is what changed at {{{{company}}}} this week.</p>'
+            f'<a href="https://example.com/offer/{rng.randint(0, 99999)}">Read more</a></td></tr>'
+            for j in range(40)
+        )
+        templates.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "name": f"Newsletter {i}",
+            "subject": f"Weekly update #{i}",
+            "html_content": f"<html><body><table>{sections}</table></body></html>",
+            "text_content": None,
+            "template_type": "newsletter",
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+        })
+    return orjson.dumps(templates)
+
+
+def compress_streaming(payload: bytes, encoding: str, level: int) -> bytes:
+    """Compress `payload` in CHUNK_SIZE pieces, as the middleware does for streamed bodies"""
+    compressor = new_compressor(encoding, level)
+    parts = [compressor.compress(payload[i:i + CHUNK_SIZE]) for i in range(0, len(payload), CHUNK_SIZE)]
+    parts.append(compressor.flush())
+    return b"".join(parts)
+
+
+def benchmark(payload: bytes, encoding: str, level: int, rounds: int) -> Dict[str, float]:
+    """CPU time and size for compressing `payload` with one setting"""
+    started = time.process_time()
+    for _ in range(rounds):
+        compressed = compress_streaming(payload, encoding, level)
+    cpu_ms = (time.process_time() - started) / rounds * 1000
+    return {
+        "compressed": len(compressed),
+        "cpu_ms": cpu_ms,
+        "saved_pct": 100 * (1 - len(compressed) / len(payload)),
+        "mb_per_s": len(payload) / 1_000_000 / (cpu_ms / 1000) if cpu_ms else float("inf"),
+    }
+
+
+@app.command()
+def run(
+    url: Optional[List[str]] = typer.Option(None, help="Benchmark the body of this API URL instead of sample payloads"),
+    rounds: int = typer.Option(20, help="Compressions per setting, averaged"),
+):
+    """Print CPU cost against bytes saved for each compression setting"""
+    if url:
+        import requests
+        payloads = {u: requests.get(u, headers={"Accept-Encoding": "identity"}).content for u in url}
+    else:
+        payloads = {"contacts (limit=1000)": sample_contacts(), "templates (25 HTML bodies)": sample_templates()}
+
+    settings = [("gzip", level) for level in GZIP_LEVELS]
+    if brotli is not None:
+        settings += [("br", quality) for quality in BROTLI_QUALITIES]
+    else:
+        typer.echo("brotli is not installed; benchmarking gzip only\n")
+
+    for name, payload in payloads.items():
+        typer.echo(f"{name}: {len(payload) / 1024:.1f} KB")
+        typer.echo(f"  {'setting':<10}{'size KB':>10}{'saved':>9}{'CPU ms':>9}{'MB/s':>9}")
+        for encoding, level in settings:
+            result = benchmark(payload, encoding, level, rounds)
+            typer.echo(
+                f"  {f'{encoding}-{level}':<10}{result['compressed'] / 1024:>10.1f}"
+                f"{result['saved_pct']:>8.1f}%{result['cpu_ms']:>9.2f}{result['mb_per_s']:>9.1f}"
+            )
+        typer.echo("")
+
+
+if __name__ == "__main__":
+    app()
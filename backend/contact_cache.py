@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import OperationFailure, PyMongoError
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class ContactCache:
+    """Bounded in-process LRU of contact documents keyed by contact id.
+
+    Reads go through the cache (`get`, `get_many`); every write path calls
+    `invalidate` for the contacts it touched, so this process never serves a
+    contact older than its own last write. Writes from other processes are
+    picked up when an entry is older than `ttl` seconds, or immediately when
+    `watch()` follows the collection's change stream (replica sets only).
+
+    Cached documents are shared between callers and must be treated as
+    read-only.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, max_size: int = 10000, ttl: float = 60.0):
+        self.collection = collection
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Bumped on every invalidation; a read that raced a write doesn't fill the cache
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._hit_counter = registry.counter("contact_cache_requests_total", "Contact cache lookups", result="hit")
+        self._miss_counter = registry.counter("contact_cache_requests_total", "Contact cache lookups", result="miss")
+        self._evictions = registry.counter("contact_cache_evictions_total", "Contacts evicted from the cache")
+        self._size = registry.gauge("contact_cache_size", "Contacts currently cached")
+
+    def _lookup(self, contact_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(contact_id)
+        if entry is None:
+            return None
+        loaded_at, document = entry
+        if time.monotonic() - loaded_at >= self.ttl:
+            del self._entries[contact_id]
+            return None
+        self._entries.move_to_end(contact_id)
+        return document
+
+    def _store(self, document: Dict[str, Any], generation: int):
+        if generation != self._generation:
+            return
+        self._entries[document['id']] = (time.monotonic(), document)
+        self._entries.move_to_end(document['id'])
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evictions.inc()
+        self._size.set(len(self._entries))
+
+    def _record(self, hits: int, misses: int):
+        self.hits += hits
+        self.misses += misses
+        self._hit_counter.inc(hits)
+        self._miss_counter.inc(misses)
+
+    async def get(self, contact_id: str, fresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Contact document by id, from the cache or Mongo
+
+        `fresh=True` always reads Mongo (and refreshes the cache), for
+        read-modify-write paths that must not start from a stale copy.
+        """
+        if not fresh:
+            document = self._lookup(contact_id)
+            if document is not None:
+                self._record(1, 0)
+                return document
+            self._record(0, 1)
+        generation = self._generation
+        document = await self.collection.find_one({"id": contact_id}, {"_id": 0})
+        if document is not None:
+            self._store(document, generation)
+        return document
+
+    async def get_many(self, contact_ids: Iterable[str],
+                       projection: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+        """Contact documents by id for every id that exists, fetching misses in one query
+
+        With a `projection`, misses are fetched with only those fields and,
+        being partial, are not cached; hits are returned whole.
+        """
+        found: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for contact_id in set(contact_ids):
+            document = self._lookup(contact_id)
+            if document is not None:
+                found[contact_id] = document
+            else:
+                missing.append(contact_id)
+        self._record(len(found), len(missing))
+        if missing:
+            generation = self._generation
+            async for document in self.collection.find({"id": {"$in": missing}}, projection or {"_id": 0}):
+                found[document['id']] = document
+                if projection is None:
+                    self._store(document, generation)
+        return found
+
+    def invalidate(self, *contact_ids: str):
+        """Drop contacts after a write so the next read reloads them"""
+        self._generation += 1
+        for contact_id in contact_ids:
+            self._entries.pop(contact_id, None)
+        self._size.set(len(self._entries))
+
+    def clear(self):
+        """Drop every cached contact"""
+        self._generation += 1
+        self._entries.clear()
+        self._size.set(0)
+
+    async def watch(self, retry_interval: float = 5.0):
+        """Invalidate contacts written by other processes, following the change stream until cancelled"""
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        while True:
+            try:
+                async with self.collection.watch(pipeline, full_document="updateLookup") as stream:
+                    logger.info("Following contact changes for cache invalidation")
+                    async for change in stream:
+                        document = change.get("fullDocument")
+                        if document and document.get('id'):
+                            self.invalidate(document['id'])
+                        else:
+                            # Deletes only carry the ObjectId, which the cache isn't keyed by
+                            self.clear()
+            except OperationFailure as e:
+                # e.g. a standalone server, which has no change streams; entries still expire after ttl
+                logger.warning(f"Contact change stream unavailable, relying on cache ttl: {str(e)}")
+                return
+            except PyMongoError as e:
+                logger.error(f"Contact change stream failed, restarting: {str(e)}")
+                # Changes may have been missed while the stream was down
+                self.clear()
+            await asyncio.sleep(retry_interval)
+
+    def get_stats(self):
+        """Size and hit rate for diagnostics"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
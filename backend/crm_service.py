@@ -1,23 +1,73 @@
-import asyncio
+import base64
 import logging
+import os
 from datetime import datetime, timedelta, date
 from typing import List, Dict, Any, Optional, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING
 from models import (
     Contact, ContactCreate, ContactUpdate, ContactStatus, LeadSource,
     Interaction, InteractionCreate, InteractionType,
-    ContactAnalytics, DashboardStats, LeadSourceStats, ContactStatusStats, RecentActivity
+    ContactAnalytics, DashboardStats, LeadSourceStats, ContactStatusStats, RecentActivity, EngagementDay
 )
 from email_service import email_service
+from email_retry_queue import EmailRetryQueue
+from collection_versions import CollectionVersions
+from contact_cache import ContactCache
+from job_queue import JobQueue
+from single_flight import SingleFlight, single_flight
+from send_scheduler import SendLane
+from template_renderer import personalization_values, render
 
 logger = logging.getLogger(__name__)
 
+# Seconds analytics results are reused after a query completes; identical
+# concurrent requests always share one query
+ANALYTICS_COALESCE_TTL = float(os.environ.get('ANALYTICS_COALESCE_TTL', '2'))
+
 class CRMService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.contacts = db.contacts
         self.interactions = db.interactions
         self.contact_analytics = db.contact_analytics
+        self.email_retries = EmailRetryQueue(db)
+        self.jobs = JobQueue(db)
+        self.versions = CollectionVersions(db)
+        self.flights = SingleFlight()
+        self.contact_cache = ContactCache(
+            self.contacts,
+            max_size=int(os.environ.get('CONTACT_CACHE_SIZE', '10000')),
+            ttl=float(os.environ.get('CONTACT_CACHE_TTL', '60'))
+        )
+        self.versions.add_listener(self.flights.forget)
+        self._contact_listeners = []
+    
+    async def ensure_indexes(self):
+        """Create indexes for contact lookups and for paging through a contact's interactions"""
+        # Also serves batch jobs that walk contacts in id order
+        await self.contacts.create_index([("id", ASCENDING)], unique=True)
+        await self.interactions.create_index(
+            [("contact_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]
+        )
+    
+    def add_contact_listener(self, listener):
+        """Register a coroutine called as listener(contact, previous) after a contact is created or updated
+
+        For a new contact, a listener returns True if it has taken over sending
+        the welcome email (e.g. by enrolling the contact in a welcome sequence).
+        """
+        self._contact_listeners.append(listener)
+    
+    async def _notify_contact_listeners(self, contact: Contact, previous: Optional[Contact] = None) -> bool:
+        """Run the contact listeners; True if any of them handles the welcome email"""
+        welcomed = False
+        for listener in self._contact_listeners:
+            try:
+                welcomed = bool(await listener(contact, previous)) or welcomed
+            except Exception as e:
+                logger.error(f"Contact listener failed for {contact.id}: {str(e)}")
+        return welcomed
         
     async def create_contact(self, contact_data: ContactCreate) -> Contact:
         """Create a new contact with initial lead scoring"""
@@ -39,16 +89,21 @@ class CRMService:
             InteractionType.NOTE_ADDED,
             f"Contact created from {contact_data.lead_source}"
         )
+        await self.versions.bump(self.contacts.name, self.interactions.name)
+        
+        contact = Contact(**contact_dict)
+        welcomed = await self._notify_contact_listeners(contact)
         
-        # Trigger welcome email if subscribed
-        if contact_dict.get('email_subscribed', True):
-            asyncio.create_task(self._send_welcome_email(contact_dict))
+        # Queue the welcome email for a background worker if subscribed, unless
+        # a triggered welcome sequence already sends one
+        if contact.email_subscribed and not welcomed:
+            await self.jobs.enqueue("welcome_email", {"contact_id": contact.id})
         
-        return Contact(**contact_dict)
+        return contact
     
-    async def get_contact(self, contact_id: str) -> Optional[Contact]:
-        """Get a contact by ID"""
-        contact_data = await self.contacts.find_one({"id": contact_id})
+    async def get_contact(self, contact_id: str, fresh: bool = False) -> Optional[Contact]:
+        """Get a contact by ID; `fresh` bypasses the cache for read-modify-write paths"""
+        contact_data = await self.contact_cache.get(contact_id, fresh=fresh)
         return Contact(**contact_data) if contact_data else None
     
     async def get_contacts(self, 
@@ -59,6 +114,18 @@ class CRMService:
                           tags: Optional[List[str]] = None,
                           search: Optional[str] = None) -> List[Contact]:
         """Get contacts with filtering and pagination"""
+        contacts = await self.get_contact_documents(skip, limit, status, lead_source, tags, search)
+        return [Contact(**contact) for contact in contacts]
+    
+    async def get_contact_documents(self,
+                                    skip: int = 0,
+                                    limit: int = 100,
+                                    status: Optional[ContactStatus] = None,
+                                    lead_source: Optional[LeadSource] = None,
+                                    tags: Optional[List[str]] = None,
+                                    search: Optional[str] = None,
+                                    projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Get raw contact documents with filtering and pagination, for trusted read paths"""
         query = {}
         
         if status:
@@ -75,13 +142,12 @@ class CRMService:
                 {"company": {"$regex": search, "$options": "i"}}
             ]
         
-        cursor = self.contacts.find(query).sort("created_at", -1).skip(skip).limit(limit)
-        contacts = await cursor.to_list(length=limit)
-        return [Contact(**contact) for contact in contacts]
+        cursor = self.contacts.find(query, projection or {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit)
+        return await cursor.to_list(length=limit)
     
     async def update_contact(self, contact_id: str, update_data: ContactUpdate) -> Optional[Contact]:
         """Update a contact and recalculate lead score"""
-        existing_contact = await self.get_contact(contact_id)
+        existing_contact = await self.get_contact(contact_id, fresh=True)
         if not existing_contact:
             return None
         
@@ -99,6 +165,7 @@ class CRMService:
             {"id": contact_id},
             {"$set": update_dict}
         )
+        self.contact_cache.invalidate(contact_id)
         
         # Log status change if applicable
         if 'status' in update_dict and update_dict['status'] != existing_contact.status:
@@ -107,22 +174,35 @@ class CRMService:
                 InteractionType.NOTE_ADDED,
                 f"Status changed from {existing_contact.status} to {update_dict['status']}"
             )
+            await self.versions.bump(self.contacts.name, self.interactions.name)
+        else:
+            await self.versions.bump(self.contacts.name)
         
         updated_contact = await self.get_contact(contact_id)
+        if updated_contact:
+            await self._notify_contact_listeners(updated_contact, existing_contact)
         return updated_contact
     
     async def delete_contact(self, contact_id: str) -> bool:
         """Delete a contact and all related data"""
         result = await self.contacts.delete_one({"id": contact_id})
+        self.contact_cache.invalidate(contact_id)
         if result.deleted_count > 0:
             # Delete related interactions
             await self.interactions.delete_many({"contact_id": contact_id})
             await self.contact_analytics.delete_many({"contact_id": contact_id})
+            await self.versions.bump(self.contacts.name, self.interactions.name)
             return True
         return False
     
     async def create_interaction(self, interaction_data: InteractionCreate) -> Interaction:
         """Create a new interaction and update contact lead score"""
+        interaction = await self._insert_interaction(interaction_data)
+        await self.versions.bump(self.interactions.name, self.contacts.name)
+        return interaction
+    
+    async def _insert_interaction(self, interaction_data: InteractionCreate) -> Interaction:
+        """Store an interaction and update the contact's engagement, without bumping collection versions"""
         interaction_dict = interaction_data.dict()
         interaction_dict['id'] = str(uuid.uuid4())
         interaction_dict['created_at'] = datetime.utcnow()
@@ -140,19 +220,67 @@ class CRMService:
         interactions = await cursor.to_list(length=limit)
         return [Interaction(**interaction) for interaction in interactions]
     
+    async def get_contact_interactions_page(self, contact_id: str, limit: int = 50,
+                                            cursor: Optional[str] = None) -> Tuple[List[Interaction], Optional[str]]:
+        """Get a page of a contact's interactions, most recent first, and the cursor for the next page
+
+        Raises ValueError for a malformed cursor.
+        """
+        query: Dict[str, Any] = {"contact_id": contact_id}
+        if cursor:
+            created_at, interaction_id = _decode_interaction_cursor(cursor)
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "id": {"$lt": interaction_id}}
+            ]
+        # One extra document tells us whether there is another page
+        documents = await self.interactions.find(query).sort(
+            [("created_at", DESCENDING), ("id", DESCENDING)]
+        ).limit(limit + 1).to_list(length=limit + 1)
+        next_cursor = _encode_interaction_cursor(documents[limit - 1]) if len(documents) > limit else None
+        return [Interaction(**document) for document in documents[:limit]], next_cursor
+    
+    async def get_engagement_rollup(self, contact_id: str, days: int = 30) -> List[EngagementDay]:
+        """Interaction counts per day and type for a contact's last `days` days, oldest first"""
+        first_day = datetime.utcnow().date() - timedelta(days=days - 1)
+        pipeline = [
+            {"$match": {
+                "contact_id": contact_id,
+                "created_at": {"$gte": datetime.combine(first_day, datetime.min.time())}
+            }},
+            {"$group": {
+                "_id": {
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                    "type": "$type"
+                },
+                "count": {"$sum": 1}
+            }}
+        ]
+        rollup = {first_day + timedelta(days=offset): EngagementDay(date=first_day + timedelta(days=offset)) for offset in range(days)}
+        async for result in self.interactions.aggregate(pipeline):
+            day = rollup.get(date.fromisoformat(result['_id']['day']))
+            if day is not None:
+                day.total += result['count']
+                day.by_type[result['_id']['type']] = result['count']
+        return list(rollup.values())
+    
     async def _create_interaction(self, contact_id: str, interaction_type: InteractionType, description: str, metadata: Dict[str, Any] = None):
-        """Internal method to create interactions"""
+        """Internal method to create interactions
+
+        Collection versions are not bumped; callers bump them once their own
+        writes are done, so bulk paths bump once per batch.
+        """
         interaction_data = InteractionCreate(
             contact_id=contact_id,
             type=interaction_type,
             description=description,
             metadata=metadata or {}
         )
-        await self.create_interaction(interaction_data)
+        await self._insert_interaction(interaction_data)
     
     async def _update_contact_engagement(self, contact_id: str, interaction_type: InteractionType):
         """Update contact engagement metrics and lead score"""
-        contact = await self.get_contact(contact_id)
+        contact = await self.get_contact(contact_id, fresh=True)
         if not contact:
             return
         
@@ -179,6 +307,7 @@ class CRMService:
             {"id": contact_id},
             {"$set": update_fields}
         )
+        self.contact_cache.invalidate(contact_id)
     
     def _calculate_initial_lead_score(self, contact_data: ContactCreate) -> int:
         """Calculate initial lead score for new contact"""
@@ -276,16 +405,24 @@ class CRMService:
         
         return max(0, min(score, 100))  # Ensure score is between 0-100
     
+    async def send_welcome_email(self, contact_id: str):
+        """Send the welcome email for a contact (run by the background worker)"""
+        contact_data = await self.contact_cache.get(contact_id)
+        # The contact may have unsubscribed while the job was queued
+        if contact_data and contact_data.get('email_subscribed', True):
+            await self._send_welcome_email(contact_data)
+    
     async def _send_welcome_email(self, contact_data: Dict[str, Any]):
         """Send welcome email to new contact"""
         try:
             template = email_service.get_welcome_email_template()
+            values = personalization_values(contact_data)
             
             result = await email_service.send_email(
                 to_email=contact_data['email'],
-                subject=template['subject'],
-                html_content=template['html_content'],
-                text_content=template['text_content']
+                subject=render(template['subject'], values),
+                html_content=render(template['html_content'], values),
+                text_content=render(template['text_content'], values)
             )
             
             if result['success']:
@@ -296,10 +433,26 @@ class CRMService:
                     "Welcome email sent",
                     {"email_type": "welcome", "message_id": result.get('message_id')}
                 )
+                await self.versions.bump(self.interactions.name, self.contacts.name)
+            elif result.get('retryable'):
+                await self.email_retries.enqueue(
+                    to_email=contact_data['email'],
+                    subject=template['subject'],
+                    html_content=template['html_content'],
+                    text_content=template['text_content'],
+                    lane=SendLane.TRANSACTIONAL,
+                    personalization=values,
+                    contact_id=contact_data['id'],
+                    interaction_description="Welcome email sent",
+                    interaction_metadata={"email_type": "welcome"},
+                    error=result.get('error'),
+                    retry_after=result.get('retry_after')
+                )
             
         except Exception as e:
             logger.error(f"Failed to send welcome email to {contact_data['email']}: {str(e)}")
     
+    @single_flight("contacts", ttl=ANALYTICS_COALESCE_TTL)
     async def get_dashboard_stats(self) -> DashboardStats:
         """Get comprehensive dashboard statistics"""
         # Total contacts
@@ -344,6 +497,7 @@ class CRMService:
             avg_click_rate=round(avg_click_rate * 100, 2)
         )
     
+    @single_flight("contacts", ttl=ANALYTICS_COALESCE_TTL)
     async def get_lead_source_stats(self) -> List[LeadSourceStats]:
         """Get lead source distribution statistics"""
         pipeline = [
@@ -363,6 +517,7 @@ class CRMService:
             for result in results
         ]
     
+    @single_flight("contacts", ttl=ANALYTICS_COALESCE_TTL)
     async def get_contact_status_stats(self) -> List[ContactStatusStats]:
         """Get contact status distribution statistics"""
         pipeline = [
@@ -382,6 +537,7 @@ class CRMService:
             for result in results
         ]
     
+    @single_flight("interactions", "contacts", ttl=ANALYTICS_COALESCE_TTL)
     async def get_recent_activity(self, limit: int = 10) -> List[RecentActivity]:
         """Get recent interactions across all contacts"""
         pipeline = [
@@ -424,3 +580,17 @@ class CRMService:
         return [Contact(**contact) for contact in contacts]
 
 import uuid  # Add this import at the top
+
+
+def _encode_interaction_cursor(interaction: Dict[str, Any]) -> str:
+    """Opaque cursor positioned after `interaction` in (created_at, id) descending order"""
+    raw = f"{interaction['created_at'].isoformat()}|{interaction['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_interaction_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        created_at, interaction_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+        return datetime.fromisoformat(created_at), interaction_id
+    except ValueError:
+        raise ValueError("Invalid interactions cursor")
@@ -0,0 +1,135 @@
+import logging
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReturnDocument
+from send_scheduler import SendLane
+
+logger = logging.getLogger(__name__)
+
+
+class EmailRetryQueue:
+    """Durable queue of sends that failed with a retryable error.
+
+    Entries keep the unrendered content plus the recipient's personalization
+    data, and the interaction to log once the send finally goes through.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, max_attempts: int = 8,
+                 base_delay: float = 60.0, max_delay: float = 3600.0,
+                 claim_timeout: float = 600.0):
+        self.db = db
+        self.queue = db.email_retry_queue
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.claim_timeout = claim_timeout
+
+    async def ensure_indexes(self):
+        """Create indexes used to find due retries"""
+        await self.queue.create_index([("status", ASCENDING), ("next_attempt_at", ASCENDING)])
+
+    def build_entry(self,
+                    to_email: str,
+                    subject: str,
+                    html_content: str,
+                    text_content: Optional[str] = None,
+                    lane: SendLane = SendLane.BULK,
+                    personalization: Optional[Dict[str, Any]] = None,
+                    contact_id: Optional[str] = None,
+                    interaction_description: Optional[str] = None,
+                    interaction_metadata: Optional[Dict[str, Any]] = None,
+                    campaign_id: Optional[str] = None,
+                    error: Optional[str] = None,
+                    retry_after: Optional[float] = None) -> Dict[str, Any]:
+        """Build a retry queue document for a failed send"""
+        now = datetime.utcnow()
+        return {
+            'id': str(uuid.uuid4()),
+            'to_email': to_email,
+            'subject': subject,
+            'html_content': html_content,
+            'text_content': text_content,
+            'lane': lane.value if isinstance(lane, SendLane) else lane,
+            'personalization': personalization or {},
+            'contact_id': contact_id,
+            'campaign_id': campaign_id,
+            'interaction_description': interaction_description,
+            'interaction_metadata': interaction_metadata or {},
+            'status': 'pending',
+            'attempts': 0,
+            'last_error': error,
+            'next_attempt_at': now + timedelta(seconds=max(retry_after or 0, self.base_delay)),
+            'created_at': now,
+            'updated_at': now,
+        }
+
+    async def enqueue(self, **kwargs) -> Dict[str, Any]:
+        """Queue a single failed send for retry"""
+        entry = self.build_entry(**kwargs)
+        await self.queue.insert_one(entry)
+        return entry
+
+    async def enqueue_many(self, entries: List[Dict[str, Any]]):
+        """Queue several pre-built entries for retry"""
+        if entries:
+            await self.queue.insert_many(entries, ordered=False)
+
+    async def claim_due(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Claim up to `limit` due entries, including ones abandoned by a crashed worker"""
+        now = datetime.utcnow()
+        claimed = []
+        while len(claimed) < limit:
+            entry = await self.queue.find_one_and_update(
+                {"$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    {"status": "processing", "claimed_at": {"$lte": now - timedelta(seconds=self.claim_timeout)}}
+                ]},
+                {"$set": {"status": "processing", "claimed_at": now}},
+                sort=[("next_attempt_at", ASCENDING)],
+                return_document=ReturnDocument.AFTER
+            )
+            if not entry:
+                break
+            claimed.append(entry)
+        return claimed
+
+    async def mark_sent(self, entry: Dict[str, Any]):
+        """Remove an entry that was delivered"""
+        await self.queue.delete_one({"id": entry['id']})
+
+    async def mark_skipped(self, entry: Dict[str, Any], reason: str):
+        """Drop an entry whose recipient may no longer be mailed, keeping it for the record"""
+        await self.queue.update_one(
+            {"id": entry['id']},
+            {"$set": {"status": "skipped", "last_error": reason, "updated_at": datetime.utcnow()}}
+        )
+
+    async def mark_failed(self, entry: Dict[str, Any], error: Optional[str], retryable: bool = True,
+                          retry_after: Optional[float] = None):
+        """Reschedule an entry with backoff, or give up on it"""
+        attempts = entry.get('attempts', 0) + 1
+        update = {
+            "attempts": attempts,
+            "last_error": error,
+            "updated_at": datetime.utcnow(),
+        }
+        if not retryable or attempts >= self.max_attempts:
+            update["status"] = "failed"
+            logger.warning(f"Giving up on email to {entry['to_email']} after {attempts} retries: {error}")
+        else:
+            delay = min(self.max_delay, self.base_delay * 2 ** attempts) * random.uniform(0.5, 1.0)
+            update["status"] = "pending"
+            update["next_attempt_at"] = datetime.utcnow() + timedelta(seconds=max(delay, retry_after or 0))
+        await self.queue.update_one({"id": entry['id']}, {"$set": update})
+
+    async def get_stats(self) -> Dict[str, int]:
+        """Number of queue entries per status"""
+        results = await self.queue.aggregate([
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(length=None)
+        stats = {"pending": 0, "processing": 0, "failed": 0}
+        stats.update({result['_id']: result['count'] for result in results})
+        return stats
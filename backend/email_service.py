@@ -2,12 +2,18 @@ import os
 import logging
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail, From, To, Subject, HtmlContent, PlainTextContent
-from typing import List, Dict, Any, Optional
+from typing import Awaitable, Callable, List, Dict, Any, Optional
 from datetime import datetime
 import asyncio
+import random
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.error import URLError
 from dotenv import load_dotenv
+from python_http_client.exceptions import HTTPError
+from send_scheduler import SendScheduler, SendLane
+from circuit_breaker import CircuitBreaker, CircuitState
+from template_renderer import compile_template, personalization_values, render
 
 # Load environment variables
 load_dotenv(Path(__file__).parent / '.env')
@@ -16,6 +22,9 @@ load_dotenv(Path(__file__).parent / '.env')
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Provider responses worth retrying: throttling and transient server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
 class EmailService:
     def __init__(self):
         self.api_key = os.environ.get('SENDGRID_API_KEY')
@@ -28,24 +37,131 @@ class EmailService:
         self.from_email = "noreply@opsvantage.com"  # OpsVantage default sender
         self.from_name = "OpsVantage Digital"
         
+        # Shared provider budget: transactional mail keeps reserved capacity
+        # while campaigns drain through the bulk lane
+        self.scheduler = SendScheduler(
+            rate_per_second=float(os.environ.get('EMAIL_RATE_PER_SECOND', '10')),
+            max_concurrency=int(os.environ.get('EMAIL_MAX_CONCURRENCY', '10')),
+            reserved_concurrency=int(os.environ.get('EMAIL_RESERVED_TRANSACTIONAL_CONCURRENCY', '2')),
+            reserved_rate_share=float(os.environ.get('EMAIL_RESERVED_TRANSACTIONAL_RATE_SHARE', '0.2'))
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.scheduler.max_concurrency,
+            thread_name_prefix="sendgrid"
+        )
+        
+        # Retry and fast-fail policy for provider errors
+        self.max_attempts = int(os.environ.get('EMAIL_MAX_ATTEMPTS', '3'))
+        self.attempt_timeout = float(os.environ.get('EMAIL_ATTEMPT_TIMEOUT', '10'))
+        self.retry_base_delay = float(os.environ.get('EMAIL_RETRY_BASE_DELAY', '0.5'))
+        self.retry_max_delay = float(os.environ.get('EMAIL_RETRY_MAX_DELAY', '30'))
+        self.circuit_breaker = CircuitBreaker(
+            "sendgrid",
+            failure_threshold=int(os.environ.get('EMAIL_BREAKER_FAILURE_THRESHOLD', '5')),
+            reset_timeout=float(os.environ.get('EMAIL_BREAKER_RESET_TIMEOUT', '30'))
+        )
+        
+        # Optional SuppressionService consulted before bulk and automated sends
+        self.suppression_list = None
+        
+    def set_suppression_list(self, suppression_list):
+        """Attach the suppression list checked by bulk and sequence sends"""
+        self.suppression_list = suppression_list
+    
+    async def get_suppressed(self, emails: List[str]) -> set:
+        """Return the subset of addresses on the suppression list"""
+        if not self.suppression_list:
+            return set()
+        return await self.suppression_list.filter_suppressed(emails)
+        
     async def send_email(self, 
                         to_email: str, 
                         subject: str, 
                         html_content: str, 
                         text_content: Optional[str] = None,
                         from_email: Optional[str] = None,
-                        from_name: Optional[str] = None) -> Dict[str, Any]:
-        """Send a single email using SendGrid"""
-        try:
-            if not self.sg:
-                logger.warning(f"SendGrid not configured. Cannot send email to {to_email}")
-                return {
-                    "success": False,
-                    "error": "SendGrid not configured",
-                    "to_email": to_email,
-                    "timestamp": datetime.utcnow()
-                }
+                        from_name: Optional[str] = None,
+                        lane: SendLane = SendLane.TRANSACTIONAL) -> Dict[str, Any]:
+        """Send a single email using SendGrid, retrying transient provider failures"""
+        if not self.sg:
+            logger.warning(f"SendGrid not configured. Cannot send email to {to_email}")
+            return {
+                "success": False,
+                "error": "SendGrid not configured",
+                "to_email": to_email,
+                "timestamp": datetime.utcnow()
+            }
+        
+        result = None
+        for attempt in range(1, self.max_attempts + 1):
+            if not self.circuit_breaker.allow_request():
+                return self._circuit_open_result(to_email, attempt - 1)
+            
+            # Admitted while half-open means this attempt holds the only probe slot;
+            # it must be given back if the attempt ends without a verdict
+            # (cancelled, timed out by the caller, or an unexpected error)
+            probe = self.circuit_breaker.state == CircuitState.HALF_OPEN
+            recorded = False
+            try:
+                result = await self.scheduler.submit(
+                    lane,
+                    self._deliver,
+                    to_email,
+                    subject,
+                    html_content,
+                    text_content,
+                    from_email,
+                    from_name
+                )
+                result['attempts'] = attempt
+                
+                if result['success'] or not result['retryable']:
+                    # The provider answered; client errors do not indicate an outage
+                    self.circuit_breaker.record_success()
+                    recorded = True
+                    return result
                 
+                self.circuit_breaker.record_failure(result.get('error'))
+                recorded = True
+            finally:
+                if probe and not recorded:
+                    self.circuit_breaker.release_probe()
+            
+            if attempt < self.max_attempts:
+                await asyncio.sleep(self._backoff_delay(attempt, result.get('retry_after')))
+        
+        return result
+    
+    def _backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, honouring a provider Retry-After hint"""
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempt - 1)))
+        if retry_after:
+            delay = max(delay, retry_after)
+        return min(delay, self.retry_max_delay)
+    
+    def _circuit_open_result(self, to_email: str, attempts: int) -> Dict[str, Any]:
+        """Fast-fail result while the provider circuit is open"""
+        return {
+            "success": False,
+            "error": "Email provider circuit is open",
+            "retryable": True,
+            "circuit_open": True,
+            "retry_after": self.circuit_breaker.retry_after(),
+            "attempts": attempts,
+            "to_email": to_email,
+            "timestamp": datetime.utcnow()
+        }
+    
+    async def _deliver(self,
+                       to_email: str,
+                       subject: str,
+                       html_content: str,
+                       text_content: Optional[str] = None,
+                       from_email: Optional[str] = None,
+                       from_name: Optional[str] = None) -> Dict[str, Any]:
+        """Make a single delivery attempt to SendGrid, bounded by the attempt timeout"""
+        retry_after = None
+        try:
             sender_email = from_email or self.from_email
             sender_name = from_name or self.from_name
             
@@ -60,13 +176,15 @@ class EmailService:
                 message.plain_text_content = PlainTextContent(text_content)
                 
             # Execute in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            with ThreadPoolExecutor() as executor:
-                response = await loop.run_in_executor(
-                    executor, 
-                    self.sg.send, 
-                    message
-                )
+            loop = asyncio.get_running_loop()
+            response = await asyncio.wait_for(
+                loop.run_in_executor(
+                    self.executor, 
+                    self._post_mail, 
+                    message.get()
+                ),
+                timeout=self.attempt_timeout
+            )
             
             logger.info(f"Email sent successfully to {to_email}, status: {response.status_code}")
             return {
@@ -77,83 +195,132 @@ class EmailService:
                 "timestamp": datetime.utcnow()
             }
             
+        except asyncio.TimeoutError:
+            error = f"Timed out after {self.attempt_timeout}s"
+            status_code = None
+            retryable = True
+        except HTTPError as e:
+            error = f"HTTP {e.status_code}: {e.reason}"
+            status_code = e.status_code
+            retryable = e.status_code in RETRYABLE_STATUS_CODES
+            retry_after = self._parse_retry_after(e.headers)
+        except (URLError, OSError) as e:
+            error = str(e)
+            status_code = None
+            retryable = True
         except Exception as e:
-            logger.error(f"Failed to send email to {to_email}: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e),
-                "to_email": to_email,
-                "timestamp": datetime.utcnow()
-            }
+            error = str(e)
+            status_code = None
+            retryable = False
+        
+        logger.error(f"Failed to send email to {to_email}: {error}")
+        return {
+            "success": False,
+            "error": error,
+            "status_code": status_code,
+            "retryable": retryable,
+            "retry_after": retry_after,
+            "to_email": to_email,
+            "timestamp": datetime.utcnow()
+        }
+    
+    def _post_mail(self, request_body: Dict[str, Any]):
+        """Blocking SendGrid call with a socket-level timeout (runs in the executor)"""
+        return self.sg.client.mail.send.post(request_body=request_body, timeout=self.attempt_timeout)
+    
+    @staticmethod
+    def _parse_retry_after(headers) -> Optional[float]:
+        try:
+            value = headers.get('Retry-After') if headers else None
+            return float(value) if value else None
+        except (TypeError, ValueError):
+            return None
+    
+    def get_health(self) -> Dict[str, Any]:
+        """Provider health: configuration, circuit breaker and send lanes"""
+        breaker = self.circuit_breaker.get_state()
+        return {
+            "provider": "sendgrid",
+            "configured": self.sg is not None,
+            "healthy": self.sg is not None and breaker['state'] != CircuitState.OPEN.value,
+            "circuit_breaker": breaker,
+            "lanes": self.scheduler.get_stats()['lanes'],
+        }
     
     async def send_bulk_emails(self, 
                               email_list: List[Dict[str, str]], 
                               subject: str, 
                               html_content: str, 
-                              text_content: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Send bulk emails to multiple recipients"""
+                              text_content: Optional[str] = None,
+                              lane: SendLane = SendLane.BULK,
+                              on_progress: Optional[Callable[[int], None]] = None,
+                              on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """Send bulk emails to multiple recipients on a low-priority lane
+
+        `on_progress` is called with the number of finished recipients after
+        each chunk. `on_result` is called with each recipient's index and
+        result as soon as that send finishes, so a caller that is cancelled
+        midway knows which recipients were already handled.
+        """
         results = []
         
-        # Send emails in batches to avoid rate limiting
-        batch_size = 10
-        for i in range(0, len(email_list), batch_size):
-            batch = email_list[i:i + batch_size]
-            batch_tasks = []
+        # One bloom-filter pass over the whole list; only positives hit the database
+        suppressed = await self.get_suppressed([email_data.get('email', '') for email_data in email_list])
+        
+        # Parse the templates once; each recipient is then a cheap slot fill
+        compiled_subject = compile_template(subject)
+        compiled_html = compile_template(html_content)
+        compiled_text = compile_template(text_content) if text_content else None
+        
+        # Pacing is done by the send scheduler; chunking only bounds how many
+        # sends are queued at once
+        chunk_size = 500
+        for i in range(0, len(email_list), chunk_size):
+            chunk = email_list[i:i + chunk_size]
+            chunk_tasks = []
             
-            for email_data in batch:
+            for index, email_data in enumerate(chunk, start=i):
                 to_email = email_data.get('email')
-                personalized_content = self._personalize_content(
-                    html_content, 
-                    email_data
-                )
-                personalized_subject = self._personalize_content(
-                    subject, 
-                    email_data
-                )
-                
-                task = self.send_email(
-                    to_email=to_email,
-                    subject=personalized_subject,
-                    html_content=personalized_content,
-                    text_content=text_content
-                )
-                batch_tasks.append(task)
-            
-            # Execute batch
-            batch_results = await asyncio.gather(*batch_tasks, return_exceptions=True)
-            results.extend(batch_results)
+                if suppressed and (to_email or '').strip().lower() in suppressed:
+                    task = self._suppressed_result(to_email)
+                else:
+                    values = personalization_values(email_data)
+                    task = self.send_email(
+                        to_email=to_email,
+                        subject=compiled_subject.render(values),
+                        html_content=compiled_html.render(values),
+                        text_content=compiled_text.render(values) if compiled_text else None,
+                        lane=lane
+                    )
+                chunk_tasks.append(self._report_result(index, task, on_result) if on_result else task)
             
-            # Add delay between batches to respect rate limits
-            if i + batch_size < len(email_list):
-                await asyncio.sleep(1)
+            chunk_results = await asyncio.gather(*chunk_tasks, return_exceptions=True)
+            results.extend(chunk_results)
+            if on_progress:
+                on_progress(len(chunk_results))
         
         return results
     
+    async def _report_result(self, index: int, send: Awaitable[Dict[str, Any]],
+                             on_result: Callable[[int, Dict[str, Any]], None]) -> Dict[str, Any]:
+        result = await send
+        on_result(index, result)
+        return result
+    
+    async def _suppressed_result(self, to_email: str) -> Dict[str, Any]:
+        """Result for a recipient skipped because of the suppression list"""
+        logger.info(f"Skipping suppressed address {to_email}")
+        return {
+            "success": False,
+            "suppressed": True,
+            "error": "Address is on the suppression list",
+            "to_email": to_email,
+            "timestamp": datetime.utcnow()
+        }
+    
     def _personalize_content(self, content: str, contact_data: Dict[str, Any]) -> str:
         """Replace placeholders in content with contact data"""
-        personalized = content
-        
-        # Common personalizations
-        placeholders = {
-            '{{first_name}}': contact_data.get('first_name', ''),
-            '{{last_name}}': contact_data.get('last_name', ''),
-            '{{full_name}}': f"{contact_data.get('first_name', '')} {contact_data.get('last_name', '')}".strip(),
-            '{{email}}': contact_data.get('email', ''),
-            '{{company}}': contact_data.get('company', ''),
-            '{{position}}': contact_data.get('position', ''),
-            '{{city}}': contact_data.get('city', ''),
-            '{{state}}': contact_data.get('state', ''),
-            '{{country}}': contact_data.get('country', ''),
-        }
-        
-        for placeholder, value in placeholders.items():
-            if value:
-                personalized = personalized.replace(placeholder, str(value))
-            else:
-                # Remove placeholder if no value
-                personalized = personalized.replace(placeholder, '')
-        
-        return personalized
+        return render(content, personalization_values(contact_data))
     
     def get_welcome_email_template(self) -> Dict[str, str]:
         """Get the default welcome email template for OpsVantage"""
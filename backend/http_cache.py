@@ -0,0 +1,67 @@
+import hashlib
+from typing import Dict, Optional
+from fastapi import Request, Response
+from collection_versions import CollectionVersions
+
+
+class NotModified(Exception):
+    """Raised by `ConditionalGet` when the client's cached copy is current"""
+
+    def __init__(self, headers: Dict[str, str]):
+        self.headers = headers
+
+
+def not_modified_response(request: Request, exc: NotModified) -> Response:
+    """Exception handler turning `NotModified` into an empty 304 response"""
+    return Response(status_code=304, headers=exc.headers)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an `If-None-Match` header against an ETag (RFC 7232)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class ConditionalGet:
+    """Route dependency adding ETag validation to a GET endpoint.
+
+    The ETag is derived from the change counters of the collections the
+    response is built from plus the request path and query, so it changes
+    whenever any of those collections is written to. A matching
+    `If-None-Match` short-circuits the endpoint with a 304 before it reads
+    anything else; otherwise the ETag and `Cache-Control` headers are set on
+    the response and also returned, for endpoints that build their own
+    `Response`.
+    """
+
+    def __init__(self, versions: CollectionVersions, *collections: str, cache_control: str = "private, no-cache"):
+        self.versions = versions
+        self.collections = collections
+        self.cache_control = cache_control
+
+    async def etag(self, request: Request) -> str:
+        """Strong ETag for this request's representation at the current collection versions"""
+        versions = await self.versions.get(*self.collections)
+        key = '|'.join([
+            request.url.path,
+            '&'.join(sorted(f"{name}={value}" for name, value in request.query_params.multi_items())),
+            *(f"{name}={versions[name]}" for name in self.collections)
+        ])
+        return f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+    async def __call__(self, request: Request, response: Response) -> Dict[str, str]:
+        headers = {"ETag": await self.etag(request), "Cache-Control": self.cache_control}
+        if etag_matches(request.headers.get('if-none-match'), headers["ETag"]):
+            raise NotModified(headers)
+        response.headers.update(headers)
+        return headers
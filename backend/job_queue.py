@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReturnDocument
+from task_supervisor import SupervisorFull, TaskSupervisor
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """Durable queue of background work handed from the API to workers.
+
+    The API process only inserts jobs; a worker (embedded in the API or
+    started with `python worker.py run`) claims and executes them. Claims
+    expire after `claim_timeout` seconds so work held by a crashed worker is
+    picked up again; a running job keeps its claim with `heartbeat`.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, max_attempts: int = 5,
+                 base_delay: float = 30.0, max_delay: float = 1800.0,
+                 claim_timeout: float = 900.0):
+        self.db = db
+        self.jobs = db.background_jobs
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.claim_timeout = claim_timeout
+        # Set by an in-process worker so new jobs are picked up without waiting for a poll
+        self.wakeup: Optional[asyncio.Event] = None
+
+    async def ensure_indexes(self):
+        """Create indexes used to claim due jobs"""
+        await self.jobs.create_index([("status", ASCENDING), ("run_at", ASCENDING)])
+        await self.jobs.create_index([("id", ASCENDING)], unique=True)
+
+    async def enqueue(self, job_type: str, payload: Dict[str, Any], run_at: Optional[datetime] = None) -> Dict[str, Any]:
+        """Queue a job for a worker"""
+        now = datetime.utcnow()
+        job = {
+            'id': str(uuid.uuid4()),
+            'type': job_type,
+            'payload': payload,
+            'status': 'pending',
+            'attempts': 0,
+            'last_error': None,
+            'run_at': run_at or now,
+            'created_at': now,
+            'updated_at': now,
+        }
+        await self.jobs.insert_one(job)
+        if self.wakeup is not None:
+            self.wakeup.set()
+        return job
+
+    async def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Claim the oldest due job, including ones abandoned by a crashed worker"""
+        now = datetime.utcnow()
+        return await self.jobs.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "run_at": {"$lte": now}},
+                {"status": "processing", "claimed_at": {"$lte": now - timedelta(seconds=self.claim_timeout)}}
+            ]},
+            {"$set": {"status": "processing", "claimed_at": now, "claimed_by": worker_id}},
+            sort=[("run_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def heartbeat(self, job: Dict[str, Any]) -> bool:
+        """Renew a running job's claim; False if another worker has taken it over"""
+        result = await self.jobs.update_one(
+            {"id": job['id'], "status": "processing", "claimed_by": job.get('claimed_by')},
+            {"$set": {"claimed_at": datetime.utcnow()}}
+        )
+        return result.matched_count == 1
+
+    async def complete(self, job: Dict[str, Any]):
+        """Mark a job as done, unless another worker has taken it over"""
+        now = datetime.utcnow()
+        await self.jobs.update_one(
+            {"id": job['id'], "status": "processing", "claimed_by": job.get('claimed_by')},
+            {"$set": {"status": "completed", "completed_at": now, "updated_at": now}}
+        )
+
+    async def fail(self, job: Dict[str, Any], error: str):
+        """Reschedule a failed job with backoff, or give up on it, unless another worker has taken it over"""
+        attempts = job.get('attempts', 0) + 1
+        update = {"attempts": attempts, "last_error": error, "updated_at": datetime.utcnow()}
+        if attempts >= self.max_attempts:
+            update["status"] = "failed"
+            logger.warning(f"Giving up on {job['type']} job {job['id']} after {attempts} attempts: {error}")
+        else:
+            delay = min(self.max_delay, self.base_delay * 2 ** attempts) * random.uniform(0.5, 1.0)
+            update["status"] = "pending"
+            update["run_at"] = datetime.utcnow() + timedelta(seconds=delay)
+        await self.jobs.update_one(
+            {"id": job['id'], "status": "processing", "claimed_by": job.get('claimed_by')},
+            {"$set": update}
+        )
+
+    async def release(self, job: Dict[str, Any]):
+        """Hand a claimed job back to the queue without counting an attempt"""
+        await self.jobs.update_one(
+            {"id": job['id'], "status": "processing"},
+            {"$set": {"status": "pending", "updated_at": datetime.utcnow()}, "$unset": {"claimed_at": "", "claimed_by": ""}}
+        )
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job by ID"""
+        return await self.jobs.find_one({"id": job_id}, {"_id": 0})
+
+    async def get_stats(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        results = await self.jobs.aggregate([
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(length=None)
+        stats = {"pending": 0, "processing": 0, "completed": 0, "failed": 0}
+        stats.update({result['_id']: result['count'] for result in results})
+        return stats
+
+
+class JobWorker:
+    """Claims jobs from a `JobQueue` and runs them with registered handlers.
+
+    Jobs are only claimed while the supervisor has a free slot, so a busy
+    worker leaves work in Mongo for other workers instead of hoarding it.
+    Claims are renewed while a job runs, so long jobs (e.g. a large campaign
+    delivery) aren't handed to a second worker halfway through; if a claim
+    is lost anyway, the handler is cancelled and the job left to its new owner.
+    """
+
+    def __init__(self, queue: JobQueue, worker_id: str, concurrency: int = 4, poll_interval: float = 2.0):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.poll_interval = poll_interval
+        self.supervisor = TaskSupervisor("background_jobs", max_concurrency=concurrency, max_queue=0)
+        self.handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]] = {}
+
+    def register(self, job_type: str, handler: Callable[[Dict[str, Any]], Awaitable[None]]):
+        """Register the coroutine function that runs jobs of `job_type` with their payload"""
+        self.handlers[job_type] = handler
+
+    async def run_job(self, job: Dict[str, Any]):
+        """Execute one claimed job and record the outcome"""
+        handler = self.handlers.get(job['type'])
+        if handler is None:
+            await self.queue.fail(job, f"No handler for job type {job['type']}")
+            return
+        work = asyncio.create_task(handler(job['payload']))
+        heartbeat = asyncio.create_task(self._keep_claimed(job, work))
+        try:
+            await work
+        except asyncio.CancelledError:
+            if heartbeat.done() and not heartbeat.cancelled() and heartbeat.result():
+                logger.warning(f"Stopped {job['type']} job {job['id']}: it was claimed by another worker")
+                return
+            raise
+        except Exception as e:
+            logger.error(f"{job['type']} job {job['id']} failed: {str(e)}")
+            await self.queue.fail(job, str(e))
+            return
+        finally:
+            heartbeat.cancel()
+        await self.queue.complete(job)
+
+    async def _keep_claimed(self, job: Dict[str, Any], work: asyncio.Task) -> bool:
+        """Renew a running job's claim well before it would expire
+
+        Cancels `work` and returns True once the claim has been lost.
+        """
+        while True:
+            await asyncio.sleep(self.queue.claim_timeout / 3)
+            try:
+                if not await self.queue.heartbeat(job):
+                    work.cancel()
+                    return True
+            except Exception as e:
+                logger.error(f"Failed to renew claim on {job['type']} job {job['id']}: {str(e)}")
+
+    async def run(self):
+        """Claim and run jobs until cancelled"""
+        wakeup = self.queue.wakeup = asyncio.Event()
+        logger.info(f"Job worker {self.worker_id} started with {self.supervisor.max_concurrency} slots")
+        try:
+            while True:
+                await self.supervisor.wait_for_capacity()
+                try:
+                    job = await self.queue.claim(self.worker_id)
+                except Exception as e:
+                    logger.error(f"Failed to claim background job: {str(e)}")
+                    job = None
+
+                if job is None:
+                    wakeup.clear()
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                # On shutdown, jobs that can't finish in time go back to the queue
+                try:
+                    self.supervisor.submit_nowait(self.run_job, job, on_abandon=lambda job=job: self.queue.release(job))
+                except SupervisorFull:
+                    # Claimed just as a drain started
+                    await self.queue.release(job)
+        finally:
+            self.queue.wakeup = None
+
+    async def drain(self, timeout: float = 30.0) -> int:
+        """Let running jobs finish within `timeout` seconds and release the rest"""
+        return await self.supervisor.drain(timeout)
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElector:
+    """Mongo lease that elects one process to run singleton background jobs.
+
+    The lease is a single document keyed by `name` holding the owner and an
+    expiry. The leader renews it every `heartbeat_interval` seconds; any other
+    process takes it over once it has expired, so a dead leader is replaced
+    within `lease_seconds`. Jobs registered with `add_job` run only while this
+    process holds the lease and are cancelled as soon as it is lost.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, name: str, owner: str,
+                 lease_seconds: float = 15.0, heartbeat_interval: float = 5.0):
+        self.collection = collection
+        self.name = name
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.is_leader = False
+        self.leader_since: Optional[datetime] = None
+        self._jobs: List[Callable[[], Awaitable[None]]] = []
+        self._tasks: List[asyncio.Task] = []
+        self._last_renewed: Optional[float] = None
+
+    async def ensure_indexes(self):
+        """Let Mongo clean up leases abandoned long ago"""
+        await self.collection.create_index(
+            [("expires_at", ASCENDING)], expireAfterSeconds=int(self.lease_seconds * 4)
+        )
+
+    def add_job(self, job: Callable[[], Awaitable[None]]):
+        """Register a long-running coroutine function to run only on the leader"""
+        self._jobs.append(job)
+
+    async def try_acquire(self) -> bool:
+        """Take or renew the lease; returns whether this process holds it"""
+        now = datetime.utcnow()
+        try:
+            lease = await self.collection.find_one_and_update(
+                {
+                    "_id": self.name,
+                    "$or": [{"owner": self.owner}, {"expires_at": {"$lte": now}}]
+                },
+                {"$set": {
+                    "owner": self.owner,
+                    "expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "heartbeat_at": now
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Someone else holds an unexpired lease
+            return False
+        return lease is not None and lease.get('owner') == self.owner
+
+    async def release(self):
+        """Give up the lease so another process can take over immediately"""
+        await self._step_down()
+        try:
+            await self.collection.delete_one({"_id": self.name, "owner": self.owner})
+        except Exception as e:
+            logger.error(f"Failed to release leader lease {self.name}: {str(e)}")
+
+    async def _become_leader(self):
+        self.is_leader = True
+        self.leader_since = datetime.utcnow()
+        self._tasks = [asyncio.create_task(job()) for job in self._jobs]
+        logger.info(f"{self.owner} became leader for {self.name}")
+
+    async def _step_down(self):
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        self.leader_since = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info(f"{self.owner} stepped down as leader for {self.name}")
+
+    async def run(self):
+        """Campaign for and hold the lease until cancelled"""
+        try:
+            while True:
+                try:
+                    acquired = await self.try_acquire()
+                    if acquired:
+                        self._last_renewed = time.monotonic()
+                        if not self.is_leader:
+                            await self._become_leader()
+                    elif self.is_leader:
+                        await self._step_down()
+                except Exception as e:
+                    logger.error(f"Leader election for {self.name} failed: {str(e)}")
+                    # Without a successful renewal the lease may already belong to someone else
+                    if self.is_leader and time.monotonic() - self._last_renewed >= self.lease_seconds:
+                        await self._step_down()
+
+                await asyncio.sleep(self.heartbeat_interval)
+        finally:
+            await self._step_down()
+
+    def get_state(self):
+        """Leadership state for diagnostics"""
+        return {
+            "name": self.name,
+            "owner": self.owner,
+            "is_leader": self.is_leader,
+            "leader_since": self.leader_since,
+            "jobs": len(self._jobs),
+        }
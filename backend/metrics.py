@@ -0,0 +1,197 @@
+import bisect
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, roughly exponential from 1 ms to 5 minutes
+DEFAULT_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+
+class Histogram:
+    """Fixed-bucket histogram with percentile estimates.
+
+    Observations are only ever incremented from the event loop thread, so no
+    locking is needed.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Estimate the q-th percentile (0-100) by interpolating within buckets"""
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                fraction = (rank - cumulative) / bucket_count
+                return min(lower + (upper - lower) * fraction, self.max)
+            cumulative += bucket_count
+        return self.max
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """Count, mean and common percentiles"""
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max if self.count else None,
+        }
+
+    def cumulative_counts(self) -> List[int]:
+        """Cumulative bucket counts, including the +Inf bucket"""
+        total = 0
+        cumulative = []
+        for bucket_count in self.counts:
+            total += bucket_count
+            cumulative.append(total)
+        return cumulative
+
+
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Gauge:
+    """Value that can go up and down"""
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+
+class RateMeter:
+    """Events per second over a sliding window of one-second slots"""
+
+    def __init__(self, window: int = 60):
+        self.window = window
+        self.slots = [0] * window
+        self.slot_times = [0] * window
+
+    def mark(self, count: int = 1):
+        now = int(time.monotonic())
+        index = now % self.window
+        if self.slot_times[index] != now:
+            self.slot_times[index] = now
+            self.slots[index] = 0
+        self.slots[index] += count
+
+    def rate(self) -> float:
+        """Average events per second over the window"""
+        now = int(time.monotonic())
+        total = sum(
+            count for count, slot_time in zip(self.slots, self.slot_times)
+            if now - slot_time < self.window
+        )
+        return total / self.window
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    """Named metric families keyed by label sets"""
+
+    def __init__(self):
+        self.families: Dict[str, Dict] = {}
+
+    def _get(self, kind: str, name: str, help_text: str, factory, labels: Dict[str, str]):
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = {"kind": kind, "help": help_text, "metrics": {}}
+        key: LabelKey = tuple(sorted((label, str(value)) for label, value in labels.items()))
+        metric = family["metrics"].get(key)
+        if metric is None:
+            metric = family["metrics"][key] = factory()
+        return metric
+
+    def counter(self, name: str, help_text: str = "", **labels) -> Counter:
+        return self._get("counter", name, help_text, Counter, labels)
+
+    def gauge(self, name: str, help_text: str = "", **labels) -> Gauge:
+        return self._get("gauge", name, help_text, Gauge, labels)
+
+    def histogram(self, name: str, help_text: str = "", buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+                  **labels) -> Histogram:
+        return self._get("histogram", name, help_text, lambda: Histogram(buckets), labels)
+
+    def remove(self, name: str, **labels):
+        """Drop one labelled series, e.g. for a campaign that finished sending"""
+        family = self.families.get(name)
+        if family:
+            key: LabelKey = tuple(sorted((label, str(value)) for label, value in labels.items()))
+            family["metrics"].pop(key, None)
+
+    def series(self, name: str) -> Dict[LabelKey, object]:
+        """All labelled series of a metric family"""
+        family = self.families.get(name)
+        return dict(family["metrics"]) if family else {}
+
+    def render_prometheus(self) -> str:
+        """Render every metric family in the Prometheus text exposition format"""
+        lines = []
+        for name, family in sorted(self.families.items()):
+            if family["help"]:
+                lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            for labels, metric in list(family["metrics"].items()):
+                if family["kind"] == "histogram":
+                    cumulative = metric.cumulative_counts()
+                    bounds = [_format_value(bound) for bound in metric.buckets] + ["+Inf"]
+                    for bound, count in zip(bounds, cumulative):
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(metric.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(metric.value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{label}="{_escape_label_value(value)}"' for label, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# Process-wide registry
+registry = MetricsRegistry()
@@ -47,6 +47,18 @@ class AutomationStatus(str, Enum):
     PAUSED = "paused"
     STOPPED = "stopped"
 
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class SuppressionReason(str, Enum):
+    BOUNCE = "bounce"
+    COMPLAINT = "complaint"
+    UNSUBSCRIBE = "unsubscribe"
+    MANUAL = "manual"
+
 # CRM Models
 class Contact(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -99,6 +111,7 @@ class ContactCreate(BaseModel):
     city: Optional[str] = None
     state: Optional[str] = None
     country: Optional[str] = None
+    email_subscribed: bool = True
     tags: List[str] = []
     notes: str = ""
 
@@ -147,6 +160,19 @@ class EmailTemplate(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class ListView(str, Enum):
+    FULL = "full"
+    SUMMARY = "summary"
+
+class EmailTemplateSummary(BaseModel):
+    """Template list entry without the content bodies"""
+    id: str
+    name: str
+    subject: str
+    is_default: bool = False
+    created_at: datetime
+    updated_at: datetime
+
 class EmailTemplateCreate(BaseModel):
     name: str
     subject: str
@@ -184,6 +210,27 @@ class Campaign(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class CampaignSummary(BaseModel):
+    """Campaign list entry without the content bodies"""
+    id: str
+    name: str
+    subject: str
+    target_tags: List[str] = []
+    target_status: List[ContactStatus] = []
+    exclude_tags: List[str] = []
+    status: CampaignStatus = CampaignStatus.DRAFT
+    scheduled_at: Optional[datetime] = None
+    sent_at: Optional[datetime] = None
+    total_recipients: int = 0
+    emails_sent: int = 0
+    emails_delivered: int = 0
+    emails_opened: int = 0
+    emails_clicked: int = 0
+    emails_bounced: int = 0
+    unsubscribes: int = 0
+    created_at: datetime
+    updated_at: datetime
+
 class CampaignCreate(BaseModel):
     name: str
     subject: str
@@ -209,6 +256,18 @@ class EmailSequence(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class EmailSequenceSummary(BaseModel):
+    """Sequence list entry with a step count instead of the steps"""
+    id: str
+    name: str
+    description: str
+    trigger_tags: List[str] = []
+    trigger_status: List[ContactStatus] = []
+    step_count: int = 0
+    status: AutomationStatus = AutomationStatus.ACTIVE
+    created_at: datetime
+    updated_at: datetime
+
 class EmailSequenceCreate(BaseModel):
     name: str
     description: str
@@ -226,6 +285,119 @@ class SequenceEnrollment(BaseModel):
     next_email_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     is_active: bool = True
+    
+    # Processing lease held by the worker currently sending this step
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    
+    # Times the enrollment's sequence could not be found
+    sequence_misses: int = 0
+
+# Archived enrollment, moved out of the hot sequence_enrollments collection
+class EnrollmentHistory(BaseModel):
+    id: str
+    contact_id: str
+    sequence_id: str
+    sequence_name: Optional[str] = None
+    steps_sent: int = 0
+    outcome: str = "completed"  # completed or stale
+    enrolled_at: datetime
+    completed_at: Optional[datetime] = None
+    archived_at: datetime = Field(default_factory=datetime.utcnow)
+
+class SequenceStats(BaseModel):
+    sequence_id: str
+    active_enrollments: int = 0
+    completed: int = 0
+    stale: int = 0
+    steps_sent: int = 0
+    last_archived_at: Optional[datetime] = None
+
+# Bulk enrollment
+class BulkEnrollmentRequest(BaseModel):
+    contact_ids: List[str] = []  # Explicit contacts to enroll
+    tags: List[str] = []  # Contacts with any of these tags
+    status: List[ContactStatus] = []  # Contacts with any of these statuses
+    lead_source: List[LeadSource] = []  # Contacts from any of these sources
+
+class EnrollmentJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    sequence_id: str
+    segment: Dict[str, Any] = {}
+    status: JobStatus = JobStatus.PENDING
+    total_contacts: int = 0
+    processed: int = 0
+    enrolled: int = 0
+    skipped: int = 0  # Already actively enrolled
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    completed_at: Optional[datetime] = None
+
+# Contact detail page
+class ActiveEnrollment(BaseModel):
+    id: str
+    sequence_id: str
+    sequence_name: Optional[str] = None  # None if the sequence has been deleted
+    current_step: int = 0
+    total_steps: int = 0
+    enrolled_at: datetime
+    next_email_at: Optional[datetime] = None
+
+class EngagementDay(BaseModel):
+    date: date
+    total: int = 0
+    by_type: Dict[str, int] = {}  # Interaction type -> count
+
+class ContactDetail(BaseModel):
+    contact: Contact
+    interactions: List[Interaction] = []  # Most recent first
+    next_interactions_cursor: Optional[str] = None  # Pass as `cursor` to /contacts/{id}/interactions
+    enrollments: List[ActiveEnrollment] = []
+    engagement: List[EngagementDay] = []  # One entry per day, oldest first
+
+# Batch API
+class BatchOperationStatus(str, Enum):
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    SKIPPED = "skipped"  # A dependency failed, or stop_on_error stopped the batch
+
+class BatchOperation(BaseModel):
+    id: Optional[str] = None  # Defaults to the operation's position in the batch
+    op: str  # Registered operation name, e.g. "contacts.create"
+    params: Dict[str, Any] = {}  # {"$ref": "<id>.<field>"} values are taken from an earlier result
+    depends_on: List[str] = []  # Earlier operations that must succeed first
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+    stop_on_error: bool = False
+
+class BatchOperationResult(BaseModel):
+    id: str
+    op: str
+    status: BatchOperationStatus
+    status_code: int
+    result: Any = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchOperationResult]
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+
+# Suppression list
+class EmailSuppression(BaseModel):
+    email: str
+    reason: SuppressionReason = SuppressionReason.MANUAL
+    source: Optional[str] = None  # e.g. "sendgrid_webhook", "import"
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class EmailSuppressionCreate(BaseModel):
+    email: EmailStr
+    reason: SuppressionReason = SuppressionReason.MANUAL
+    source: Optional[str] = None
 
 # Analytics Models
 class ContactAnalytics(BaseModel):
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from pymongo import monitoring
+from metrics import DEFAULT_LATENCY_BUCKETS, registry
+
+logger = logging.getLogger(__name__)
+
+# Mongo commands are often sub-millisecond, so extend the latency buckets downwards
+MONGO_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005) + DEFAULT_LATENCY_BUCKETS
+
+# Commands worth timing, mapped to the fields that describe their query shape
+MONITORED_COMMANDS = {
+    "find": ("filter", "sort", "projection"),
+    "aggregate": ("pipeline",),
+    "count": ("query",),
+    "distinct": ("key", "query"),
+    "findAndModify": ("query", "sort", "update"),
+    "update": ("updates",),
+    "delete": ("deletes",),
+    "insert": (),
+    "getMore": (),
+}
+
+# Values under these keys describe the query rather than the data, so they are kept as-is
+STRUCTURAL_KEYS = {"sort", "projection", "key", "$sort", "$project", "$limit", "$skip", "$unset", "limit", "multi"}
+
+# Commands that can be re-run through `explain`
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+
+
+def redact(value: Any) -> Any:
+    """Replace literal values with type placeholders, keeping the query structure.
+
+    The result is still a valid query, so it can be passed to `explain`:
+    index selection depends on the shape of a filter, not on its values.
+    """
+    if isinstance(value, dict):
+        return {key: item if key in STRUCTURAL_KEYS else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(value[0])] if value else []
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, str) and value.startswith("$"):
+        return value  # field path, e.g. in $group
+    if isinstance(value, (int, float)):
+        return 0
+    if isinstance(value, datetime):
+        return datetime(1970, 1, 1)
+    return "?"
+
+
+class MongoCommandMonitor(monitoring.CommandListener):
+    """Times every Mongo command and keeps a log of slow query shapes.
+
+    PyMongo calls listeners from whatever thread runs the command (Motor
+    uses a thread pool), so the monitor's own state is guarded by one lock.
+    Latency metrics go to the shared registry, which is only safe to use
+    from the event loop thread, so once `bind_loop` is called they are
+    handed to that loop instead of being recorded on the calling thread.
+    """
+
+    def __init__(self, slow_threshold_ms: float = 100.0, max_slow_entries: int = 200, max_shapes: int = 500):
+        self.slow_threshold_ms = slow_threshold_ms
+        self.max_shapes = max_shapes
+        self.slow_queries: Deque[Dict[str, Any]] = deque(maxlen=max_slow_entries)
+        self.shapes: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[Tuple[int, Any], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """Record metrics on `loop`, the thread that owns the metrics registry"""
+        self._loop = loop
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if event.command_name not in MONITORED_COMMANDS:
+            return
+        command = event.command
+        collection = command.get("collection") if event.command_name == "getMore" else command.get(event.command_name)
+        shape = redact({
+            field: command[field]
+            for field in MONITORED_COMMANDS[event.command_name]
+            if field in command
+        })
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = {
+                "database": event.database_name,
+                "collection": str(collection),
+                "command": event.command_name,
+                "shape": shape,
+            }
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            pending = self._pending.pop((event.request_id, event.connection_id), None)
+            if pending is None:
+                return
+            duration = event.duration_micros / 1_000_000
+            duration_ms = duration * 1000
+            if duration_ms >= self.slow_threshold_ms:
+                self._record_slow(pending, duration_ms, failed)
+
+        loop = self._loop
+        if loop is None:
+            self._record_metrics(pending["collection"], pending["command"], duration, failed)
+            return
+        try:
+            loop.call_soon_threadsafe(self._record_metrics, pending["collection"], pending["command"], duration, failed)
+        except RuntimeError:
+            pass  # Loop already closed at shutdown
+
+    def _record_metrics(self, collection: str, command: str, duration: float, failed: bool):
+        registry.histogram(
+            "mongo_command_duration_seconds", "MongoDB command latency by collection and command",
+            buckets=MONGO_LATENCY_BUCKETS, collection=collection, command=command
+        ).observe(duration)
+        if failed:
+            registry.counter(
+                "mongo_command_failures_total", "Failed MongoDB commands by collection and command",
+                collection=collection, command=command
+            ).inc()
+
+    def _record_slow(self, pending: Dict[str, Any], duration_ms: float, failed: bool):
+        shape_key = json.dumps(
+            [pending["database"], pending["collection"], pending["command"], pending["shape"]],
+            sort_keys=True, default=str
+        )
+        entry = dict(pending, duration_ms=round(duration_ms, 3), failed=failed, at=datetime.utcnow())
+        self.slow_queries.append(entry)
+        logger.warning(
+            f"Slow Mongo {pending['command']} on {pending['collection']} took {duration_ms:.1f} ms: "
+            f"{json.dumps(pending['shape'], default=str)}"
+        )
+
+        stats = self.shapes.get(shape_key)
+        if stats is None:
+            if len(self.shapes) >= self.max_shapes:
+                # Forget the cheapest shape to make room
+                cheapest = min(self.shapes, key=lambda key: self.shapes[key]["total_ms"])
+                del self.shapes[cheapest]
+            stats = self.shapes[shape_key] = dict(pending, count=0, total_ms=0.0, max_ms=0.0)
+        stats["count"] += 1
+        stats["total_ms"] += duration_ms
+        stats["max_ms"] = max(stats["max_ms"], duration_ms)
+        stats["last_seen_at"] = entry["at"]
+
+    def get_slow_queries(self, limit: int = 50) -> Dict[str, Any]:
+        """Recent slow commands and the slowest query shapes by total time"""
+        with self._lock:
+            recent = list(self.slow_queries)[-limit:]
+        return {
+            "threshold_ms": self.slow_threshold_ms,
+            "recent": list(reversed(recent)),
+            "top_shapes": self.top_shapes(limit),
+        }
+
+    def top_shapes(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Slow query shapes ordered by the total time spent in them"""
+        with self._lock:
+            shapes = [dict(stats) for stats in self.shapes.values()]
+        shapes.sort(key=lambda stats: stats["total_ms"], reverse=True)
+        return shapes[:limit]
+
+    async def explain_top(self, client, limit: int = 5) -> List[Dict[str, Any]]:
+        """Run `explain` for the slowest query shapes and report their winning plans"""
+        results = []
+        for stats in self.top_shapes(len(self.shapes)):
+            if len(results) >= limit:
+                break
+            command = _explainable_command(stats)
+            if command is None:
+                continue
+            result = {key: stats[key] for key in ("database", "collection", "command", "shape", "count", "total_ms", "max_ms")}
+            try:
+                explain = await client[stats["database"]].command(
+                    {"explain": command, "verbosity": "queryPlanner"}
+                )
+                winning_plan = explain.get("queryPlanner", {}).get("winningPlan", explain.get("stages"))
+                result["winning_plan"] = winning_plan
+                result["collection_scan"] = "COLLSCAN" in json.dumps(explain, default=str)
+            except Exception as e:
+                result["error"] = str(e)
+            results.append(result)
+        return results
+
+
+def _explainable_command(stats: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Rebuild a runnable command from a redacted query shape"""
+    command_name = stats["command"]
+    if command_name not in EXPLAINABLE_COMMANDS:
+        return None
+    command = {command_name: stats["collection"]}
+    command.update(stats["shape"])
+    if command_name == "aggregate":
+        command["cursor"] = {}
+        # Stages that write can't be explained without side effects
+        command["pipeline"] = [
+            stage for stage in command.get("pipeline", []) if not {"$out", "$merge"} & set(stage)
+        ]
+    if command_name == "findAndModify" and "update" not in command:
+        command["remove"] = True
+    return command
+
+
+# Global monitor instance, registered on the Motor client
+mongo_monitor = MongoCommandMonitor(
+    slow_threshold_ms=float(os.environ.get('MONGO_SLOW_QUERY_MS', '100'))
+)
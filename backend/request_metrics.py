@@ -0,0 +1,90 @@
+import time
+from typing import Dict, List, Tuple
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from metrics import registry
+
+# Label used for requests that match no route, so unknown paths can't blow up cardinality
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RouteTemplates:
+    """Resolves a request to the template of the route it matches (e.g. `/api/contacts/{contact_id}`).
+
+    Results are cached per method and path; the cache is cleared when it
+    reaches `max_cached_paths` entries.
+    """
+
+    def __init__(self, routes: List[BaseRoute], max_cached_paths: int = 10000):
+        self.routes = routes
+        self.max_cached_paths = max_cached_paths
+        self._templates: Dict[Tuple[str, str], str] = {}
+
+    def resolve(self, scope: Scope) -> str:
+        """Route template for an HTTP scope, or UNMATCHED_ROUTE"""
+        key = (scope["method"], scope["path"])
+        template = self._templates.get(key)
+        if template is not None:
+            return template
+
+        template = UNMATCHED_ROUTE
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                template = getattr(route, "path", UNMATCHED_ROUTE)
+                break
+            if match == Match.PARTIAL and template == UNMATCHED_ROUTE:
+                # Path matches but the method doesn't; keep looking for a full match
+                template = getattr(route, "path", UNMATCHED_ROUTE)
+
+        if len(self._templates) >= self.max_cached_paths:
+            self._templates.clear()
+        self._templates[key] = template
+        return template
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware recording per-route request counts, latency and in-flight requests.
+
+    Requests are labelled with the route template (e.g.
+    `/api/contacts/{contact_id}`) rather than the raw path. Metrics are plain
+    attribute updates on the event loop thread, so no locking is involved.
+    """
+
+    def __init__(self, app: ASGIApp, routes: List[BaseRoute], max_cached_paths: int = 10000):
+        self.app = app
+        self.templates = RouteTemplates(routes, max_cached_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self.templates.resolve(scope)
+        in_flight = registry.gauge(
+            "http_requests_in_flight", "HTTP requests currently being served", method=method, route=route
+        )
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            status_class = f"{status_code // 100}xx"
+            registry.counter(
+                "http_requests_total", "HTTP requests by route and status class",
+                method=method, route=route, status=status_class
+            ).inc()
+            registry.histogram(
+                "http_request_duration_seconds", "HTTP request latency by route",
+                method=method, route=route
+            ).observe(time.perf_counter() - started)
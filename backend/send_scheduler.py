@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+from metrics import Histogram, RateMeter, registry
+
+logger = logging.getLogger(__name__)
+
+
+class SendLane(str, Enum):
+    TRANSACTIONAL = "transactional"  # welcome and test emails
+    AUTOMATION = "automation"  # sequence steps
+    BULK = "bulk"  # campaign sends
+
+# Lanes are served strictly in this order
+LANE_PRIORITY = (SendLane.TRANSACTIONAL, SendLane.AUTOMATION, SendLane.BULK)
+
+
+class TokenBucket:
+    """Token bucket rate limiter"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+
+class LaneStats:
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.queue_wait = Histogram()
+        self.latency = Histogram()
+        self.throughput = RateMeter()
+
+
+class SendScheduler:
+    """Prioritized send scheduler sharing one provider rate budget.
+
+    Every send is queued in a lane. A single dispatcher hands out the
+    provider budget (a token bucket) in lane priority order. Non-transactional
+    lanes are further capped to the unreserved share of both the rate and the
+    concurrency, so transactional mail always has headroom even while a large
+    campaign is draining.
+    """
+
+    def __init__(self, rate_per_second: float = 10.0, max_concurrency: int = 10,
+                 reserved_concurrency: int = 2, reserved_rate_share: float = 0.2):
+        self.max_concurrency = max(max_concurrency, 1)
+        self.reserved_concurrency = min(reserved_concurrency, self.max_concurrency - 1)
+        self.rate_limit = TokenBucket(rate_per_second)
+        self.shared_rate_limit = TokenBucket(rate_per_second * (1 - reserved_rate_share))
+        self.queues: Dict[SendLane, Deque[Tuple[float, Callable[..., Awaitable[Any]], tuple, asyncio.Future]]] = {
+            lane: deque() for lane in LANE_PRIORITY
+        }
+        self.stats: Dict[SendLane, LaneStats] = {lane: LaneStats() for lane in LANE_PRIORITY}
+        self.in_flight = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def submit(self, lane: SendLane, func: Callable[..., Awaitable[Any]], *args) -> Any:
+        """Queue `func(*args)` on a lane and wait for its result"""
+        self._ensure_dispatcher()
+        future = asyncio.get_running_loop().create_future()
+        self.queues[lane].append((time.monotonic(), func, args, future))
+        self.stats[lane].submitted += 1
+        self._wakeup.set()
+        return await future
+
+    def _next_lane(self) -> Optional[SendLane]:
+        shared_limit = self.max_concurrency - self.reserved_concurrency
+        for lane in LANE_PRIORITY:
+            queue = self.queues[lane]
+            while queue and queue[0][3].done():
+                queue.popleft()  # submitter went away while queued
+            if not queue:
+                continue
+            if lane == SendLane.TRANSACTIONAL:
+                if self.in_flight < self.max_concurrency:
+                    return lane
+            elif self._shared_in_flight() < shared_limit and self.in_flight < self.max_concurrency:
+                return lane
+        return None
+
+    def _shared_in_flight(self) -> int:
+        return self.in_flight - self.stats[SendLane.TRANSACTIONAL].in_flight
+
+    async def _dispatch(self):
+        while True:
+            lane = self._next_lane()
+            if lane is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            wait = self.rate_limit.wait_time()
+            if lane != SendLane.TRANSACTIONAL:
+                wait = max(wait, self.shared_rate_limit.wait_time())
+            if wait > 0:
+                # Re-pick afterwards: a transactional send may have arrived meanwhile
+                await asyncio.sleep(wait)
+                continue
+
+            self.rate_limit.take()
+            if lane != SendLane.TRANSACTIONAL:
+                self.shared_rate_limit.take()
+
+            enqueued_at, func, args, future = self.queues[lane].popleft()
+            stats = self.stats[lane]
+            stats.queue_wait.observe(time.monotonic() - enqueued_at)
+            stats.in_flight += 1
+            self.in_flight += 1
+            task = asyncio.create_task(self._run(lane, enqueued_at, func, args, future))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, lane: SendLane, enqueued_at: float, func, args, future: asyncio.Future):
+        stats = self.stats[lane]
+        try:
+            result = await func(*args)
+            stats.completed += 1
+            stats.throughput.mark()
+            outcome = "success" if isinstance(result, dict) and result.get("success") else "failure"
+            registry.counter("email_sends_total", "Email send attempts by lane and outcome",
+                             lane=lane.value, outcome=outcome).inc()
+            if not future.done():
+                future.set_result(result)
+        except Exception as e:
+            stats.failed += 1
+            registry.counter("email_sends_total", "Email send attempts by lane and outcome",
+                             lane=lane.value, outcome="error").inc()
+            if not future.done():
+                future.set_exception(e)
+        finally:
+            stats.in_flight -= 1
+            self.in_flight -= 1
+            stats.latency.observe(time.monotonic() - enqueued_at)
+            self._wakeup.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-lane queue depth, throughput and latency"""
+        return {
+            "rate_per_second": self.rate_limit.rate,
+            "max_concurrency": self.max_concurrency,
+            "reserved_concurrency": self.reserved_concurrency,
+            "in_flight": self.in_flight,
+            "lanes": {
+                lane.value: {
+                    "queue_depth": len(self.queues[lane]),
+                    "in_flight": stats.in_flight,
+                    "submitted": stats.submitted,
+                    "completed": stats.completed,
+                    "failed": stats.failed,
+                    "sends_per_second": round(stats.throughput.rate(), 3),
+                    "queue_wait_seconds": stats.queue_wait.summary(),
+                    "latency_seconds": stats.latency.summary(),
+                }
+                for lane, stats in self.stats.items()
+            }
+        }
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from motor.motor_asyncio import AsyncIOMotorCollection
+from models import AutomationStatus, EmailSequence
+from template_renderer import CompiledTemplate
+
+logger = logging.getLogger(__name__)
+
+
+class SequenceCache:
+    """Versioned in-process cache of all email sequences.
+
+    Sequences are few and read on every sequence send, so the whole collection
+    is held in memory. Local writes call `invalidate()`; writes made by other
+    processes are picked up when the snapshot is older than `ttl` seconds.
+    Every reload bumps `version`, which callers can use to key derived data
+    (e.g. compiled templates).
+    
+    Each snapshot also carries a trigger index (tag -> sequence ids,
+    status -> sequence ids) over active sequences, so finding the sequences a
+    contact event should enroll into is a dictionary lookup.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, ttl: float = 60.0):
+        self.collection = collection
+        self.ttl = ttl
+        self.version = 0
+        self._sequences: Dict[str, EmailSequence] = {}
+        self._by_tag: Dict[str, Set[str]] = {}
+        self._by_status: Dict[str, Set[str]] = {}
+        self._compiled_steps: Dict[Tuple[str, int], Dict[str, Optional[CompiledTemplate]]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Drop the snapshot; the next read reloads it"""
+        self._loaded_at = None
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def _ensure_loaded(self):
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if self._is_fresh():
+                return
+            sequences = await self.collection.find({}).to_list(length=None)
+            self._sequences = {sequence['id']: EmailSequence(**sequence) for sequence in sequences}
+            self._build_trigger_index()
+            self._compiled_steps = {}
+            self.version += 1
+            self._loaded_at = time.monotonic()
+            logger.debug(f"Loaded {len(self._sequences)} sequences into cache (version {self.version})")
+
+    def _build_trigger_index(self):
+        by_tag: Dict[str, Set[str]] = {}
+        by_status: Dict[str, Set[str]] = {}
+        for sequence in self._sequences.values():
+            if sequence.status != AutomationStatus.ACTIVE:
+                continue
+            for tag in sequence.trigger_tags:
+                by_tag.setdefault(tag, set()).add(sequence.id)
+            for status in sequence.trigger_status:
+                by_status.setdefault(status.value, set()).add(sequence.id)
+        self._by_tag = by_tag
+        self._by_status = by_status
+
+    async def get_triggered(self, tags: Iterable[str] = (), status: Optional[str] = None) -> List[EmailSequence]:
+        """Active sequences triggered by any of `tags` or by `status`"""
+        await self._ensure_loaded()
+        sequence_ids: Set[str] = set()
+        for tag in tags:
+            sequence_ids |= self._by_tag.get(tag, set())
+        if status is not None:
+            sequence_ids |= self._by_status.get(getattr(status, 'value', status), set())
+        return [self._sequences[sequence_id] for sequence_id in sequence_ids]
+
+    def get_compiled_step(self, sequence: EmailSequence, step: int) -> Dict[str, Optional[CompiledTemplate]]:
+        """Subject, HTML and text of a sequence step, compiled once per cache version"""
+        key = (sequence.id, step)
+        compiled = self._compiled_steps.get(key)
+        if compiled is None:
+            email_step = sequence.emails[step]
+            text_content = email_step.get('text_content')
+            compiled = self._compiled_steps[key] = {
+                'subject': CompiledTemplate(email_step['subject']),
+                'html_content': CompiledTemplate(email_step['html_content']),
+                'text_content': CompiledTemplate(text_content) if text_content else None,
+            }
+        return compiled
+
+    async def get(self, sequence_id: str) -> Optional[EmailSequence]:
+        """Get a sequence by ID, falling back to the database for sequences created elsewhere"""
+        await self._ensure_loaded()
+        sequence = self._sequences.get(sequence_id)
+        if sequence is None:
+            sequence_data = await self.collection.find_one({"id": sequence_id})
+            if sequence_data:
+                sequence = self._sequences[sequence_id] = EmailSequence(**sequence_data)
+        return sequence
+
+    async def get_many(self, sequence_ids: Iterable[str]) -> Dict[str, EmailSequence]:
+        """Get the sequences among `sequence_ids` that exist, fetching ones created elsewhere in one query"""
+        await self._ensure_loaded()
+        sequence_ids = set(sequence_ids)
+        missing = [sequence_id for sequence_id in sequence_ids if sequence_id not in self._sequences]
+        if missing:
+            async for sequence_data in self.collection.find({"id": {"$in": missing}}):
+                self._sequences[sequence_data['id']] = EmailSequence(**sequence_data)
+        return {
+            sequence_id: self._sequences[sequence_id]
+            for sequence_id in sequence_ids
+            if sequence_id in self._sequences
+        }
+
+    async def get_all(self) -> Dict[str, EmailSequence]:
+        """Get every cached sequence keyed by ID"""
+        await self._ensure_loaded()
+        return dict(self._sequences)
@@ -0,0 +1,122 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING
+
+logger = logging.getLogger(__name__)
+
+
+class SequenceScheduler:
+    """Min-heap of upcoming `next_email_at` times that wakes the processor exactly when work is due.
+
+    The heap is fed by enrollments and step advances made in this process and
+    rebuilt from an index scan on startup. Two cheap fallbacks cover work
+    scheduled by other processes: an indexed peek at the earliest due time
+    every `peek_interval` seconds, and a full processing pass every
+    `safety_interval` seconds.
+    """
+
+    def __init__(self, enrollments: AsyncIOMotorCollection, peek_interval: float = 30.0,
+                 safety_interval: float = 600.0, max_entries: int = 100000):
+        self.enrollments = enrollments
+        self.peek_interval = peek_interval
+        self.safety_interval = safety_interval
+        self.max_entries = max_entries
+        self._heap: List[datetime] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self.runs = 0
+        self.last_run_at: Optional[datetime] = None
+
+    def schedule(self, when: Optional[datetime]):
+        """Register an upcoming send time"""
+        if when is None or len(self._heap) >= self.max_entries:
+            return
+        earliest = self._heap[0] if self._heap else None
+        heapq.heappush(self._heap, when)
+        if self._wakeup is not None and (earliest is None or when < earliest):
+            self._wakeup.set()
+
+    def next_due(self) -> Optional[datetime]:
+        """Earliest known send time"""
+        return self._heap[0] if self._heap else None
+
+    async def rebuild(self):
+        """Reload upcoming send times from the (is_active, next_email_at) index"""
+        cursor = self.enrollments.find(
+            {"is_active": True, "next_email_at": {"$ne": None}},
+            {"_id": 0, "next_email_at": 1}
+        ).sort("next_email_at", ASCENDING).limit(self.max_entries)
+        self._heap = [enrollment['next_email_at'] async for enrollment in cursor]
+        heapq.heapify(self._heap)
+        logger.info(f"Sequence scheduler rebuilt with {len(self._heap)} upcoming sends")
+
+    async def peek(self):
+        """Pick up the earliest send time, including ones scheduled by other processes"""
+        enrollment = await self.enrollments.find_one(
+            {"is_active": True, "next_email_at": {"$ne": None}},
+            {"_id": 0, "next_email_at": 1},
+            sort=[("next_email_at", ASCENDING)]
+        )
+        if enrollment and (not self._heap or enrollment['next_email_at'] < self._heap[0]):
+            self.schedule(enrollment['next_email_at'])
+
+    def _pop_due(self, now: datetime) -> int:
+        due = 0
+        while self._heap and self._heap[0] <= now:
+            heapq.heappop(self._heap)
+            due += 1
+        return due
+
+    async def _sleep(self, now: datetime, last_peek: float):
+        timeout = self.peek_interval - (time.monotonic() - last_peek)
+        if self._heap:
+            timeout = min(timeout, (self._heap[0] - now).total_seconds())
+        if timeout <= 0:
+            return
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self, process: Callable[[], Awaitable[None]]):
+        """Call `process` whenever sends are due, until cancelled"""
+        self._wakeup = asyncio.Event()
+        await self.rebuild()
+        last_peek = last_full_run = time.monotonic()
+
+        while True:
+            try:
+                now = datetime.utcnow()
+                safety_due = time.monotonic() - last_full_run >= self.safety_interval
+                if self._pop_due(now) or safety_due:
+                    await process()
+                    self.runs += 1
+                    self.last_run_at = now
+                    last_full_run = time.monotonic()
+                    # Anything that became due while processing was handled by the same pass
+                    self._pop_due(now)
+
+                if time.monotonic() - last_peek >= self.peek_interval:
+                    await self.peek()
+                    last_peek = time.monotonic()
+
+                await self._sleep(datetime.utcnow(), last_peek)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error processing email sequences: {str(e)}")
+                await asyncio.sleep(5)
+
+    def get_stats(self):
+        """Scheduler state for diagnostics"""
+        return {
+            "pending_entries": len(self._heap),
+            "next_due": self.next_due(),
+            "runs": self.runs,
+            "last_run_at": self.last_run_at,
+        }
@@ -0,0 +1,74 @@
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+
+
+@lru_cache(maxsize=None)
+def _field_defaults(model: Type[BaseModel]) -> Tuple[Tuple[str, Any, Any], ...]:
+    """(name, default, default_factory) for every field of a model"""
+    return tuple(
+        (name, field.default, field.default_factory)
+        for name, field in model.model_fields.items()
+    )
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Optional[List[str]]:
+    """Parse a comma-separated `fields=` parameter into field names of `model`
+
+    `id` is always included. Raises ValueError for unknown fields.
+    """
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in model.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if 'id' in model.model_fields and 'id' not in requested:
+        requested.insert(0, 'id')
+    return requested
+
+
+def projection_for(fields: Optional[Iterable[str]]) -> Dict[str, Any]:
+    """Mongo projection returning only `fields` (or everything but `_id`)"""
+    projection: Dict[str, Any] = {"_id": 0}
+    if fields:
+        projection.update({field: 1 for field in fields})
+    return projection
+
+
+def document_to_response(document: Dict[str, Any], model: Type[BaseModel],
+                         fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Shape a trusted Mongo document like `model` would serialize it, without validating it.
+
+    Documents were validated when they were written, so reads only need
+    the model's field set: extra keys (e.g. `_id`, lease fields) are dropped
+    and fields added to the model since the document was written get their
+    defaults. With `fields`, only those fields are returned.
+    """
+    shaped = {}
+    for name, default, default_factory in _field_defaults(model):
+        if fields is not None and name not in fields:
+            continue
+        if name in document:
+            shaped[name] = document[name]
+        elif default_factory is not None:
+            shaped[name] = default_factory()
+        elif default is not PydanticUndefined:
+            shaped[name] = default
+    return shaped
+
+
+def documents_to_response(documents: Iterable[Dict[str, Any]], model: Type[BaseModel],
+                          fields: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """Shape a list of trusted Mongo documents like a `List[model]` response"""
+    fields = set(fields) if fields is not None else None
+    return [document_to_response(document, model, fields) for document in documents]
+
+
+def fast_json_response(documents: Iterable[Dict[str, Any]], model: Type[BaseModel],
+                       fields: Optional[Iterable[str]] = None,
+                       headers: Optional[Dict[str, str]] = None) -> ORJSONResponse:
+    """Serialize trusted documents with orjson, bypassing response_model validation"""
+    return ORJSONResponse(documents_to_response(documents, model, fields), headers=headers)
@@ -6,40 +6,44 @@ from pathlib import Path
 ROOT_DIR = Path(__file__).parent
 sys.path.append(str(ROOT_DIR))
 
-from fastapi import FastAPI, APIRouter, HTTPException, Query, BackgroundTasks
-from fastapi.responses import JSONResponse
-from dotenv import load_dotenv
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import logging
 import asyncio
-from typing import List, Optional
+import logging
+from typing import List, Optional, Union
 from datetime import datetime
 
 # Import our models and services
 from models import (
     Contact, ContactCreate, ContactUpdate, ContactStatus, LeadSource,
-    Interaction, InteractionCreate,
+    Interaction, InteractionCreate, ContactDetail,
     Campaign, CampaignCreate, CampaignStatus,
-    EmailTemplate, EmailTemplateCreate,
-    EmailSequence, EmailSequenceCreate,
-    DashboardStats, LeadSourceStats, ContactStatusStats, RecentActivity
+    EmailTemplate, EmailTemplateCreate, EmailTemplateSummary, CampaignSummary, EmailSequenceSummary, ListView,
+    EmailSequence, EmailSequenceCreate, BulkEnrollmentRequest, EnrollmentJob,
+    EnrollmentHistory, SequenceStats,
+    EmailSuppression, EmailSuppressionCreate, SuppressionReason,
+    DashboardStats, LeadSourceStats, ContactStatusStats, RecentActivity,
+    BatchRequest, BatchResponse
 )
-from crm_service import CRMService
-from campaign_service import CampaignService
+from admission_control import AdmissionControlMiddleware, ConcurrencyLimiter
+from batch import BatchError, BatchExecutor
+from compression import CompressionMiddleware, DEFAULT_COMPRESSIBLE_TYPES
 from email_service import email_service
+from http_cache import ConditionalGet, NotModified, not_modified_response
+from metrics import registry
+from mongo_monitoring import mongo_monitor
+from request_metrics import RequestMetricsMiddleware
+from serialization import fast_json_response, parse_fields, projection_for
+from task_supervisor import SupervisorFull
+from bootstrap import (
+    client, crm_service, campaign_service, suppression_service, job_queue, leader_elector, api_tasks,
+    initialize, start_cache_invalidation, start_worker, stop_worker
+)
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Initialize services
-crm_service = CRMService(db)
-campaign_service = CampaignService(db, crm_service)
+# Run the background worker inside the API process unless a separate
+# `python worker.py run` deployment handles it
+run_embedded_worker = os.environ.get('RUN_EMBEDDED_WORKER', 'true').lower() == 'true'
 
 # Create the main app
 app = FastAPI(
@@ -58,6 +62,73 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def select_fields(fields: Optional[str], model):
+    """Fields to return for a `fields=` parameter, defaulting to all of `model`'s fields"""
+    try:
+        return parse_fields(fields, model) or list(model.model_fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ETag validation for slowly-changing resources. Editable resources are
+# revalidated on every request so a user's own edits show up immediately;
+# analytics may be reused for a short while without asking.
+analytics_max_age = int(os.environ.get('ANALYTICS_CACHE_MAX_AGE', '30'))
+templates_cache = ConditionalGet(crm_service.versions, "email_templates")
+campaigns_cache = ConditionalGet(crm_service.versions, "campaigns")
+sequences_cache = ConditionalGet(crm_service.versions, "email_sequences")
+analytics_cache = ConditionalGet(
+    crm_service.versions, "contacts", "interactions",
+    cache_control=f"private, max-age={analytics_max_age}, must-revalidate"
+)
+app.add_exception_handler(NotModified, not_modified_response)
+
+# Admission control: routes are grouped into classes with separate
+# concurrency budgets. Monitoring and diagnostics are always admitted.
+ANALYTICS_ROUTES = {
+    "/api/metrics/backlog",
+    "/api/sequences/{sequence_id}/stats",
+    "/api/suppressions/stats",
+    "/api/system/slow-queries/explain",
+}
+SEND_ROUTES = {
+    "/api/campaigns/{campaign_id}/send",
+    "/api/sequences/{sequence_id}/enroll",
+    "/api/email/test",
+    "/api/system/process-sequences",
+    "/api/system/archive-enrollments",
+}
+UNLIMITED_ROUTES = {"/metrics", "/api/", "/api/email/health"}
+
+def classify_request(method: str, route: str) -> Optional[str]:
+    """Admission class of a request: read, write, analytics or send (None to always admit)"""
+    if route in UNLIMITED_ROUTES or (method == "GET" and route.startswith("/api/system/")):
+        return None
+    if route in ANALYTICS_ROUTES or route.startswith("/api/analytics/"):
+        return "analytics"
+    if route in SEND_ROUTES and method == "POST":
+        return "send"
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return "read"
+    return "write"
+
+def admission_limiter(name: str, concurrency: int, queue: int, timeout: float, retry_after: float = 1.0):
+    """Limiter for an admission class, overridable with ADMISSION_<NAME>_* environment variables"""
+    prefix = f"ADMISSION_{name.upper()}"
+    return ConcurrencyLimiter(
+        name,
+        max_concurrency=int(os.environ.get(f'{prefix}_CONCURRENCY', concurrency)),
+        max_queue=int(os.environ.get(f'{prefix}_QUEUE', queue)),
+        queue_timeout=float(os.environ.get(f'{prefix}_TIMEOUT', timeout)),
+        retry_after=float(os.environ.get(f'{prefix}_RETRY_AFTER', retry_after))
+    )
+
+admission_limiters = {
+    "read": admission_limiter("read", concurrency=64, queue=256, timeout=5),
+    "write": admission_limiter("write", concurrency=32, queue=128, timeout=10),
+    "analytics": admission_limiter("analytics", concurrency=4, queue=32, timeout=10, retry_after=5),
+    "send": admission_limiter("send", concurrency=4, queue=16, timeout=5, retry_after=10),
+}
+
 # ============================================================================
 # CONTACT MANAGEMENT ENDPOINTS
 # ============================================================================
@@ -78,18 +149,21 @@ async def get_contacts(
     limit: int = Query(100, ge=1, le=1000),
     status: Optional[ContactStatus] = None,
     lead_source: Optional[LeadSource] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
 ):
     """Get contacts with filtering and pagination"""
+    selected = select_fields(fields, Contact)
     try:
-        contacts = await crm_service.get_contacts(
+        contacts = await crm_service.get_contact_documents(
             skip=skip, 
             limit=limit, 
             status=status, 
             lead_source=lead_source,
-            search=search
+            search=search,
+            projection=projection_for(selected)
         )
-        return contacts
+        return fast_json_response(contacts, Contact, selected)
     except Exception as e:
         logger.error(f"Failed to get contacts: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -128,10 +202,49 @@ async def delete_contact(contact_id: str):
         raise HTTPException(status_code=404, detail="Contact not found")
     return {"message": "Contact deleted successfully"}
 
+@api_router.get("/contacts/{contact_id}/enrollments/history", response_model=List[EnrollmentHistory])
+async def get_contact_enrollment_history(contact_id: str, limit: int = Query(50, ge=1, le=200)):
+    """Get archived sequence enrollments for a contact"""
+    history = await campaign_service.get_contact_enrollment_history(contact_id, limit)
+    return history
+
+@api_router.get("/contacts/{contact_id}/detail", response_model=ContactDetail)
+async def get_contact_detail(
+    contact_id: str,
+    interactions_limit: int = Query(20, ge=1, le=200),
+    engagement_days: int = Query(30, ge=1, le=365)
+):
+    """Get everything the contact page shows in one request"""
+    contact, (interactions, next_cursor), enrollments, engagement = await asyncio.gather(
+        crm_service.get_contact(contact_id),
+        crm_service.get_contact_interactions_page(contact_id, interactions_limit),
+        campaign_service.get_active_enrollments(contact_id),
+        crm_service.get_engagement_rollup(contact_id, engagement_days)
+    )
+    if not contact:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    return ContactDetail(
+        contact=contact,
+        interactions=interactions,
+        next_interactions_cursor=next_cursor,
+        enrollments=enrollments,
+        engagement=engagement
+    )
+
 @api_router.get("/contacts/{contact_id}/interactions", response_model=List[Interaction])
-async def get_contact_interactions(contact_id: str, limit: int = Query(50, ge=1, le=200)):
-    """Get interactions for a contact"""
-    interactions = await crm_service.get_contact_interactions(contact_id, limit)
+async def get_contact_interactions(
+    response: Response,
+    contact_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page")
+):
+    """Get interactions for a contact, most recent first"""
+    try:
+        interactions, next_cursor = await crm_service.get_contact_interactions_page(contact_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return interactions
 
 # ============================================================================
@@ -162,17 +275,23 @@ async def create_template(template_data: EmailTemplateCreate):
         logger.error(f"Failed to create template: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/templates", response_model=List[EmailTemplate])
-async def get_templates():
-    """Get all email templates"""
+@api_router.get("/templates", response_model=Union[List[EmailTemplate], List[EmailTemplateSummary]])
+async def get_templates(
+    view: ListView = ListView.FULL,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    cache_headers: dict = Depends(templates_cache)
+):
+    """Get all email templates; `view=summary` leaves out the content bodies"""
+    model = EmailTemplateSummary if view == ListView.SUMMARY else EmailTemplate
+    selected = select_fields(fields, model)
     try:
-        templates = await campaign_service.get_templates()
-        return templates
+        templates = await campaign_service.get_template_documents(projection_for(selected))
+        return fast_json_response(templates, model, selected, headers=cache_headers)
     except Exception as e:
         logger.error(f"Failed to get templates: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/templates/{template_id}", response_model=EmailTemplate)
+@api_router.get("/templates/{template_id}", response_model=EmailTemplate, dependencies=[Depends(templates_cache)])
 async def get_template(template_id: str):
     """Get a specific email template"""
     template = await campaign_service.get_template(template_id)
@@ -202,17 +321,23 @@ async def create_campaign(campaign_data: CampaignCreate):
         logger.error(f"Failed to create campaign: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/campaigns", response_model=List[Campaign])
-async def get_campaigns():
-    """Get all campaigns"""
+@api_router.get("/campaigns", response_model=Union[List[Campaign], List[CampaignSummary]])
+async def get_campaigns(
+    view: ListView = ListView.FULL,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    cache_headers: dict = Depends(campaigns_cache)
+):
+    """Get all campaigns; `view=summary` leaves out the content bodies"""
+    model = CampaignSummary if view == ListView.SUMMARY else Campaign
+    selected = select_fields(fields, model)
     try:
-        campaigns = await campaign_service.get_campaigns()
-        return campaigns
+        campaigns = await campaign_service.get_campaign_documents(projection_for(selected))
+        return fast_json_response(campaigns, model, selected, headers=cache_headers)
     except Exception as e:
         logger.error(f"Failed to get campaigns: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/campaigns/{campaign_id}", response_model=Campaign)
+@api_router.get("/campaigns/{campaign_id}", response_model=Campaign, dependencies=[Depends(campaigns_cache)])
 async def get_campaign(campaign_id: str):
     """Get a specific campaign"""
     campaign = await campaign_service.get_campaign(campaign_id)
@@ -244,17 +369,23 @@ async def create_sequence(sequence_data: EmailSequenceCreate):
         logger.error(f"Failed to create sequence: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/sequences", response_model=List[EmailSequence])
-async def get_sequences():
-    """Get all email sequences"""
+@api_router.get("/sequences", response_model=Union[List[EmailSequence], List[EmailSequenceSummary]])
+async def get_sequences(
+    view: ListView = ListView.FULL,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    cache_headers: dict = Depends(sequences_cache)
+):
+    """Get all email sequences; `view=summary` leaves out the content bodies"""
+    model = EmailSequenceSummary if view == ListView.SUMMARY else EmailSequence
+    selected = select_fields(fields, model)
     try:
-        sequences = await campaign_service.get_sequences()
-        return sequences
+        sequences = await campaign_service.get_sequence_documents(projection_for(selected))
+        return fast_json_response(sequences, model, selected, headers=cache_headers)
     except Exception as e:
         logger.error(f"Failed to get sequences: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/sequences/{sequence_id}", response_model=EmailSequence)
+@api_router.get("/sequences/{sequence_id}", response_model=EmailSequence, dependencies=[Depends(sequences_cache)])
 async def get_sequence(sequence_id: str):
     """Get a specific email sequence"""
     sequence = await campaign_service.get_sequence(sequence_id)
@@ -262,6 +393,12 @@ async def get_sequence(sequence_id: str):
         raise HTTPException(status_code=404, detail="Sequence not found")
     return sequence
 
+@api_router.get("/sequences/{sequence_id}/stats", response_model=SequenceStats)
+async def get_sequence_stats(sequence_id: str):
+    """Get enrollment totals for an email sequence"""
+    stats = await campaign_service.get_sequence_stats(sequence_id)
+    return stats
+
 @api_router.post("/sequences/{sequence_id}/enroll/{contact_id}")
 async def enroll_contact_in_sequence(sequence_id: str, contact_id: str):
     """Enroll a contact in an email sequence"""
@@ -272,11 +409,79 @@ async def enroll_contact_in_sequence(sequence_id: str, contact_id: str):
         logger.error(f"Failed to enroll contact: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/sequences/{sequence_id}/enroll", response_model=EnrollmentJob)
+async def bulk_enroll_in_sequence(sequence_id: str, segment: BulkEnrollmentRequest):
+    """Enroll a segment of contacts (or a list of contact ids) in an email sequence"""
+    try:
+        job = await campaign_service.create_enrollment_job(sequence_id, segment)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not job:
+        raise HTTPException(status_code=404, detail="Sequence not found")
+    
+    await job_queue.enqueue("sequence_enrollment", {"job_id": job.id})
+    return job
+
+@api_router.get("/sequences/enrollment-jobs/{job_id}", response_model=EnrollmentJob)
+async def get_enrollment_job(job_id: str):
+    """Get the progress of a bulk enrollment job"""
+    job = await campaign_service.get_enrollment_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Enrollment job not found")
+    return job
+
+# ============================================================================
+# EMAIL SUPPRESSION ENDPOINTS
+# ============================================================================
+
+@api_router.post("/suppressions", response_model=EmailSuppression)
+async def add_suppression(suppression_data: EmailSuppressionCreate):
+    """Add an address to the global suppression list"""
+    try:
+        suppression = await suppression_service.add_suppression(suppression_data)
+        return suppression
+    except Exception as e:
+        logger.error(f"Failed to add suppression: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/suppressions", response_model=List[EmailSuppression])
+async def get_suppressions(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    reason: Optional[SuppressionReason] = None
+):
+    """Get suppressed addresses"""
+    try:
+        suppressions = await suppression_service.get_suppressions(skip=skip, limit=limit, reason=reason)
+        return suppressions
+    except Exception as e:
+        logger.error(f"Failed to get suppressions: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/suppressions/stats")
+async def get_suppression_stats():
+    """Get suppression bloom filter statistics"""
+    return suppression_service.get_stats()
+
+@api_router.get("/suppressions/{email}")
+async def check_suppression(email: str):
+    """Check whether an address is suppressed"""
+    suppressed = await suppression_service.is_suppressed(email)
+    return {"email": email, "suppressed": suppressed}
+
+@api_router.delete("/suppressions/{email}")
+async def remove_suppression(email: str):
+    """Remove an address from the suppression list"""
+    success = await suppression_service.remove_suppression(email)
+    if not success:
+        raise HTTPException(status_code=404, detail="Suppression not found")
+    return {"message": "Suppression removed successfully"}
+
 # ============================================================================
 # ANALYTICS ENDPOINTS
 # ============================================================================
 
-@api_router.get("/analytics/dashboard", response_model=DashboardStats)
+@api_router.get("/analytics/dashboard", response_model=DashboardStats, dependencies=[Depends(analytics_cache)])
 async def get_dashboard_stats():
     """Get dashboard statistics"""
     try:
@@ -286,7 +491,7 @@ async def get_dashboard_stats():
         logger.error(f"Failed to get dashboard stats: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/analytics/lead-sources", response_model=List[LeadSourceStats])
+@api_router.get("/analytics/lead-sources", response_model=List[LeadSourceStats], dependencies=[Depends(analytics_cache)])
 async def get_lead_source_stats():
     """Get lead source statistics"""
     try:
@@ -296,7 +501,7 @@ async def get_lead_source_stats():
         logger.error(f"Failed to get lead source stats: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/analytics/contact-status", response_model=List[ContactStatusStats])
+@api_router.get("/analytics/contact-status", response_model=List[ContactStatusStats], dependencies=[Depends(analytics_cache)])
 async def get_contact_status_stats():
     """Get contact status statistics"""
     try:
@@ -306,7 +511,7 @@ async def get_contact_status_stats():
         logger.error(f"Failed to get contact status stats: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/analytics/recent-activity", response_model=List[RecentActivity])
+@api_router.get("/analytics/recent-activity", response_model=List[RecentActivity], dependencies=[Depends(analytics_cache)])
 async def get_recent_activity(limit: int = Query(10, ge=1, le=50)):
     """Get recent activity"""
     try:
@@ -316,6 +521,65 @@ async def get_recent_activity(limit: int = Query(10, ge=1, le=50)):
         logger.error(f"Failed to get recent activity: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# ============================================================================
+# BATCH ENDPOINTS
+# ============================================================================
+
+async def _found(awaitable, detail: str):
+    """Await a lookup, raising 404 with `detail` if it found nothing"""
+    value = await awaitable
+    if not value:
+        raise HTTPException(status_code=404, detail=detail)
+    return value
+
+# Operations available to POST /api/batch, mapped onto the service methods
+# behind the equivalent single-resource endpoints
+batch_executor = BatchExecutor(
+    max_concurrency=int(os.environ.get('BATCH_CONCURRENCY', '8')),
+    max_operations=int(os.environ.get('BATCH_MAX_OPERATIONS', '50'))
+)
+# A batch is admitted as a write; its expensive operations also take a slot
+# from their own admission class, as their endpoints do
+analytics_limiter = admission_limiters["analytics"]
+send_limiter = admission_limiters["send"]
+batch_executor.register("contacts.create", lambda p: crm_service.create_contact(ContactCreate(**p)))
+batch_executor.register("contacts.get", lambda p: _found(crm_service.get_contact(p['contact_id']), "Contact not found"))
+batch_executor.register("contacts.update", lambda p: _found(
+    crm_service.update_contact(p['contact_id'], ContactUpdate(**p)), "Contact not found"
+))
+batch_executor.register("contacts.delete", lambda p: _found(crm_service.delete_contact(p['contact_id']), "Contact not found"))
+batch_executor.register("contacts.interactions", lambda p: crm_service.get_contact_interactions(
+    p['contact_id'], min(int(p.get('limit', 50)), 200)
+))
+batch_executor.register("contacts.detail", lambda p: get_contact_detail(
+    p['contact_id'], min(int(p.get('interactions_limit', 20)), 200), min(int(p.get('engagement_days', 30)), 365)
+))
+batch_executor.register("interactions.create", lambda p: crm_service.create_interaction(InteractionCreate(**p)))
+batch_executor.register("templates.create", lambda p: campaign_service.create_template(EmailTemplateCreate(**p)))
+batch_executor.register("templates.get", lambda p: _found(campaign_service.get_template(p['template_id']), "Template not found"))
+batch_executor.register("campaigns.create", lambda p: campaign_service.create_campaign(CampaignCreate(**p)))
+batch_executor.register("campaigns.get", lambda p: _found(campaign_service.get_campaign(p['campaign_id']), "Campaign not found"))
+batch_executor.register("campaigns.send", lambda p: campaign_service.send_campaign(p['campaign_id']), limiter=send_limiter)
+batch_executor.register("sequences.get", lambda p: _found(campaign_service.get_sequence(p['sequence_id']), "Sequence not found"))
+batch_executor.register("sequences.enroll", lambda p: campaign_service.enroll_contact_in_sequence(p['contact_id'], p['sequence_id']))
+batch_executor.register("analytics.dashboard", lambda p: crm_service.get_dashboard_stats(), limiter=analytics_limiter)
+batch_executor.register("analytics.lead_sources", lambda p: crm_service.get_lead_source_stats(), limiter=analytics_limiter)
+batch_executor.register("analytics.contact_status", lambda p: crm_service.get_contact_status_stats(), limiter=analytics_limiter)
+batch_executor.register("analytics.recent_activity", lambda p: crm_service.get_recent_activity(min(int(p.get('limit', 10)), 50)), limiter=analytics_limiter)
+
+@api_router.post("/batch", response_model=BatchResponse)
+async def run_batch(batch: BatchRequest):
+    """Run several operations in one request, each with its own result"""
+    try:
+        return await batch_executor.run(batch.operations, batch.stop_on_error)
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/batch/operations")
+async def get_batch_operations():
+    """List the operations POST /batch accepts"""
+    return {"operations": sorted(batch_executor.handlers), "max_operations": batch_executor.max_operations}
+
 # ============================================================================
 # SYSTEM ENDPOINTS
 # ============================================================================
@@ -342,15 +606,73 @@ async def initialize_system():
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/system/process-sequences")
-async def process_sequences(background_tasks: BackgroundTasks):
+async def process_sequences():
     """Process email sequences (normally run by scheduler)"""
     try:
-        background_tasks.add_task(campaign_service.process_sequence_emails)
+        api_tasks.submit_nowait(campaign_service.process_sequence_emails)
         return {"message": "Sequence processing started"}
+    except SupervisorFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to process sequences: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/system/archive-enrollments")
+async def archive_enrollments(stale_after_days: int = Query(30, ge=1)):
+    """Archive completed and stale sequence enrollments (normally run by scheduler)"""
+    try:
+        api_tasks.submit_nowait(campaign_service.archive_enrollments, stale_after_days)
+    except SupervisorFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"message": "Enrollment archival started"}
+
+@api_router.get("/system/jobs/stats")
+async def get_job_stats():
+    """Get the number of background jobs per status"""
+    return await job_queue.get_stats()
+
+@api_router.get("/system/tasks")
+async def get_task_stats():
+    """Get in-process task pool usage"""
+    return api_tasks.get_stats()
+
+@api_router.get("/system/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get a background job's status"""
+    job = await job_queue.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@api_router.get("/system/admission")
+async def get_admission_stats():
+    """Running and queued requests per admission class"""
+    return {name: limiter.get_stats() for name, limiter in admission_limiters.items()}
+
+@api_router.get("/system/contact-cache")
+async def get_contact_cache_stats():
+    """Contact cache size and hit rate"""
+    return crm_service.contact_cache.get_stats()
+
+@api_router.get("/system/leader")
+async def get_leader_state():
+    """Get whether this process runs the singleton background jobs"""
+    return leader_elector.get_state()
+
+@api_router.get("/system/slow-queries")
+async def get_slow_queries(limit: int = Query(50, le=200)):
+    """Get recent slow MongoDB commands and the slowest query shapes"""
+    return mongo_monitor.get_slow_queries(limit)
+
+@api_router.post("/system/slow-queries/explain")
+async def explain_slow_queries(limit: int = Query(5, le=20)):
+    """Run explain for the slowest query shapes to find missing indexes"""
+    try:
+        return await mongo_monitor.explain_top(client, limit)
+    except Exception as e:
+        logger.error(f"Failed to explain slow queries: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ============================================================================
 # EMAIL TESTING ENDPOINTS
 # ============================================================================
@@ -382,9 +704,57 @@ async def send_test_email(
         logger.error(f"Failed to send test email: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/email/health")
+async def get_email_health():
+    """Email provider health: circuit breaker state, send lanes and retry backlog"""
+    health = email_service.get_health()
+    health["retry_queue"] = await crm_service.email_retries.get_stats()
+    return health
+
+@api_router.get("/email/lanes")
+async def get_email_lane_stats():
+    """Get per-lane send queue depth, throughput and latency"""
+    return email_service.scheduler.get_stats()
+
+# ============================================================================
+# METRICS ENDPOINTS
+# ============================================================================
+
+@api_router.get("/metrics/backlog")
+async def get_backlog_metrics():
+    """Get due-but-unsent sequence steps, lag percentiles, campaign queue depth and lane throughput"""
+    return await campaign_service.get_backlog_metrics()
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_prometheus_metrics():
+    """Expose all in-process metrics in Prometheus text format"""
+    for lane, stats in email_service.scheduler.get_stats()['lanes'].items():
+        registry.gauge("email_lane_queue_depth", "Sends waiting in a send lane", lane=lane).set(stats['queue_depth'])
+    return PlainTextResponse(registry.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # Include the router in the main app
 app.include_router(api_router)
 
+# Compress large JSON/HTML responses (contact pages, template and campaign bodies)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.environ.get('COMPRESSION_MIN_SIZE', '1024')),
+    gzip_level=int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6')),
+    brotli_quality=int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4')),
+    content_types=os.environ.get('COMPRESSION_CONTENT_TYPES', ','.join(DEFAULT_COMPRESSIBLE_TYPES)).split(',')
+)
+
+# Shed load per class of route so slow analytics can't starve contact CRUD
+app.add_middleware(
+    AdmissionControlMiddleware,
+    routes=app.routes,
+    limiters=admission_limiters,
+    classify=classify_request
+)
+
+# Record per-route request counts, latency and in-flight requests
+app.add_middleware(RequestMetricsMiddleware, routes=app.routes)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -394,26 +764,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Background task to process email sequences
-async def schedule_sequence_processing():
-    """Background task to process email sequences every 10 minutes"""
-    while True:
-        try:
-            await campaign_service.process_sequence_emails()
-            logger.info("Processed email sequences")
-        except Exception as e:
-            logger.error(f"Error processing email sequences: {str(e)}")
-        
-        # Wait 10 minutes before next processing
-        await asyncio.sleep(600)
-
 @app.on_event("startup")
 async def startup_event():
     """Application startup event"""
     logger.info("OpsVantage CRM & Email Marketing API starting up...")
     
-    # Start background sequence processing
-    asyncio.create_task(schedule_sequence_processing())
+    await initialize()
+    
+    # Sending and scheduling run in the worker tier; embed it for single-process deployments
+    app.state.worker_tasks = start_cache_invalidation()
+    if run_embedded_worker:
+        app.state.worker_tasks += start_worker(
+            job_concurrency=int(os.environ.get('WORKER_JOB_CONCURRENCY', '4'))
+        )
     
     logger.info("API startup complete")
 
@@ -421,4 +784,7 @@ async def startup_event():
 async def shutdown_db_client():
     """Cleanup on shutdown"""
     logger.info("Shutting down...")
+    drain_timeout = float(os.environ.get('SHUTDOWN_DRAIN_SECONDS', '20'))
+    await api_tasks.drain(drain_timeout)
+    await stop_worker(app.state.worker_tasks, drain_timeout)
     client.close()
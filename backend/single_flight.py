@@ -0,0 +1,104 @@
+import asyncio
+import functools
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+from metrics import registry
+
+
+def _freeze(value: Any) -> Hashable:
+    """Hashable stand-in for an argument (dicts, lists and sets included)"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    return value
+
+
+class SingleFlight:
+    """Shares one execution between concurrent identical calls.
+
+    The first caller for a key starts the call; callers arriving while it is
+    in flight await the same task instead of issuing their own query. With a
+    `ttl`, the result is also reused for that many seconds after it
+    completes. Failures are never reused. `forget(collection)` detaches
+    flights and results that read a collection, so a call made after a local
+    write always sees it; writes from other processes can be missed for up to
+    `ttl` seconds.
+
+    Results are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Tuple[asyncio.Task, Tuple[str, ...]]] = {}
+        self._results: Dict[Hashable, Tuple[float, Any, Tuple[str, ...]]] = {}
+
+    async def do(self, key: Hashable, collections: Tuple[str, ...], ttl: float,
+                 func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Return `await func(*args, **kwargs)`, sharing it with identical calls under `key`"""
+        name = key[0] if isinstance(key, tuple) else str(key)
+        cached = self._results.get(key)
+        if cached is not None:
+            expires_at, result, _ = cached
+            if time.monotonic() < expires_at:
+                self._count(name, "cached")
+                return result
+            del self._results[key]
+
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.create_task(func(*args, **kwargs))
+            self._calls[key] = (task, collections)
+            task.add_done_callback(functools.partial(self._on_done, key, collections, ttl))
+            self._count(name, "executed")
+        else:
+            task = call[0]
+            self._count(name, "shared")
+        # Shielded so one caller going away doesn't cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    def _count(self, name: str, outcome: str):
+        registry.counter(
+            "single_flight_calls_total", "Coalesced service calls by outcome", method=name, outcome=outcome
+        ).inc()
+
+    def _on_done(self, key: Hashable, collections: Tuple[str, ...], ttl: float, task: asyncio.Task):
+        call = self._calls.get(key)
+        if call is None or call[0] is not task:
+            # Forgotten while in flight; its result may predate a write
+            if not task.cancelled():
+                task.exception()
+            return
+        del self._calls[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if ttl > 0:
+            self._results[key] = (time.monotonic() + ttl, task.result(), collections)
+
+    def forget(self, *collections: str):
+        """Stop sharing calls and results that read any of `collections`"""
+        changed = set(collections)
+        for key in [key for key, (_, read) in self._calls.items() if changed.intersection(read)]:
+            del self._calls[key]
+        for key in [key for key, (_, _, read) in self._results.items() if changed.intersection(read)]:
+            del self._results[key]
+
+    def get_stats(self):
+        """In-flight and cached call counts for diagnostics"""
+        return {"in_flight": len(self._calls), "cached": len(self._results)}
+
+
+def single_flight(*collections: str, ttl: float = 0.0):
+    """Coalesce concurrent identical calls of a service method reading `collections`.
+
+    The instance must have a `flights` attribute holding a `SingleFlight`.
+    Calls are identical when they pass equal arguments.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            key = (method.__qualname__, _freeze(args), _freeze(kwargs))
+            return await self.flights.do(key, collections, ttl, method, self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,195 @@
+import hashlib
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING
+from models import EmailSuppression, EmailSuppressionCreate, SuppressionReason
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_email(email: str) -> str:
+    """Normalize an email address for suppression lookups"""
+    return (email or "").strip().lower()
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings using double hashing"""
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.num_bits = max(int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.num_hashes = max(int(round(self.num_bits / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value: str) -> Iterable[int]:
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    @property
+    def is_saturated(self) -> bool:
+        return self.count > self.capacity
+
+
+class SuppressionService:
+    """Global suppression list for bounces, complaints and unsubscribes.
+
+    The collection is the source of truth. Each process keeps a bloom filter
+    of suppressed addresses that is refreshed incrementally from the collection,
+    so the common case (address not suppressed) costs no database round trip.
+    Positive hits are confirmed with a single exact query.
+
+    `created_at` comes from the writer's clock, so a row can commit with a
+    timestamp older than rows already seen (a slow insert, a skewed host).
+    Incremental refreshes therefore re-read `overlap` seconds behind the
+    newest timestamp seen, and the filter is rebuilt from the whole
+    collection every `rebuild_interval` seconds to catch anything later still.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, refresh_interval: float = 30.0,
+                 capacity: int = 100000, error_rate: float = 0.001,
+                 overlap: float = 600.0, rebuild_interval: float = 3600.0):
+        self.db = db
+        self.suppressions = db.email_suppressions
+        self.refresh_interval = refresh_interval
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.overlap = overlap
+        self.rebuild_interval = rebuild_interval
+        self._filter = BloomFilter(capacity, error_rate)
+        self._watermark: Optional[datetime] = None
+        self._last_refresh = 0.0
+        self._last_rebuild = 0.0
+        self._loaded = False
+        self.stats = {"checks": 0, "bloom_positives": 0, "confirmed": 0}
+
+    async def ensure_indexes(self):
+        """Create indexes used by the suppression list"""
+        await self.suppressions.create_index([("email", ASCENDING)], unique=True)
+        await self.suppressions.create_index([("created_at", ASCENDING)])
+
+    async def add_suppression(self, suppression_data: EmailSuppressionCreate) -> EmailSuppression:
+        """Add (or refresh) an address on the suppression list"""
+        email = normalize_email(suppression_data.email)
+        now = datetime.utcnow()
+        await self.suppressions.update_one(
+            {"email": email},
+            {
+                "$set": {
+                    "reason": suppression_data.reason,
+                    "source": suppression_data.source,
+                    "updated_at": now
+                },
+                "$setOnInsert": {"email": email, "created_at": now}
+            },
+            upsert=True
+        )
+        if email not in self._filter:
+            self._filter.add(email)
+        suppression_data = await self.suppressions.find_one({"email": email})
+        return EmailSuppression(**suppression_data)
+
+    async def remove_suppression(self, email: str) -> bool:
+        """Remove an address from the suppression list"""
+        result = await self.suppressions.delete_one({"email": normalize_email(email)})
+        # Bloom filters cannot forget; stale bits are harmless because every
+        # positive hit is confirmed against the collection.
+        return result.deleted_count > 0
+
+    async def get_suppressions(self, skip: int = 0, limit: int = 100,
+                               reason: Optional[SuppressionReason] = None) -> List[EmailSuppression]:
+        """List suppressed addresses"""
+        query = {}
+        if reason:
+            query['reason'] = reason
+        cursor = self.suppressions.find(query).sort("created_at", -1).skip(skip).limit(limit)
+        suppressions = await cursor.to_list(length=limit)
+        return [EmailSuppression(**suppression) for suppression in suppressions]
+
+    async def refresh(self, force: bool = False):
+        """Pull suppressions added since the last refresh into the bloom filter"""
+        now = time.monotonic()
+        if not force and self._loaded and now - self._last_refresh < self.refresh_interval:
+            return
+
+        if self._filter.is_saturated:
+            # Grow once the filter exceeds its design capacity
+            self.capacity = self._filter.count * 2
+            await self._rebuild()
+        elif not self._loaded or now - self._last_rebuild >= self.rebuild_interval:
+            await self._rebuild()
+        else:
+            query = {"created_at": {"$gte": self._watermark - timedelta(seconds=self.overlap)}} if self._watermark else {}
+            self._watermark = await self._load(self._filter, query, self._watermark)
+
+        self._last_refresh = time.monotonic()
+        self._loaded = True
+
+    async def _rebuild(self):
+        """Load the whole collection into a new filter, swapped in once complete"""
+        bloom_filter = BloomFilter(self.capacity, self.error_rate)
+        self._watermark = await self._load(bloom_filter, {}, None)
+        self._filter = bloom_filter
+        self._last_rebuild = time.monotonic()
+
+    async def _load(self, bloom_filter: BloomFilter, query: Dict, watermark: Optional[datetime]) -> Optional[datetime]:
+        """Add matching suppressions to `bloom_filter`; returns the newest created_at seen"""
+        cursor = self.suppressions.find(query, {"_id": 0, "email": 1, "created_at": 1})
+        async for suppression in cursor:
+            # Overlapping reads see rows again; don't count them twice towards capacity
+            if suppression['email'] not in bloom_filter:
+                bloom_filter.add(suppression['email'])
+            if watermark is None or suppression['created_at'] > watermark:
+                watermark = suppression['created_at']
+        return watermark
+
+    async def filter_suppressed(self, emails: Iterable[str]) -> Set[str]:
+        """Return the normalized addresses from `emails` that are suppressed"""
+        await self.refresh()
+
+        candidates: Dict[str, None] = {}
+        for email in emails:
+            self.stats["checks"] += 1
+            normalized = normalize_email(email)
+            if normalized in self._filter:
+                candidates[normalized] = None
+
+        if not candidates:
+            return set()
+
+        self.stats["bloom_positives"] += len(candidates)
+        cursor = self.suppressions.find({"email": {"$in": list(candidates)}}, {"_id": 0, "email": 1})
+        confirmed = {suppression['email'] async for suppression in cursor}
+        self.stats["confirmed"] += len(confirmed)
+        return confirmed
+
+    async def is_suppressed(self, email: str) -> bool:
+        """Check a single address against the suppression list"""
+        return bool(await self.filter_suppressed([email]))
+
+    def get_stats(self) -> Dict[str, float]:
+        """Bloom filter statistics for diagnostics"""
+        return {
+            **self.stats,
+            "filter_entries": self._filter.count,
+            "filter_capacity": self.capacity,
+            "filter_bits": self._filter.num_bits,
+            "filter_hashes": self._filter.num_hashes,
+        }
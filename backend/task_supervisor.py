@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Optional, Set, Tuple
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+AbandonCallback = Optional[Callable[[], Awaitable[None]]]
+
+
+class SupervisorFull(Exception):
+    """Raised when a supervisor can't take more work"""
+
+
+class TaskSupervisor:
+    """Runs background coroutines with bounded concurrency and a bounded queue.
+
+    Every task is kept referenced until it finishes, its failures are logged
+    and counted, and `drain` waits for outstanding work on shutdown. Work
+    still running or queued when the drain deadline passes is cancelled and
+    handed to its `on_abandon` callback, which should persist it (e.g. put a
+    claimed job back on its queue).
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 10, max_queue: int = 100):
+        self.name = name
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_queue = max_queue
+        self.accepting = True
+        self._queue: Deque[Tuple[Callable[..., Awaitable[Any]], tuple, AbandonCallback, float]] = deque()
+        self._running: Set[asyncio.Task] = set()
+        self._abandon_callbacks = {}
+        self._changed = asyncio.Event()
+
+        self._running_gauge = registry.gauge(
+            "supervisor_tasks_running", "Background tasks currently running", supervisor=name
+        )
+        self._queued_gauge = registry.gauge(
+            "supervisor_tasks_queued", "Background tasks waiting for a slot", supervisor=name
+        )
+        self._queue_wait = registry.histogram(
+            "supervisor_queue_wait_seconds", "Time background tasks wait for a slot", supervisor=name
+        )
+        self._duration = registry.histogram(
+            "supervisor_task_duration_seconds", "Background task run time", supervisor=name
+        )
+
+    def _count(self, outcome: str):
+        registry.counter(
+            "supervisor_tasks_total", "Background tasks by outcome", supervisor=self.name, outcome=outcome
+        ).inc()
+
+    @property
+    def pending(self) -> int:
+        """Running plus queued tasks"""
+        return len(self._running) + len(self._queue)
+
+    def has_capacity(self) -> bool:
+        """Whether a task submitted now would start immediately"""
+        return self.accepting and self.pending < self.max_concurrency
+
+    def submit_nowait(self, func: Callable[..., Awaitable[Any]], *args, on_abandon: AbandonCallback = None):
+        """Run `func(*args)` now or queue it; raises SupervisorFull when the queue is full"""
+        if not self.accepting:
+            self._count("rejected")
+            raise SupervisorFull(f"{self.name} is shutting down")
+        if len(self._running) < self.max_concurrency:
+            self._start(func, args, on_abandon, time.monotonic())
+            return
+        if len(self._queue) >= self.max_queue:
+            self._count("rejected")
+            raise SupervisorFull(f"{self.name} queue is full ({self.max_queue} tasks)")
+        self._queue.append((func, args, on_abandon, time.monotonic()))
+        self._queued_gauge.set(len(self._queue))
+
+    async def submit(self, func: Callable[..., Awaitable[Any]], *args, on_abandon: AbandonCallback = None):
+        """Like `submit_nowait`, but waits for queue space instead of rejecting (backpressure)"""
+        await self._wait_for(lambda: not self.accepting or len(self._queue) < self.max_queue)
+        self.submit_nowait(func, *args, on_abandon=on_abandon)
+
+    async def wait_for_capacity(self):
+        """Wait until a new task would start immediately"""
+        await self._wait_for(self.has_capacity)
+
+    async def _wait_for(self, predicate: Callable[[], bool]):
+        while True:
+            # Clear before checking so a change in between still wakes us
+            self._changed.clear()
+            if predicate():
+                return
+            await self._changed.wait()
+
+    def _start(self, func, args, on_abandon: AbandonCallback, enqueued_at: float):
+        self._queue_wait.observe(time.monotonic() - enqueued_at)
+        task = asyncio.create_task(self._run(func, args))
+        self._running.add(task)
+        if on_abandon is not None:
+            self._abandon_callbacks[task] = on_abandon
+        task.add_done_callback(self._on_done)
+        self._running_gauge.set(len(self._running))
+
+    async def _run(self, func, args):
+        started = time.monotonic()
+        try:
+            await func(*args)
+            self._count("completed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._count("failed")
+            logger.error(f"Background task {getattr(func, '__name__', func)} in {self.name} failed: {str(e)}")
+        finally:
+            self._duration.observe(time.monotonic() - started)
+
+    def _on_done(self, task: asyncio.Task):
+        self._running.discard(task)
+        if not task.cancelled():
+            self._abandon_callbacks.pop(task, None)
+        while self._queue and len(self._running) < self.max_concurrency:
+            func, args, on_abandon, enqueued_at = self._queue.popleft()
+            self._start(func, args, on_abandon, enqueued_at)
+        self._running_gauge.set(len(self._running))
+        self._queued_gauge.set(len(self._queue))
+        self._changed.set()
+
+    async def drain(self, timeout: float = 30.0) -> int:
+        """Stop accepting work and wait up to `timeout` seconds for it to finish.
+
+        Returns the number of tasks abandoned at the deadline; each one's
+        `on_abandon` callback has been awaited.
+        """
+        self.accepting = False
+        self._changed.set()
+        deadline = time.monotonic() + timeout
+        while self._running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.wait(set(self._running), timeout=remaining)
+
+        abandoned = []
+        while self._queue:
+            func, args, on_abandon, _ = self._queue.popleft()
+            abandoned.append(on_abandon)
+        running = list(self._running)
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        abandoned.extend(self._abandon_callbacks.pop(task, None) for task in running)
+        self._queued_gauge.set(0)
+
+        for on_abandon in abandoned:
+            self._count("abandoned")
+            if on_abandon is None:
+                continue
+            try:
+                await on_abandon()
+            except Exception as e:
+                logger.error(f"Failed to persist abandoned task in {self.name}: {str(e)}")
+        if abandoned:
+            logger.warning(f"{self.name} abandoned {len(abandoned)} unfinished tasks at shutdown")
+        return len(abandoned)
+
+    def get_stats(self):
+        """Running and queued task counts for diagnostics"""
+        return {
+            "name": self.name,
+            "accepting": self.accepting,
+            "running": len(self._running),
+            "queued": len(self._queue),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
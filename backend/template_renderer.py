@@ -0,0 +1,67 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+# Placeholders filled from contact data; anything else (e.g. {{unsubscribe_url}}) is left as-is
+PERSONALIZATION_FIELDS = (
+    'first_name', 'last_name', 'full_name', 'email',
+    'company', 'position', 'city', 'state', 'country',
+)
+
+# Contact fields needed to render any template (and check the contact may be
+# mailed), for use as a Mongo projection
+CONTACT_RENDER_PROJECTION = {
+    "_id": 0, "id": 1, "email": 1, "email_subscribed": 1, "first_name": 1, "last_name": 1,
+    "company": 1, "position": 1, "city": 1, "state": 1, "country": 1,
+}
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class CompiledTemplate:
+    """A template split once into literal chunks and field slots"""
+
+    __slots__ = ('source', 'parts', 'fields')
+
+    def __init__(self, source: str):
+        self.source = source
+        self.parts = []  # literals at even indexes, field names at odd indexes
+        self.fields = set()
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(source):
+            field = match.group(1)
+            if field not in PERSONALIZATION_FIELDS:
+                continue
+            self.parts.append(source[position:match.start()])
+            self.parts.append(field)
+            self.fields.add(field)
+            position = match.end()
+        self.parts.append(source[position:])
+
+    def render(self, values: Dict[str, str]) -> str:
+        if not self.fields:
+            return self.source
+        parts = self.parts[:]
+        for i in range(1, len(parts), 2):
+            parts[i] = values.get(parts[i], '')
+        return ''.join(parts)
+
+
+@lru_cache(maxsize=1024)
+def compile_template(source: str) -> CompiledTemplate:
+    """Compile a template string, reusing earlier compilations of the same text"""
+    return CompiledTemplate(source)
+
+
+def render(source: Optional[str], values: Dict[str, str]) -> Optional[str]:
+    """Render a template string with personalization values"""
+    if source is None:
+        return None
+    return compile_template(source).render(values)
+
+
+def personalization_values(contact: Dict[str, Any]) -> Dict[str, str]:
+    """Build placeholder values from a contact document or personalization dict"""
+    values = {field: str(contact.get(field) or '') for field in PERSONALIZATION_FIELDS if field != 'full_name'}
+    values['full_name'] = f"{values['first_name']} {values['last_name']}".strip()
+    return values
@@ -0,0 +1,68 @@
+"""Standalone background worker: python worker.py run
+
+Runs the sending and scheduling subsystems (job queue consumers, email
+retries and the leader-elected sequence/campaign/archival loops) on their
+own event loop, so they can be scaled apart from the API. Start the API
+with RUN_EMBEDDED_WORKER=false when running workers separately.
+"""
+import asyncio
+import logging
+import os
+import signal
+import typer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+app = typer.Typer(help="OpsVantage CRM background worker")
+
+
+async def _run(job_concurrency: int, run_scheduler: bool):
+    from bootstrap import client, initialize, start_cache_invalidation, start_worker, stop_worker
+
+    await initialize()
+    tasks = start_cache_invalidation() + start_worker(job_concurrency=job_concurrency, run_scheduler=run_scheduler)
+    logger.info(f"Worker started with {job_concurrency} job consumers (scheduler: {run_scheduler})")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    logger.info("Worker shutting down...")
+    await stop_worker(tasks, float(os.environ.get('SHUTDOWN_DRAIN_SECONDS', '20')))
+    client.close()
+
+
+@app.command()
+def run(
+    job_concurrency: int = typer.Option(
+        int(os.environ.get('WORKER_JOB_CONCURRENCY', '4')), help="Number of background jobs to run at once"
+    ),
+    scheduler: bool = typer.Option(
+        True, help="Take part in leader election for the singleton scheduling loops"
+    ),
+):
+    """Run the background worker until interrupted"""
+    asyncio.run(_run(job_concurrency, scheduler))
+
+
+@app.command()
+def stats():
+    """Print background job counts per status"""
+    async def _stats():
+        from bootstrap import client, job_queue
+        counts = await job_queue.get_stats()
+        client.close()
+        return counts
+
+    for status, count in asyncio.run(_stats()).items():
+        typer.echo(f"{status}: {count}")
+
+
+if __name__ == "__main__":
+    app()
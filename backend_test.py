@@ -506,6 +506,362 @@ class CRMBackendTests(unittest.TestCase):
         
         print("✅ Template deletion passed")
 
+    def test_29_suppression_list(self):
+        """Test adding, checking and removing a suppressed address"""
+        test_email = f"bounce.{uuid.uuid4()}@example.com"
+        response = requests.post(
+            f"{self.api_url}/suppressions",
+            json={"email": test_email, "reason": "bounce", "source": "backend_tests"}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["email"], test_email.lower())
+        self.assertEqual(data["reason"], "bounce")
+        
+        check_response = requests.get(f"{self.api_url}/suppressions/{test_email}")
+        self.assertEqual(check_response.status_code, 200)
+        self.assertTrue(check_response.json()["suppressed"])
+        
+        delete_response = requests.delete(f"{self.api_url}/suppressions/{test_email}")
+        self.assertEqual(delete_response.status_code, 200)
+        
+        check_response = requests.get(f"{self.api_url}/suppressions/{test_email}")
+        self.assertFalse(check_response.json()["suppressed"])
+        
+        print("✅ Suppression list passed")
+
+    def test_30_email_health(self):
+        """Test email provider health and circuit breaker reporting"""
+        response = requests.get(f"{self.api_url}/email/health")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn("configured", data)
+        self.assertIn(data["circuit_breaker"]["state"], ["closed", "open", "half_open"])
+        self.assertIn("transactional", data["lanes"])
+        self.assertIn("bulk", data["lanes"])
+        self.assertIn("pending", data["retry_queue"])
+        
+        print("✅ Email health passed")
+
+    def test_31_bulk_enroll_segment(self):
+        """Test enrolling a list of contacts in a sequence as a job"""
+        contact_id = self.test_03_contact_creation_with_lead_scoring()
+        sequence_id = self.test_17_create_email_sequence()
+        
+        response = requests.post(
+            f"{self.api_url}/sequences/{sequence_id}/enroll",
+            json={"contact_ids": [contact_id]}
+        )
+        self.assertEqual(response.status_code, 200)
+        job = response.json()
+        self.assertEqual(job["sequence_id"], sequence_id)
+        self.assertEqual(job["total_contacts"], 1)
+        
+        for _ in range(10):
+            job_response = requests.get(f"{self.api_url}/sequences/enrollment-jobs/{job['id']}")
+            self.assertEqual(job_response.status_code, 200)
+            job = job_response.json()
+            if job["status"] in ["completed", "failed"]:
+                break
+            time.sleep(1)
+        
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual(job["processed"], 1)
+        
+        # An empty segment is rejected
+        response = requests.post(f"{self.api_url}/sequences/{sequence_id}/enroll", json={})
+        self.assertEqual(response.status_code, 400)
+        
+        print("✅ Bulk segment enrollment passed")
+
+    def test_32_prometheus_metrics(self):
+        """Test per-route request metrics in Prometheus format"""
+        requests.get(f"{self.api_url}/contacts/{uuid.uuid4()}")
+        
+        response = requests.get(f"{self.api_url[:-len('/api')]}/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("text/plain", response.headers["content-type"])
+        self.assertIn("# TYPE http_requests_total counter", response.text)
+        self.assertIn('route="/api/contacts/{contact_id}"', response.text)
+        self.assertIn("http_request_duration_seconds_bucket", response.text)
+        
+        print("✅ Prometheus metrics passed")
+
+    def test_33_slow_query_log(self):
+        """Test the MongoDB slow-query log and explain capture"""
+        response = requests.get(f"{self.api_url}/system/slow-queries")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn("threshold_ms", data)
+        self.assertIsInstance(data["recent"], list)
+        self.assertIsInstance(data["top_shapes"], list)
+        
+        response = requests.post(f"{self.api_url}/system/slow-queries/explain", params={"limit": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(response.json()), 3)
+        
+        print("✅ Slow query log passed")
+
+    def test_34_scheduled_campaign_and_leader(self):
+        """Test scheduled campaigns and the background job leader lease"""
+        campaign_data = dict(self.test_campaign_data)
+        campaign_data["scheduled_at"] = (datetime.utcnow() + timedelta(days=7)).isoformat()
+        
+        response = requests.post(f"{self.api_url}/campaigns", json=campaign_data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "scheduled")
+        
+        response = requests.get(f"{self.api_url}/system/leader")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["name"], "background-jobs")
+        self.assertIsInstance(data["is_leader"], bool)
+        
+        print("✅ Scheduled campaign and leader election passed")
+
+    def test_35_background_jobs(self):
+        """Test that the API queues background work for the worker tier"""
+        response = requests.get(f"{self.api_url}/system/jobs/stats")
+        self.assertEqual(response.status_code, 200)
+        before = response.json()
+        for status in ["pending", "processing", "completed", "failed"]:
+            self.assertIn(status, before)
+        
+        # Creating a subscribed contact queues its welcome email
+        self.test_03_contact_creation_with_lead_scoring()
+        after = requests.get(f"{self.api_url}/system/jobs/stats").json()
+        self.assertGreater(sum(after.values()), sum(before.values()))
+        
+        response = requests.get(f"{self.api_url}/system/jobs/{uuid.uuid4()}")
+        self.assertEqual(response.status_code, 404)
+        
+        print("✅ Background jobs passed")
+
+    def test_36_list_views_and_fields(self):
+        """Test summary list views and sparse fieldsets"""
+        self.test_10_create_email_template()
+        
+        response = requests.get(f"{self.api_url}/templates", params={"view": "summary"})
+        self.assertEqual(response.status_code, 200)
+        template = response.json()[0]
+        self.assertIn("name", template)
+        self.assertNotIn("html_content", template)
+        
+        response = requests.get(f"{self.api_url}/contacts", params={"fields": "email,first_name", "limit": 5})
+        self.assertEqual(response.status_code, 200)
+        for contact in response.json():
+            self.assertEqual(set(contact), {"id", "email", "first_name"})
+        
+        response = requests.get(f"{self.api_url}/sequences", params={"view": "summary"})
+        self.assertEqual(response.status_code, 200)
+        for sequence in response.json():
+            self.assertIn("step_count", sequence)
+            self.assertNotIn("emails", sequence)
+        
+        response = requests.get(f"{self.api_url}/campaigns", params={"fields": "no_such_field"})
+        self.assertEqual(response.status_code, 400)
+        
+        print("✅ List views and field selection passed")
+
+    def test_37_conditional_get(self):
+        """Test ETags and 304 responses for cached resources"""
+        response = requests.get(f"{self.api_url}/templates")
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers["ETag"]
+        self.assertIn("no-cache", response.headers["Cache-Control"])
+
+        response = requests.get(f"{self.api_url}/templates", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        # A write to the collection invalidates the ETag
+        self.test_10_create_email_template()
+        response = requests.get(f"{self.api_url}/templates", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+        response = requests.get(f"{self.api_url}/analytics/dashboard")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("max-age", response.headers["Cache-Control"])
+        response = requests.get(f"{self.api_url}/analytics/dashboard", headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+        print("✅ Conditional GET passed")
+
+    def test_38_response_compression(self):
+        """Test that large JSON responses are compressed and small ones are not"""
+        response = requests.get(f"{self.api_url}/contacts", params={"limit": 1000}, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 200)
+        if len(response.content) >= 1024:
+            self.assertEqual(response.headers.get("Content-Encoding"), "gzip")
+            self.assertIn("Accept-Encoding", response.headers.get("Vary", ""))
+
+        # Uncompressed variants still vary on Accept-Encoding for shared caches
+        response = requests.get(f"{self.api_url}/", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.headers.get("Content-Encoding"))
+        self.assertIn("Accept-Encoding", response.headers.get("Vary", ""))
+
+        response = requests.get(f"{self.api_url}/templates", headers={"Accept-Encoding": "identity"})
+        self.assertIsNone(response.headers.get("Content-Encoding"))
+        self.assertIn("Accept-Encoding", response.headers.get("Vary", ""))
+
+        print("✅ Response compression passed")
+
+    def test_39_request_coalescing(self):
+        """Test that identical concurrent reads share one query"""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            responses = list(pool.map(lambda _: requests.get(f"{self.api_url}/analytics/lead-sources"), range(20)))
+        for response in responses:
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), responses[0].json())
+        
+        response = requests.get(f"{self.api_url[:-len('/api')]}/metrics")
+        self.assertIn('single_flight_calls_total{method="CRMService.get_lead_source_stats"', response.text)
+        
+        print("✅ Request coalescing passed")
+
+    def test_40_batch_operations(self):
+        """Test running dependent and independent operations in one batch"""
+        batch = {
+            "operations": [
+                {"id": "contact", "op": "contacts.create", "params": self.test_contact_data},
+                {"op": "interactions.create", "params": {
+                    "contact_id": {"$ref": "contact.id"},
+                    "type": "note_added",
+                    "description": "Created in a batch"
+                }},
+                {"op": "contacts.get", "params": {"contact_id": str(uuid.uuid4())}},
+                {"op": "analytics.dashboard"}
+            ]
+        }
+        response = requests.post(f"{self.api_url}/batch", json=batch)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        results = data["results"]
+        self.assertEqual([result["status"] for result in results], ["succeeded", "succeeded", "failed", "succeeded"])
+        self.assertEqual(results[1]["result"]["contact_id"], results[0]["result"]["id"])
+        self.assertEqual(results[2]["status_code"], 404)
+        self.created_contacts.append(results[0]["result"]["id"])
+        
+        # Operations that depend on a failed one are skipped
+        batch = {
+            "operations": [
+                {"id": "missing", "op": "contacts.get", "params": {"contact_id": str(uuid.uuid4())}},
+                {"op": "contacts.update", "params": {"contact_id": {"$ref": "missing.id"}, "status": "qualified"}}
+            ]
+        }
+        response = requests.post(f"{self.api_url}/batch", json=batch)
+        self.assertEqual(response.json()["results"][1]["status"], "skipped")
+        
+        response = requests.post(f"{self.api_url}/batch", json={"operations": [{"op": "no.such.op"}]})
+        self.assertEqual(response.status_code, 400)
+        
+        print("✅ Batch operations passed")
+
+    def test_41_admission_control(self):
+        """Test per-class admission limits and load shedding"""
+        response = requests.get(f"{self.api_url}/system/admission")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        for request_class in ["read", "write", "analytics", "send"]:
+            self.assertIn(request_class, data)
+            self.assertIn("max_concurrency", data[request_class])
+        
+        # A burst of analytics requests is either served or shed with Retry-After,
+        # while contact CRUD keeps working
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            futures = [pool.submit(requests.get, f"{self.api_url}/analytics/recent-activity", params={"limit": i % 50 + 1}) for i in range(40)]
+            contacts = requests.get(f"{self.api_url}/contacts", params={"limit": 5})
+            responses = [future.result() for future in futures]
+        self.assertEqual(contacts.status_code, 200)
+        for response in responses:
+            self.assertIn(response.status_code, (200, 503))
+            if response.status_code == 503:
+                self.assertIn("Retry-After", response.headers)
+        
+        print("✅ Admission control passed")
+
+    def test_42_contact_cache(self):
+        """Test that repeated contact reads hit the cache and updates are visible immediately"""
+        contact_id = self.test_03_contact_creation_with_lead_scoring()
+        before = requests.get(f"{self.api_url}/system/contact-cache").json()
+        
+        for _ in range(3):
+            response = requests.get(f"{self.api_url}/contacts/{contact_id}")
+            self.assertEqual(response.status_code, 200)
+        
+        after = requests.get(f"{self.api_url}/system/contact-cache").json()
+        self.assertGreaterEqual(after["hits"] - before["hits"], 2)
+        self.assertIsNotNone(after["hit_rate"])
+        
+        # Writes invalidate the cached copy
+        response = requests.put(f"{self.api_url}/contacts/{contact_id}", json={"company": "Cached Corp"})
+        self.assertEqual(response.status_code, 200)
+        response = requests.get(f"{self.api_url}/contacts/{contact_id}")
+        self.assertEqual(response.json()["company"], "Cached Corp")
+        
+        print("✅ Contact cache passed")
+
+    def test_43_contact_detail(self):
+        """Test the contact detail endpoint and cursor pagination of interactions"""
+        contact_id = self.test_03_contact_creation_with_lead_scoring()
+        for index in range(3):
+            requests.post(f"{self.api_url}/interactions", json={
+                "contact_id": contact_id,
+                "type": "note_added",
+                "description": f"Detail note {index}",
+                "metadata": {}
+            })
+        
+        response = requests.get(f"{self.api_url}/contacts/{contact_id}/detail",
+                                params={"interactions_limit": 2, "engagement_days": 7})
+        self.assertEqual(response.status_code, 200)
+        detail = response.json()
+        self.assertEqual(detail["contact"]["id"], contact_id)
+        self.assertEqual(len(detail["interactions"]), 2)
+        self.assertIsNotNone(detail["next_interactions_cursor"])
+        self.assertIsInstance(detail["enrollments"], list)
+        self.assertEqual(len(detail["engagement"]), 7)
+        self.assertGreaterEqual(detail["engagement"][-1]["by_type"].get("note_added", 0), 3)
+        
+        # The cursor continues where the first page stopped
+        response = requests.get(f"{self.api_url}/contacts/{contact_id}/interactions",
+                                params={"limit": 2, "cursor": detail["next_interactions_cursor"]})
+        self.assertEqual(response.status_code, 200)
+        first_page = {interaction["id"] for interaction in detail["interactions"]}
+        self.assertTrue(first_page.isdisjoint(interaction["id"] for interaction in response.json()))
+        
+        response = requests.get(f"{self.api_url}/contacts/{contact_id}/interactions", params={"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+        response = requests.get(f"{self.api_url}/contacts/{uuid.uuid4()}/detail")
+        self.assertEqual(response.status_code, 404)
+        
+        print("✅ Contact detail passed")
+
+    def test_44_unsubscribed_contact_not_enrolled(self):
+        """Test that trigger enrollment skips contacts created unsubscribed"""
+        contact_data = {
+            "first_name": "Opted",
+            "last_name": "Out",
+            "email": f"opted.out.{uuid.uuid4().hex[:8]}@example.com",
+            "email_subscribed": False,
+            "tags": ["new_subscriber"]
+        }
+        response = requests.post(f"{self.api_url}/contacts", json=contact_data)
+        self.assertEqual(response.status_code, 200)
+        contact = response.json()
+        self.assertFalse(contact["email_subscribed"])
+        
+        response = requests.get(f"{self.api_url}/contacts/{contact['id']}/detail")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["enrollments"], [])
+        
+        print("✅ Unsubscribed contact enrollment passed")
+
 if __name__ == "__main__":
     # Run the tests
     unittest.main(verbosity=2)
\ No newline at end of file
@@ -16,11 +16,15 @@ export const crmAPI = {
   // Contacts
   getContacts: (params = {}) => api.get('/contacts', { params }),
   getContact: (id) => api.get(`/contacts/${id}`),
+  // Contact page data in one request: contact, recent interactions, active enrollments, daily engagement
+  getContactDetail: (id, interactionsLimit = 50) =>
+    api.get(`/contacts/${id}/detail`, { params: { interactions_limit: interactionsLimit } }),
   createContact: (data) => api.post('/contacts', data),
   updateContact: (id, data) => api.put(`/contacts/${id}`, data),
   deleteContact: (id) => api.delete(`/contacts/${id}`),
   searchContacts: (query, limit = 20) => api.get('/contacts/search', { params: { q: query, limit } }),
   getContactInteractions: (id, limit = 50) => api.get(`/contacts/${id}/interactions`, { params: { limit } }),
+  getContactEnrollmentHistory: (id, limit = 50) => api.get(`/contacts/${id}/enrollments/history`, { params: { limit } }),
 
   // Interactions
   createInteraction: (data) => api.post('/interactions', data),
@@ -32,7 +36,7 @@ export const crmAPI = {
   deleteTemplate: (id) => api.delete(`/templates/${id}`),
 
   // Campaigns
-  getCampaigns: () => api.get('/campaigns'),
+  getCampaigns: (params = {}) => api.get('/campaigns', { params }),
   getCampaign: (id) => api.get(`/campaigns/${id}`),
   createCampaign: (data) => api.post('/campaigns', data),
   sendCampaign: (id) => api.post(`/campaigns/${id}/send`),
@@ -43,6 +47,9 @@ export const crmAPI = {
   createSequence: (data) => api.post('/sequences', data),
   enrollContactInSequence: (sequenceId, contactId) => 
     api.post(`/sequences/${sequenceId}/enroll/${contactId}`),
+  bulkEnrollInSequence: (sequenceId, segment) => api.post(`/sequences/${sequenceId}/enroll`, segment),
+  getEnrollmentJob: (jobId) => api.get(`/sequences/enrollment-jobs/${jobId}`),
+  getSequenceStats: (id) => api.get(`/sequences/${id}/stats`),
 
   // Analytics
   getDashboardStats: () => api.get('/analytics/dashboard'),
@@ -50,6 +57,10 @@ export const crmAPI = {
   getContactStatusStats: () => api.get('/analytics/contact-status'),
   getRecentActivity: (limit = 10) => api.get('/analytics/recent-activity', { params: { limit } }),
 
+  // Batch: several operations in one request, e.g. { op: 'contacts.create', params: {...} }
+  batch: (operations, stopOnError = false) =>
+    api.post('/batch', { operations, stop_on_error: stopOnError }),
+
   // System
   processSequences: () => api.post('/system/process-sequences'),
   sendTestEmail: (data) => api.post('/email/test', data),
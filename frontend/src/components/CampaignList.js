@@ -16,7 +16,7 @@ import { crmAPI } from '../api';
 const CampaignList = () => {
   const { data: campaignsResponse, isLoading, refetch } = useQuery(
     'campaigns',
-    crmAPI.getCampaigns
+    () => crmAPI.getCampaigns({ view: 'summary' })
   );
 
   const campaigns = campaignsResponse?.data || [];
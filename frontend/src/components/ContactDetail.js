@@ -25,25 +25,20 @@ const ContactDetail = () => {
   const [showEditForm, setShowEditForm] = useState(false);
   const [showInteractionForm, setShowInteractionForm] = useState(false);
 
-  const { data: contactResponse, isLoading: contactLoading } = useQuery(
-    ['contact', id],
-    () => crmAPI.getContact(id)
+  const { data: detailResponse, isLoading: contactLoading } = useQuery(
+    ['contactDetail', id],
+    () => crmAPI.getContactDetail(id, 50)
   );
 
-  const { data: interactionsResponse, isLoading: interactionsLoading } = useQuery(
-    ['contactInteractions', id],
-    () => crmAPI.getContactInteractions(id, 50)
-  );
-
-  const contact = contactResponse?.data;
-  const interactions = interactionsResponse?.data || [];
+  const contact = detailResponse?.data?.contact;
+  const interactions = detailResponse?.data?.interactions || [];
 
   const updateStatusMutation = useMutation(
     (status) => crmAPI.updateContact(id, { status }),
     {
       onSuccess: () => {
         toast.success('Status updated successfully!');
-        queryClient.invalidateQueries(['contact', id]);
+        queryClient.invalidateQueries(['contactDetail', id]);
       },
       onError: (error) => {
         toast.error(error.response?.data?.detail || 'Failed to update status');
@@ -56,7 +51,7 @@ const ContactDetail = () => {
     {
       onSuccess: () => {
         toast.success('Interaction added successfully!');
-        queryClient.invalidateQueries(['contactInteractions', id]);
+        queryClient.invalidateQueries(['contactDetail', id]);
         setShowInteractionForm(false);
       },
       onError: (error) => {
@@ -280,11 +275,7 @@ const ContactDetail = () => {
               </button>
             </div>
 
-            {interactionsLoading ? (
-              <div className="text-center py-4">
-                <div className="animate-spin rounded-full h-8 w-8 border-b-2 border-blue-600 mx-auto"></div>
-              </div>
-            ) : interactions.length === 0 ? (
+            {interactions.length === 0 ? (
               <div className="text-center py-8">
                 <p className="text-gray-600">No interactions yet</p>
               </div>
@@ -395,7 +386,7 @@ const ContactDetail = () => {
           onClose={() => setShowEditForm(false)}
           onSuccess={() => {
             setShowEditForm(false);
-            queryClient.invalidateQueries(['contact', id]);
+            queryClient.invalidateQueries(['contactDetail', id]);
           }}
         />
       )}
@@ -0,0 +1,66 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from circuit_breaker import CircuitState  # noqa: E402
+from email_service import EmailService  # noqa: E402
+
+
+class CircuitBreakerProbeTest(unittest.IsolatedAsyncioTestCase):
+    """Half-open probe handling in EmailService.send_email"""
+
+    def setUp(self):
+        self.service = EmailService()
+        self.service.sg = object()  # Deliveries go through the patched scheduler below
+        self.breaker = self.service.circuit_breaker
+        self.breaker.reset_timeout = 0
+        for _ in range(self.breaker.failure_threshold):
+            self.breaker.record_failure("down")
+        self.assertEqual(self.breaker.state, CircuitState.OPEN)
+
+    async def send(self):
+        return await self.service.send_email("probe@example.com", "Subject", "<p>Body</p>")
+
+    async def test_01_cancelled_probe_releases_slot(self):
+        """A probe cancelled mid-send must not leave the circuit shut"""
+        started = asyncio.Event()
+
+        async def hang(*args, **kwargs):
+            started.set()
+            await asyncio.sleep(3600)
+
+        self.service.scheduler.submit = hang
+        probe = asyncio.create_task(self.send())
+        await started.wait()
+        self.assertTrue(self.breaker.probe_in_flight)
+
+        probe.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await probe
+        self.assertFalse(self.breaker.probe_in_flight)
+
+        async def deliver(*args, **kwargs):
+            return {"success": True, "retryable": False}
+
+        self.service.scheduler.submit = deliver
+        result = await self.send()
+        self.assertTrue(result["success"])
+        self.assertEqual(self.breaker.state, CircuitState.CLOSED)
+
+    async def test_02_probe_error_releases_slot(self):
+        """A probe that raises before recording a result gives its slot back"""
+        async def explode(*args, **kwargs):
+            raise RuntimeError("boom")
+
+        self.service.scheduler.submit = explode
+        with self.assertRaises(RuntimeError):
+            await self.send()
+        self.assertFalse(self.breaker.probe_in_flight)
+        self.assertTrue(self.breaker.allow_request())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)